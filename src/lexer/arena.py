@@ -0,0 +1,198 @@
+from array import array
+
+from parser import (
+    ProgramNode, AssignmentNode, ArrayNode, NumberNode, StringNode,
+    IdentifierNode, IndexNode, PrintNode, IfNode, BlockNode,
+    ForNode, ThingDefNode, NewNode, AttrAccessNode,
+    BooleanNode, UnaryOpNode, BinaryOpNode, ComparisonNode,
+    PatternWildcard, MatchNode, PatternVar, PatternLiteral, RangeNode,
+    PatternList, PatternThing
+)
+
+# A flat, read-only copy of an AST: one row per node in post-order, so
+# children always come before their parent and a pass can scan the kinds
+# column front to back instead of recursing.
+#
+#   kinds[i]                 index into NODE_CLASSES
+#   values[i]                the node's non-node field (name, op, value...)
+#   children[offsets[i]:offsets[i + 1]]
+#                            row numbers of its children, NO_NODE for None
+
+NODE_CLASSES = [
+    ProgramNode, AssignmentNode, ArrayNode, NumberNode, StringNode,
+    IdentifierNode, IndexNode, PrintNode, IfNode, BlockNode,
+    ForNode, ThingDefNode, NewNode, AttrAccessNode,
+    BooleanNode, UnaryOpNode, BinaryOpNode, ComparisonNode,
+    PatternWildcard, MatchNode, PatternVar, PatternLiteral, RangeNode,
+    PatternList, PatternThing,
+]
+NODE_KINDS = {cls: kind for kind, cls in enumerate(NODE_CLASSES)}
+
+NO_NODE = 0xFFFFFFFF
+
+
+class Arena:
+    def __init__(self):
+        self.kinds = array('B')
+        self.offsets = array('I', [0])
+        self.children = array('I')
+        self.values = []
+        self.root = NO_NODE
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @classmethod
+    def from_program(cls, program):
+        arena = cls()
+        arena.root = arena.add(program)
+        return arena
+
+    def kind(self, i):
+        return NODE_CLASSES[self.kinds[i]]
+
+    def child_rows(self, i):
+        return self.children[self.offsets[i]:self.offsets[i + 1]]
+
+    def nbytes(self):
+        columns = (self.kinds, self.offsets, self.children)
+        return sum(col.itemsize * len(col) for col in columns) + 8 * len(self.values)
+
+    def count(self, node_class):
+        # e.g. count(IdentifierNode), one pass over a bytes column
+        return self.kinds.tobytes().count(NODE_KINDS[node_class])
+
+    # building
+
+    def add(self, node):
+        # children first; an explicit stack keeps deep expressions off the
+        # Python call stack
+        stack = [node]
+        done = []
+        while stack:
+            item = stack.pop()
+            if item is None:
+                done.append(NO_NODE)
+            elif type(item) is tuple:
+                # all children of this node are now on top of `done`
+                node, value, n = item
+                rows = done[len(done) - n:]
+                del done[len(done) - n:]
+                done.append(self.row(node, value, rows))
+            else:
+                kids, value = split(item)
+                stack.append((item, value, len(kids)))
+                stack.extend(reversed(kids))
+        return done[0]
+
+    def row(self, node, value, rows):
+        self.kinds.append(NODE_KINDS[type(node)])
+        self.values.append(value)
+        self.children.extend(rows)
+        self.offsets.append(len(self.children))
+        return len(self.kinds) - 1
+
+    # rebuilding node objects, for passes that still want a tree
+
+    def to_program(self):
+        return self.node(self.root)
+
+    def node(self, i):
+        # a subtree is the run of rows ending at its root, starting at its
+        # leftmost leaf
+        first = i
+        kids = self.child_rows(first)
+        while kids and kids[0] != NO_NODE:
+            first = kids[0]
+            kids = self.child_rows(first)
+        built = {}
+        for row in range(first, i + 1):
+            kids = [None if r == NO_NODE else built.pop(r) for r in self.child_rows(row)]
+            built[row] = self.build(row, kids)
+        return built[i]
+
+    def build(self, i, kids):
+        cls = self.kind(i)
+        value = self.values[i]
+        if cls in (ProgramNode, BlockNode, ArrayNode):
+            return cls(kids)
+        if cls in (NumberNode, StringNode, BooleanNode, IdentifierNode, PatternLiteral, PatternVar):
+            return cls(value)
+        if cls is PatternWildcard:
+            return cls()
+        if cls in (AssignmentNode, IndexNode):
+            return cls(value, kids[0])
+        if cls is PrintNode:
+            return PrintNode(kids[0])
+        if cls is IfNode:
+            return IfNode(kids[0], kids[1], kids[2])
+        if cls is ForNode:
+            return ForNode(value, kids[0], kids[1])
+        if cls is ThingDefNode:
+            return ThingDefNode(value[0], list(value[1]))
+        if cls is NewNode:
+            return NewNode(value, kids)
+        if cls is AttrAccessNode:
+            return AttrAccessNode(kids[0], value)
+        if cls is UnaryOpNode:
+            return UnaryOpNode(value, kids[0])
+        if cls in (BinaryOpNode, ComparisonNode):
+            return cls(kids[0], value, kids[1])
+        if cls is RangeNode:
+            return RangeNode(kids[0], kids[1], kids[2])
+        if cls is PatternList:
+            return PatternList(kids)
+        if cls is PatternThing:
+            return PatternThing(value, kids)
+        # MatchNode: expr, pattern/body pairs, else branch
+        pairs = kids[1:-1]
+        return MatchNode(kids[0], list(zip(pairs[0::2], pairs[1::2])), kids[-1])
+
+
+def split(node):
+    # (child nodes, value) for one node; None children stand for absent ones
+    t = type(node)
+    if t in (ProgramNode, BlockNode):
+        return node.statements, None
+    if t is ArrayNode:
+        return node.elements, None
+    if t in (NumberNode, StringNode, BooleanNode, PatternLiteral):
+        return (), node.value
+    if t in (IdentifierNode, PatternVar):
+        return (), node.name
+    if t is PatternWildcard:
+        return (), None
+    if t is AssignmentNode:
+        return (node.value,), node.name
+    if t is IndexNode:
+        return (node.index,), node.name
+    if t is PrintNode:
+        return (node.expression,), None
+    if t is IfNode:
+        return (node.condition, node.then_branch, node.else_branch), None
+    if t is ForNode:
+        return (node.iterable, node.body), node.var_name
+    if t is ThingDefNode:
+        return (), (node.name, tuple(node.args))
+    if t is NewNode:
+        return node.init_args, node.type_name
+    if t is AttrAccessNode:
+        return (node.obj,), node.attr
+    if t is UnaryOpNode:
+        return (node.expr,), node.op
+    if t in (BinaryOpNode, ComparisonNode):
+        return (node.left, node.right), node.op
+    if t is RangeNode:
+        return (node.start, node.stop, node.step), None
+    if t is PatternList:
+        return node.elements, None
+    if t is PatternThing:
+        return node.args, node.type_name
+    if t is MatchNode:
+        kids = [node.expr]
+        for pattern, body in node.cases:
+            kids.append(pattern)
+            kids.append(body)
+        kids.append(node.else_branch)
+        return kids, None
+    raise TypeError(f"Unknown node type: {t.__name__}")
@@ -0,0 +1,795 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import platform
+import tempfile
+import subprocess
+import random
+import argparse
+import contextlib
+from operator import attrgetter
+
+from lexer import Lexer, CharLexer
+from parser import Parser, DescentParser
+from arena import Arena, NODE_CLASSES
+import cache
+import wire
+from interpreter import Interpreter, RuntimeError as InterpreterError, HOOKED_METHODS
+from vm import VM
+from transpiler import PyEngine
+from stats import RunStats
+
+MB = 1_000_000
+
+HEADER = """\
+hingterb Position
+  rgaerb x
+  rgaerb y
+ndeerb
+"""
+
+def generate_source(size, seed=0):
+    # a machine-generated looking script of roughly `size` bytes; every
+    # group of lines only refers to names it defines itself, so it runs
+    rng = random.Random(seed)
+    parts = [HEADER]
+    total = len(HEADER)
+    n = 0
+    while total < size:
+        n += 1
+        a, b, c = rng.randint(0, 999), rng.randint(1, 99), rng.random() * 100
+        group = (
+            f"v{n} = {a} + {b} * ({a} - {c:.3f}) / {b} ^^ step {n}\n"
+            f"arr{n} = [{a}, {b}, {c:.2f}, \"item {n}\", rueterb]\n"
+            f"if v{n} > {a} ndaerb otnerb alseferb henterb rintperb arr{n}[{b % 5 + 1}] lseerb rintperb 'no' ndeerb\n"
+            f"orferb i in [{a}, {b}, {a + b}] rintperb i % {b}\n"
+            f"p{n} = ewnerb Position [{a}, {b}]\n"
+            f"rintperb p{n}.x == {a}\n"
+            f"atchmerb v{n}\n"
+            f"asecerb {a} henterb rintperb \"hit\"\n"
+            f"asecerb _ henterb rintperb \"miss\"\n"
+            f"ndeerb\n"
+        )
+        parts.append(group)
+        total += len(group)
+    return ''.join(parts)
+
+def generate_expressions(size, seed=0):
+    # expression-dense source: long assignments mixing every operator level
+    rng = random.Random(seed)
+    atoms = ['a', 'b', 'c', 'n', '1', '2', '17', '3.5', '"s"', 'rueterb',
+             'xs[1]', 'p.x', 'ewnerb Position [1, 2].y']
+    levels = [(' or ',), (' ndaerb ',), None, (' < ', ' > ', ' == ', ' != '),
+              (' + ', ' - '), (' * ', ' / ', ' % ')]
+
+    def expr(level, depth):
+        if level == len(levels) or depth > 6:
+            if rng.random() < 0.15 and depth < 6:
+                return '(' + expr(0, depth + 1) + ')'
+            if rng.random() < 0.05:
+                return '[' + expr(0, depth + 1) + ', ' + expr(0, depth + 1) + ']'
+            return rng.choice(atoms)
+        if levels[level] is None:
+            # otnerb level
+            if rng.random() < 0.2:
+                return 'otnerb ' + expr(level, depth + 1)
+            return expr(level + 1, depth)
+        parts = [expr(level + 1, depth + 1) for _ in range(rng.choice((1, 1, 2, 3)))]
+        out = parts[0]
+        for part in parts[1:]:
+            out += rng.choice(levels[level]) + part
+        return out
+
+    parts = [HEADER]
+    total = len(HEADER)
+    n = 0
+    while total < size:
+        n += 1
+        value = expr(0, 0)
+        while value.startswith('['):
+            # e = [..] parses as a bare list literal, not an expression
+            value = expr(0, 0)
+        line = f"e{n} = {value}\n"
+        parts.append(line)
+        total += len(line)
+    return ''.join(parts)
+
+def best_time(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def bench_lexer(sizes, repeat=1, reference_max=1.0):
+    print(f"{'size':>8} {'tokens':>11} {'Lexer MB/s':>11} {'CharLexer MB/s':>15} {'speedup':>8}")
+    for size_mb in sizes:
+        source = generate_source(int(size_mb * MB))
+        seconds, tokens = best_time(lambda: Lexer('<bench>', source).tokenize(), repeat)
+        mbps = len(source) / MB / seconds
+        ref_col, speedup = '-', '-'
+        if size_mb <= reference_max:
+            ref_seconds, ref_tokens = best_time(lambda: CharLexer('<bench>', source).tokenize(), repeat)
+            if [repr(t) for t in tokens] != [repr(t) for t in ref_tokens]:
+                print(f"token streams differ at {size_mb} MB", file=sys.stderr)
+                sys.exit(1)
+            ref_col = f"{len(source) / MB / ref_seconds:.2f}"
+            speedup = f"{ref_seconds / seconds:.1f}x"
+        print(f"{size_mb:>6g}MB {len(tokens):>11} {mbps:>11.2f} {ref_col:>15} {speedup:>8}")
+        del tokens, source
+
+def token_bytes(tokens, table=()):
+    # container plus every distinct token object, its __dict__ and value
+    seen = {}
+    for tok in list(tokens) + list(table):
+        seen[id(tok)] = tok
+    total = sys.getsizeof(tokens) if isinstance(tokens, list) else tokens.nbytes()
+    for tok in seen.values():
+        total += sys.getsizeof(tok) + sys.getsizeof(tok.__dict__) + sys.getsizeof(tok.value)
+    return total
+
+def bench_tokens(size_mb, repeat=1):
+    # per-token memory and parse time: one object per token (CharLexer),
+    # shared Token objects (Lexer.tokenize) and the TokenBuffer columns
+    source = generate_source(int(size_mb * MB))
+    ref_source = source[:source.index('\n', min(len(source) - 1, MB)) + 1]
+    ref_tokens = CharLexer('<bench>', ref_source).tokenize()
+    lex_seconds, tokens = best_time(lambda: Lexer('<bench>', source).tokenize(), repeat)
+    buf_seconds, buf = best_time(lambda: Lexer('<bench>', source).buffer(), repeat)
+    print(f"{len(tokens)} tokens, {size_mb:g}MB")
+    print(f"{'':>16} {'bytes/token':>12} {'positions':>10} {'lex s':>7} {'parse s':>8}")
+    print(f"{'CharLexer':>16} {token_bytes(ref_tokens) / len(ref_tokens):>12.1f} {'no':>10} {'-':>7} {'-':>8}")
+    def parse(tokens):
+        # parsed the way bgbasic does it; the tree is dropped right away
+        with cache.gc_paused():
+            Parser(tokens).parse()
+
+    parse_seconds, _ = best_time(lambda: parse(tokens), repeat)
+    print(f"{'Lexer.tokenize':>16} {token_bytes(tokens) / len(tokens):>12.1f} {'no':>10} "
+          f"{lex_seconds:>7.2f} {parse_seconds:>8.2f}")
+    parse_seconds, _ = best_time(lambda: parse(buf), repeat)
+    print(f"{'Lexer.buffer':>16} {token_bytes(buf, buf.table) / len(buf):>12.1f} {'yes':>10} "
+          f"{buf_seconds:>7.2f} {parse_seconds:>8.2f}")
+
+# the node classes as they were before __slots__: same names and fields,
+# one __dict__ per instance
+DICT_CLASSES = {}
+
+def dict_layout(value):
+    if isinstance(value, list):
+        return [dict_layout(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(dict_layout(v) for v in value)
+    cls = type(value)
+    if not hasattr(cls, '__slots__'):
+        return value
+    if cls.__name__ not in DICT_CLASSES:
+        DICT_CLASSES[cls.__name__] = type(cls.__name__, (), {})
+    node = DICT_CLASSES[cls.__name__]()
+    for name in cls.__slots__:
+        # strict used to be a class attribute, not an instance field
+        if name != 'strict':
+            setattr(node, name, dict_layout(getattr(value, name)))
+    return node
+
+def field_getter(cls):
+    fields = [name for name in cls.__slots__ if name != 'strict']
+    if not fields:
+        return lambda node: ()
+    if len(fields) == 1:
+        get = attrgetter(fields[0])
+        return lambda node: (get(node),)
+    return attrgetter(*fields)
+
+def tree_bytes(root):
+    # nodes, their __dict__s and the lists/tuples holding them; leaf values
+    # are shared by both layouts and left out
+    total = 0
+    seen = set()
+    stack = [root]
+    while stack:
+        value = stack.pop()
+        if id(value) in seen:
+            continue
+        if isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif hasattr(value, '__dict__'):
+            total += sys.getsizeof(value.__dict__)
+            stack.extend(value.__dict__.values())
+        elif hasattr(type(value), '__slots__'):
+            stack.extend(getattr(value, name) for name in type(value).__slots__)
+        else:
+            continue
+        seen.add(id(value))
+        total += sys.getsizeof(value)
+    return total, len(seen)
+
+def walk(root, getters):
+    # read every field of every node by name, the way a pass would
+    stack = [root]
+    n = 0
+    while stack:
+        value = stack.pop()
+        if isinstance(value, (list, tuple)):
+            stack.extend(value)
+            continue
+        get = getters.get(type(value).__name__)
+        if get is not None:
+            n += 1
+            stack.extend(get(value))
+    return n
+
+def bench_ast(size_mb, repeat=1):
+    source = generate_source(int(size_mb * MB))
+    program = Parser(Lexer('<bench>', source).tokenize()).parse()
+    del source
+    old = dict_layout(program)
+    arena = Arena.from_program(program)
+    old_bytes, old_objects = tree_bytes(old)
+    new_bytes, new_objects = tree_bytes(program)
+    getters = {cls.__name__: field_getter(cls) for cls in NODE_CLASSES}
+    old_walk, _ = best_time(lambda: walk(old, getters), repeat)
+    new_walk, _ = best_time(lambda: walk(program, getters), repeat)
+    print(f"{size_mb:g}MB script, {len(arena)} nodes")
+    print(f"{'':>14} {'MB':>8} {'bytes/node':>11} {'walk s':>7}")
+    print(f"{'__dict__':>14} {old_bytes / MB:>8.1f} {old_bytes / len(arena):>11.1f} {old_walk:>7.2f}")
+    print(f"{'__slots__':>14} {new_bytes / MB:>8.1f} {new_bytes / len(arena):>11.1f} {new_walk:>7.2f}")
+    print(f"{'Arena':>14} {arena.nbytes() / MB:>8.1f} {arena.nbytes() / len(arena):>11.1f} {'-':>7}")
+
+def bench_parse(sizes, repeat=1):
+    # Pratt parser against the original recursive descent, same token list
+    print(f"{'size':>8} {'tokens':>11} {'Pratt MB/s':>11} {'descent MB/s':>13} {'speedup':>8}")
+    for size_mb in sizes:
+        source = generate_expressions(int(size_mb * MB))
+        tokens = Lexer('<bench>', source).tokenize()
+        if repr(Parser(tokens).parse()) != repr(DescentParser(tokens).parse()):
+            print(f"parse trees differ at {size_mb} MB", file=sys.stderr)
+            sys.exit(1)
+        # alternate the two so drift on a busy machine hits both alike;
+        # both with the cyclic gc off, as bgbasic runs them
+        seconds = ref_seconds = None
+        for _ in range(repeat):
+            with cache.gc_paused():
+                t, _ = best_time(lambda: Parser(tokens).parse() and None, 1)
+            seconds = t if seconds is None else min(seconds, t)
+            with cache.gc_paused():
+                t, _ = best_time(lambda: DescentParser(tokens).parse() and None, 1)
+            ref_seconds = t if ref_seconds is None else min(ref_seconds, t)
+        print(f"{size_mb:>6g}MB {len(tokens):>11} {len(source) / MB / seconds:>11.2f} "
+              f"{len(source) / MB / ref_seconds:>13.2f} {ref_seconds / seconds:>7.1f}x")
+
+def bench_cache(size_mb, repeat=1):
+    # cold start up to the point the engine starts running: parse from
+    # source against a hit in the on-disk cache
+    source = generate_source(int(size_mb * MB))
+    print(f"{'engine':>8} {'cache MB':>9} {'build s':>8} {'load s':>7} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        path = os.path.join(cache_dir, 'bench.erb')
+        for engine in ('tree', 'vm', 'py'):
+            cache.load_program(path, source, engine, cache_dir=cache_dir)
+            cache_file = cache.cache_path(path, engine, 0, cache_dir)
+            build = load = None
+            for _ in range(repeat):
+                with cache.gc_paused():
+                    t, _ = best_time(lambda: cache.build(source, path, engine) and None, 1)
+                build = t if build is None else min(build, t)
+                with cache.gc_paused():
+                    t, _ = best_time(lambda: cache.load_program(path, source, engine, cache_dir=cache_dir) and None, 1)
+                load = t if load is None else min(load, t)
+            print(f"{engine:>8} {os.path.getsize(cache_file) / MB:>9.1f} {build:>8.2f} "
+                  f"{load:>7.2f} {build / load:>7.1f}x")
+
+def latency(fn, requests):
+    # per-request wall time in ms: mean, median, 95th percentile
+    times = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return sum(times) / len(times), times[len(times) // 2], times[int(len(times) * 0.95)]
+
+def bench_serve(requests, size, workers=1):
+    # a tiny script run three ways: a fresh bgbasic each time, bgclient
+    # against a warm server, and a submission straight from this process
+    here = os.path.dirname(os.path.abspath(__file__))
+    python = sys.executable
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'tiny.erb')
+        with open(path, 'w') as f:
+            f.write(generate_source(size))
+        socket_path = os.path.join(tmp, 'bench.sock')
+        server = subprocess.Popen([python, os.path.join(here, 'bgbasic'), 'serve',
+                                   '--socket', socket_path, '--workers', str(workers)],
+                                  stderr=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(socket_path):
+                time.sleep(0.01)
+            expected = subprocess.run([python, os.path.join(here, 'bgbasic'), '--no-cache', path],
+                                      capture_output=True, text=True).stdout
+            out = io.StringIO()
+            wire.submit(open(path).read(), path, socket_path=socket_path, stdout=out)
+            if out.getvalue() != expected:
+                print("server output differs from bgbasic", file=sys.stderr)
+                sys.exit(1)
+
+            runs = [
+                ("bgbasic", lambda: subprocess.run(
+                    [python, os.path.join(here, 'bgbasic'), '--no-cache', path],
+                    stdout=subprocess.DEVNULL)),
+                ("bgclient", lambda: subprocess.run(
+                    [python, os.path.join(here, 'bgclient'), '--socket', socket_path, path],
+                    stdout=subprocess.DEVNULL)),
+                ("in-process", lambda: wire.submit(
+                    open(path).read(), path, socket_path=socket_path, stdout=io.StringIO())),
+            ]
+            print(f"{'client':>12} {'mean ms':>8} {'p50 ms':>7} {'p95 ms':>7}")
+            for name, fn in runs:
+                mean, p50, p95 = latency(fn, requests)
+                print(f"{name:>12} {mean:>8.1f} {p50:>7.1f} {p95:>7.1f}")
+        finally:
+            server.terminate()
+            server.wait()
+
+def chain_source(depth, cyclic=False):
+    # a{i} = a{i-1} + 1: forcing the last one forces all of them, nested
+    first = f'a{depth - 1} + 1' if cyclic else '1'
+    lines = [f'a0 = {first}'] + [f'a{i} = a{i - 1} + 1' for i in range(1, depth)]
+    lines.append(f'rintperb a{depth - 1}')
+    return '\n'.join(lines) + '\n'
+
+def bench_thunks(depths, engines):
+    # stress test: thunk chains far deeper than the recursion limit must
+    # force without RecursionError, and a cycle must be reported, not hang
+    engine_classes = {'tree': Interpreter, 'vm': VM, 'py': PyEngine}
+    failed = False
+    print(f"{'engine':>6} {'depth':>15} {'force s':>8}  result")
+    for engine in engines:
+        for depth in depths:
+            for cyclic in (False, True):
+                program, _ = cache.build(chain_source(depth, cyclic), '<bench>', engine)
+                out = io.StringIO()
+                start = time.perf_counter()
+                try:
+                    with contextlib.redirect_stdout(out):
+                        cache.run_program(engine_classes[engine](), program, engine)
+                    result = out.getvalue().strip()
+                except InterpreterError as e:
+                    result = f"error: {e}"
+                except RecursionError:
+                    result = "RecursionError"
+                seconds = time.perf_counter() - start
+                expected = "error: Cyclic definition" if cyclic else str(depth)
+                ok = result.startswith(expected)
+                failed = failed or not ok
+                label = f"{depth}{' cyclic' if cyclic else ''}"
+                print(f"{engine:>6} {label:>15} {seconds:>8.2f}  {result[:40]}{'' if ok else '  FAILED'}")
+    if failed:
+        sys.exit(1)
+
+def lazylist_source(size, work, read):
+    # xs = [a + a + ... + 1, a + a + ... + 2, ...]: every element reads a,
+    # so none is strict; then print nothing, one slot, or the whole list
+    term = ' + '.join(['a'] * work)
+    lines = ['a = 1', 'xs = [' + ', '.join(f'{term} + {i}' for i in range(size)) + ']']
+    if read == 'one':
+        lines.append(f'rintperb xs[{size // 2}]')
+    elif read == 'all':
+        lines.append('rintperb xs')
+    return '\n'.join(lines) + '\n'
+
+def bench_lazylist(sizes, work, engines, repeat=1):
+    # indexing one element of a list literal must cost one element, not
+    # the whole list. Only the run is timed, and the run of the same
+    # program without the rintperb (building xs, resolving names) is
+    # taken off, so what is left is the cost of reading xs
+    engine_classes = {'tree': Interpreter, 'vm': VM, 'py': PyEngine}
+    print(f"{'engine':>6} {'elements':>9} {'build ms':>9} {'xs[k] ms':>9} {'xs ms':>9}")
+    for engine in engines:
+        for size in sizes:
+            row = []
+            for read in ('none', 'one', 'all'):
+                program, _ = cache.build(lazylist_source(size, work, read), '<bench>', engine)
+
+                def run():
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        cache.run_program(engine_classes[engine](), program, engine)
+                row.append(best_time(run, repeat)[0] * 1000)
+            build, one, whole = row
+            print(f"{engine:>6} {size:>9} {build:>9.2f} {max(one - build, 0):>9.2f} {max(whole - build, 0):>9.2f}")
+
+def match_source(cases, iterations):
+    # atchmerb over `cases` literal asecerbs and a fallback, the way lookup
+    # tables get generated; every value hits a different case
+    lines = [f'orferb i in 1..{iterations}', '  atchmerb i % ' + str(cases + 1)]
+    lines += [f'    asecerb {c} henterb rintperb {c * 7}' for c in range(cases)]
+    lines += ['    asecerb _ henterb rintperb 0-1', '  ndeerb', 'ndeerb']
+    return '\n'.join(lines) + '\n'
+
+def bench_match(cases_list, iterations, engines, repeat=1):
+    # time per atchmerb must not grow with the number of asecerbs
+    engine_classes = {'tree': Interpreter, 'vm': VM, 'py': PyEngine}
+    print(f"{'engine':>6} {'cases':>7} {'us/match':>9}")
+    for engine in engines:
+        for cases in cases_list:
+            program, _ = cache.build(match_source(cases, iterations), '<bench>', engine)
+
+            def run():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    cache.run_program(engine_classes[engine](), program, engine)
+            seconds, _ = best_time(run, repeat)
+            print(f"{engine:>6} {cases:>7} {seconds / iterations * 1e6:>9.2f}")
+
+CSE_SOURCE = """\
+hingterb Pos
+  rgaerb x
+  rgaerb y
+ndeerb
+hingterb Person
+  rgaerb pos
+ndeerb
+p = ewnerb Person[ewnerb Pos[3, 4]]
+arr = 1..100
+orferb i in 1..{iterations}
+  d = p.pos.x * p.pos.x + p.pos.y * p.pos.y + arr[i % 100 + 1] * arr[i % 100 + 1]
+  rintperb d
+ndeerb
+"""
+
+def bench_cse(iterations, repeat=1):
+    # the tree-walker on a loop full of repeated subexpressions, and on a
+    # chain with none, where the sharing pass is pure overhead
+    runs = [
+        ('repeated', CSE_SOURCE.format(iterations=iterations)),
+        ('distinct', chain_source(iterations)),
+    ]
+    print(f"{'source':>10} {'run s':>8} {'saved':>8}")
+    for name, source in runs:
+        program, _ = cache.build(source, '<bench>', 'tree')
+        interpreters = []
+
+        def run():
+            interpreter = Interpreter()
+            interpreters.append(interpreter)
+            with contextlib.redirect_stdout(io.StringIO()):
+                interpreter.interpret(program)
+        seconds, _ = best_time(run, repeat)
+        saved = getattr(interpreters[-1], 'evaluations_saved', '-')
+        print(f"{name:>10} {seconds:>8.3f} {saved:>8}")
+
+HOOKS_SOURCE = """\
+hingterb Pos
+  rgaerb x
+  rgaerb y
+ndeerb
+orferb i in 1..{iterations}
+  p = ewnerb Pos[i, i % 3]
+  atchmerb p.y
+    asecerb 0 henterb rintperb p.x * 2
+    asecerb 1 henterb rintperb p.x + 1
+    lseerb rintperb p.x ndeerb
+ndeerb
+"""
+
+def bench_hooks(iterations, repeat=1):
+    # an Interpreter that never had hooks, one whose hooks were all removed
+    # again, and one with a do-nothing hook on every event. The first two
+    # must be the same object layout and the same speed
+    program, _ = cache.build(HOOKS_SOURCE.format(iterations=iterations), '<bench>', 'tree')
+    events = sorted(HOOKED_METHODS)
+    traced = {name for names in HOOKED_METHODS.values() for name in names}
+
+    def noop(*args):
+        pass
+
+    def plain():
+        return Interpreter()
+
+    def removed():
+        interpreter = Interpreter()
+        for event in events:
+            interpreter.add_hook(event, noop)
+        for event in events:
+            interpreter.remove_hook(event, noop)
+        return interpreter
+
+    def hooked():
+        calls = [0]
+
+        def count(*args):
+            calls[0] += 1
+        interpreter = Interpreter()
+        interpreter.calls = calls
+        for event in events:
+            interpreter.add_hook(event, count)
+        return interpreter
+
+    print(f"{'hooks':>8} {'run s':>8} {'vs none':>8} {'calls':>9}")
+    failed = False
+    baseline = None
+    for name, make in (('none', plain), ('removed', removed), ('all', hooked)):
+        interpreters = []
+
+        def run():
+            interpreter = make()
+            interpreters.append(interpreter)
+            with contextlib.redirect_stdout(io.StringIO()):
+                interpreter.interpret(program)
+        seconds, _ = best_time(run, repeat)
+        if baseline is None:
+            baseline = seconds
+        interpreter = interpreters[-1]
+        calls = interpreter.calls[0] if name == 'all' else 0
+        # disabled means not one hooked method left on the instance
+        leftover = traced & interpreter.__dict__.keys()
+        ok = name == 'all' or not leftover
+        failed = failed or not ok
+        print(f"{name:>8} {seconds:>8.3f} {seconds / baseline:>7.2f}x {calls:>9}"
+              f"{'' if ok else '  FAILED: ' + ', '.join(sorted(leftover))}")
+    if failed:
+        sys.exit(1)
+
+# The workloads of `bench.py suite`: name -> (source for a size, default
+# sizes, what the size counts). Each one stresses one part of the
+# language and scales with its size, so the sweep shows whether time grows
+# linearly.
+
+def arith_source(lines):
+    # a chain of arithmetic lines; printing the last one forces them all,
+    # nested deeper than the recursion limit
+    body = ['a0 = 1'] + [f'a{i} = (a{i - 1} * 3 + {i}) % 1000 - {i % 7}' for i in range(1, lines)]
+    return '\n'.join(body + [f'rintperb a{lines - 1}']) + '\n'
+
+def loop_source(iterations):
+    return (f'orferb i in 1..{iterations}\n'
+            f'  rintperb (i * 3 + 7) % 11 + i / 4\n'
+            f'ndeerb\n')
+
+def lists_source(elements):
+    # a big list literal, half numbers and half expressions, then every
+    # element read once by index
+    items = ', '.join(str(i) if i % 2 else f'{i} * k' for i in range(1, elements + 1))
+    return (f'k = 3\nxs = [{items}]\n'
+            f'orferb i in 1..{elements}\n'
+            f'  rintperb xs[i] + xs[{elements + 1} - i]\n'
+            f'ndeerb\n')
+
+def things_source(allocations):
+    return (HEADER
+            + 'hingterb Person\n  rgaerb name\n  rgaerb pos\nndeerb\n'
+            + f'orferb i in 1..{allocations}\n'
+            + '  p = ewnerb Person["p", ewnerb Position[i, i * 2]]\n'
+            + '  rintperb p.pos.x + p.pos.y * p.pos.x\n'
+            + 'ndeerb\n')
+
+SUITE_MATCHES = 5000
+
+WORKLOADS = {
+    'arith': (arith_source, [2500, 5000, 10000], 'lines'),
+    'loop': (loop_source, [10000, 20000, 40000], 'iterations'),
+    'lists': (lists_source, [2500, 5000, 10000], 'elements'),
+    'things': (things_source, [2500, 5000, 10000], 'allocations'),
+    'match': (lambda cases: match_source(cases, SUITE_MATCHES), [250, 500, 1000], 'cases'),
+    'generated': (generate_source, [MB // 4, MB // 2, MB], 'bytes'),
+}
+
+ENGINE_CLASSES = {'tree': Interpreter, 'vm': VM, 'py': PyEngine}
+PHASES = ('lex', 'parse', 'compile', 'execute')
+
+def measure(source, engine, repeat=1):
+    # best time of each phase over `repeat` fresh builds and runs
+    best = {}
+    for _ in range(repeat):
+        stats = RunStats('<bench>', engine)
+        with cache.gc_paused():
+            program, _ = cache.build(source, '<bench>', engine, stats=stats)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            cache.run_program(ENGINE_CLASSES[engine](), program, engine)
+        stats.phases['execute'] = time.perf_counter() - start
+        for phase in PHASES:
+            best[phase] = min(stats.phases[phase], best.get(phase, math.inf))
+    return best
+
+def scaling(size, seconds, last):
+    # t ~ size ** k between this size and the one before: 1 is linear
+    if last is None or last[1] <= 0 or seconds <= 0:
+        return None
+    return math.log(seconds / last[1]) / math.log(size / last[0])
+
+def bench_suite(workloads, engines, scale, repeat=1, out=None):
+    # every workload at every size: time per phase, and how total time
+    # grew against the size before, flagged past NONLINEAR
+    results = []
+    print(f"{'workload':<10} {'engine':>6} {'size':>9} {'lex ms':>8} {'parse ms':>9} "
+          f"{'compile ms':>10} {'exec ms':>9} {'total ms':>9} {'scaling':>8}")
+    for name in workloads:
+        make_source, sizes, unit = WORKLOADS[name]
+        for engine in engines:
+            last = None
+            for size in sizes:
+                size = max(1, int(size * scale))
+                phases = measure(make_source(size), engine, repeat)
+                total = sum(phases.values())
+                k = scaling(size, total, last)
+                last = (size, total)
+                results.append({'workload': name, 'engine': engine, 'size': size, 'unit': unit,
+                                'phases': phases, 'total': total, 'scaling': k})
+                flag = '' if k is None else f"{k:>7.2f}{'!' if k > NONLINEAR else ' '}"
+                print(f"{name:<10} {engine:>6} {size:>9} " + ' '.join(
+                    f"{phases[phase] * 1000:>{width}.2f}" for phase, width in zip(PHASES, (8, 9, 10, 9)))
+                    + f" {total * 1000:>9.2f} {flag:>8}")
+    if out is not None:
+        with open(out, 'w') as f:
+            json.dump({
+                'version': 1,
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'repeat': repeat,
+                'results': results,
+            }, f, indent=1)
+            f.write('\n')
+        print(f"results written to {out}")
+
+# total time growing faster than size ** NONLINEAR is flagged
+NONLINEAR = 1.3
+
+def load_results(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        return {(r['workload'], r['engine'], r['size']): r for r in data['results']}
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Could not read results from {path}: {e}", file=sys.stderr)
+        sys.exit(2)
+
+def bench_compare(base_path, new_path, threshold, min_ms):
+    # a phase regressed when it is more than threshold slower and by more
+    # than min_ms, so noise on tiny phases does not count
+    base = load_results(base_path)
+    new = load_results(new_path)
+    # keys of results with any phase regressed
+    regressed = set()
+    print(f"{'workload':<10} {'engine':>6} {'size':>9} {'phase':>8} {'base ms':>9} {'new ms':>9} {'change':>8}")
+    for key, old in base.items():
+        if key not in new:
+            print(f"{key[0]:<10} {key[1]:>6} {key[2]:>9} missing from {new_path}")
+            continue
+        rows = [(phase, old['phases'].get(phase), new[key]['phases'].get(phase)) for phase in PHASES]
+        rows.append(('total', old['total'], new[key]['total']))
+        for phase, before, after in rows:
+            if before is None or after is None:
+                continue
+            change = (after - before) / before if before > 0 else 0.0
+            verdict = ''
+            if abs(after - before) * 1000 >= min_ms:
+                if change > threshold:
+                    verdict = 'REGRESSION'
+                    regressed.add(key)
+                elif change < -threshold:
+                    verdict = 'faster'
+            # totals always, phases only when they moved
+            if phase == 'total' or verdict:
+                print(f"{key[0]:<10} {key[1]:>6} {key[2]:>9} {phase:>8} {before * 1000:>9.2f} "
+                      f"{after * 1000:>9.2f} {change:>+7.1%}  {verdict}".rstrip())
+    print(f"{len(regressed)} of {len(base)} results regressed "
+          f"(a phase slower by more than {threshold:.0%} and {min_ms:g}ms)")
+    if regressed:
+        sys.exit(1)
+
+def main():
+    p = argparse.ArgumentParser(prog="bench.py", description="BigBasic benchmarks")
+    sub = p.add_subparsers(dest="suite", required=True)
+
+    lex = sub.add_parser("lexer", help="Lexer throughput on generated sources")
+    lex.add_argument("--sizes", type=float, nargs="+", default=[1, 10, 100],
+        help="Source sizes in MB (default: 1 10 100)")
+    lex.add_argument("--repeat", type=int, default=1, help="Runs per size, best is reported")
+    lex.add_argument("--reference-max", type=float, default=1.0,
+        help="Also run and cross-check CharLexer up to this size in MB (default: 1)")
+
+    tok = sub.add_parser("tokens", help="Token stream memory and parse time")
+    tok.add_argument("--size", type=float, default=5, help="Source size in MB (default: 5)")
+    tok.add_argument("--repeat", type=int, default=1, help="Runs per measurement, best is reported")
+
+    ast = sub.add_parser("ast", help="AST memory: __dict__ nodes, __slots__ nodes and Arena")
+    ast.add_argument("--size", type=float, default=10, help="Source size in MB (default: 10)")
+    ast.add_argument("--repeat", type=int, default=1, help="Runs per measurement, best is reported")
+
+    prs = sub.add_parser("parse", help="Parser throughput on expression-dense sources")
+    prs.add_argument("--sizes", type=float, nargs="+", default=[1, 5],
+        help="Source sizes in MB (default: 1 5)")
+    prs.add_argument("--repeat", type=int, default=1, help="Runs per size, best is reported")
+
+    cch = sub.add_parser("cache", help="Parsing from source against loading the compiled-program cache")
+    cch.add_argument("--size", type=float, default=5, help="Source size in MB (default: 5)")
+    cch.add_argument("--repeat", type=int, default=1, help="Runs per measurement, best is reported")
+
+    srv = sub.add_parser("serve", help="Per-request latency: cold bgbasic against bgbasic serve")
+    srv.add_argument("--requests", type=int, default=50, help="Submissions per client (default: 50)")
+    srv.add_argument("--size", type=int, default=2000, help="Script size in bytes (default: 2000)")
+    srv.add_argument("--workers", type=int, default=1, help="Server worker processes (default: 1)")
+
+    thk = sub.add_parser("thunks", help="Stress test: force thunk chains far deeper than the recursion limit")
+    thk.add_argument("--depths", type=int, nargs="+", default=[1000, 10000, 50000],
+        help="Chain lengths (default: 1000 10000 50000)")
+    thk.add_argument("--engines", nargs="+", choices=("tree", "vm", "py"), default=["tree", "vm", "py"])
+
+    lzl = sub.add_parser("lazylist", help="Indexing one element of a big list literal against forcing all of it")
+    lzl.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+        help="List lengths (default: 100 1000 10000)")
+    lzl.add_argument("--work", type=int, default=50, help="Additions per element (default: 50)")
+    lzl.add_argument("--engines", nargs="+", choices=("tree", "vm", "py"), default=["tree", "vm", "py"])
+    lzl.add_argument("--repeat", type=int, default=3, help="Runs per measurement, best is reported")
+
+    mat = sub.add_parser("match", help="atchmerb dispatch time against the number of literal asecerbs")
+    mat.add_argument("--cases", type=int, nargs="+", default=[10, 100, 1000],
+        help="Literal asecerbs per atchmerb (default: 10 100 1000)")
+    mat.add_argument("--iterations", type=int, default=20000, help="Matches per run (default: 20000)")
+    mat.add_argument("--engines", nargs="+", choices=("tree", "vm", "py"), default=["tree", "vm", "py"])
+    mat.add_argument("--repeat", type=int, default=3, help="Runs per measurement, best is reported")
+
+    cse = sub.add_parser("cse", help="Tree-walker time with shared common subexpressions")
+    cse.add_argument("--iterations", type=int, default=20000, help="Loop iterations and chain length (default: 20000)")
+    cse.add_argument("--repeat", type=int, default=3, help="Runs per measurement, best is reported")
+
+    hks = sub.add_parser("hooks", help="Tree-walker time with no hooks, hooks removed again, and hooks on every event")
+    hks.add_argument("--iterations", type=int, default=20000, help="Loop iterations (default: 20000)")
+    hks.add_argument("--repeat", type=int, default=3, help="Runs per measurement, best is reported")
+
+    sui = sub.add_parser("suite", help="Lex, parse, compile and execute times of every workload over a sweep of sizes")
+    sui.add_argument("--workloads", nargs="+", choices=sorted(WORKLOADS), default=list(WORKLOADS),
+        help="Workloads to run (default: all)")
+    sui.add_argument("--engines", nargs="+", choices=("tree", "vm", "py"), default=["tree"])
+    sui.add_argument("--scale", type=float, default=1.0,
+        help="Multiply every size by this, e.g. 0.1 for a quick run (default: 1)")
+    sui.add_argument("--repeat", type=int, default=3, help="Runs per measurement, best is reported")
+    sui.add_argument("--out", help="Save the results as JSON to this file")
+
+    cmp = sub.add_parser("compare", help="Flag regressions between two `suite --out` result files")
+    cmp.add_argument("base", help="Results to compare against")
+    cmp.add_argument("new", help="Results to check")
+    cmp.add_argument("--threshold", type=float, default=0.10,
+        help="Slowdown that counts as a regression, as a fraction (default: 0.10)")
+    cmp.add_argument("--min-ms", type=float, default=2.0,
+        help="Ignore changes smaller than this many milliseconds (default: 2)")
+
+    args = p.parse_args()
+    if args.suite == "lexer":
+        bench_lexer(args.sizes, args.repeat, args.reference_max)
+    elif args.suite == "tokens":
+        bench_tokens(args.size, args.repeat)
+    elif args.suite == "ast":
+        bench_ast(args.size, args.repeat)
+    elif args.suite == "parse":
+        bench_parse(args.sizes, args.repeat)
+    elif args.suite == "cache":
+        bench_cache(args.size, args.repeat)
+    elif args.suite == "serve":
+        bench_serve(args.requests, args.size, args.workers)
+    elif args.suite == "thunks":
+        bench_thunks(args.depths, args.engines)
+    elif args.suite == "lazylist":
+        bench_lazylist(args.sizes, args.work, args.engines, args.repeat)
+    elif args.suite == "match":
+        bench_match(args.cases, args.iterations, args.engines, args.repeat)
+    elif args.suite == "cse":
+        bench_cse(args.iterations, args.repeat)
+    elif args.suite == "hooks":
+        bench_hooks(args.iterations, args.repeat)
+    elif args.suite == "suite":
+        bench_suite(args.workloads, args.engines, args.scale, args.repeat, args.out)
+    elif args.suite == "compare":
+        bench_compare(args.base, args.new, args.threshold, args.min_ms)
+
+if __name__ == "__main__":
+    main()
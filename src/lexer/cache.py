@@ -0,0 +1,164 @@
+import gc
+import os
+import sys
+import marshal
+import time
+import pickle
+import hashlib
+import tempfile
+import contextlib
+
+from lexer import Lexer
+from parser import Parser
+from compiler import Compiler, Code
+from transpiler import PyEngine
+from optimizer import Optimizer, O_NONE
+from strictness import StrictnessAnalyzer
+from cse import Sharer
+from stats import count_nodes
+
+# Compiled programs are cached like Python's __pycache__: one file per
+# script, engine and -O level, next to the script or under a cache dir.
+#
+#   header   MAGIC, then a line naming python version, engine, -O level
+#            and the sha256 of the source; any mismatch is a miss
+#   payload  tree: pickled AST (strictness flags and shared
+#                  subexpressions included)
+#            vm:   marshalled (ops, consts, names)
+#            py:   marshalled Python code object
+
+CACHE_DIR_NAME = '__bbcache__'
+# bump whenever the AST, bytecode or generated Python changes shape
+FORMAT_VERSION = 12
+MAGIC = b'BBC\x00' + FORMAT_VERSION.to_bytes(2, 'little')
+
+
+def cache_path(source_path, engine, opt_level, cache_dir=None):
+    source_path = os.path.abspath(source_path)
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    file_name = f"{name}.{sys.implementation.cache_tag}-{engine}-O{opt_level}.bbc"
+    if cache_dir is None:
+        return os.path.join(os.path.dirname(source_path), CACHE_DIR_NAME, file_name)
+    # mirror the script's directory so equal names never collide
+    return os.path.join(cache_dir, os.path.dirname(source_path).lstrip(os.sep), file_name)
+
+def header(source, engine, opt_level):
+    digest = hashlib.sha256(source.encode('utf-8', 'surrogatepass')).hexdigest()
+    key = f"{sys.implementation.cache_tag} {engine} O{opt_level} {digest}\n"
+    return MAGIC + key.encode('ascii')
+
+@contextlib.contextmanager
+def gc_paused():
+    # for entry points around build and load: a program is millions of
+    # objects allocated at once but never a cycle, so the cyclic gc would
+    # only keep rescanning it. Nothing here turns the collector off by
+    # itself, that is up to whoever owns the process
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def build(source, path, engine='tree', opt_level=O_NONE, stats=None):
+    # source -> what the engine runs, plus the strictness report. A
+    # stats.RunStats gets the time of each phase and what lex and parse made
+    clock = time.perf_counter
+    start = clock()
+    tokens = Lexer(path, source).tokenize()
+    lexed = clock()
+    ast = Parser(tokens).parse()
+    parsed = clock()
+    ast = Optimizer(opt_level).optimize(ast)
+    report = StrictnessAnalyzer().analyze(ast)
+    if engine == 'vm':
+        program = Compiler().compile(ast)
+    elif engine == 'py':
+        program = PyEngine().compile(ast, path)
+    else:
+        Sharer().share(ast)
+        program = ast
+    if stats is not None:
+        stats.phases.update(lex=lexed - start, parse=parsed - lexed, compile=clock() - parsed)
+        # not counting the end marker
+        stats.tokens = len(tokens) - 1
+        stats.statements = len(ast.statements)
+        stats.nodes = count_nodes(ast)
+    return program, report
+
+def dumps(program, engine):
+    if engine == 'vm':
+        return marshal.dumps((program.ops, program.consts, program.names))
+    if engine == 'py':
+        return marshal.dumps(program)
+    return pickle.dumps(program, pickle.HIGHEST_PROTOCOL)
+
+def loads(data, engine):
+    if engine == 'vm':
+        return Code(*marshal.loads(data))
+    if engine == 'py':
+        return marshal.loads(data)
+    return pickle.loads(data)
+
+def load(cache_file, expected_header, engine):
+    try:
+        with open(cache_file, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if not data.startswith(expected_header):
+        return None
+    try:
+        return loads(memoryview(data)[len(expected_header):], engine)
+    except Exception:
+        # truncated or from an incompatible build: treat it as a miss
+        return None
+
+def store(cache_file, expected_header, program, engine):
+    try:
+        payload = dumps(program, engine)
+    except (ValueError, RecursionError):
+        # nested too deep for marshal/pickle: just run it uncached
+        return False
+    # write to a temporary file and rename it into place, so a reader
+    # never sees half a file even with several writers racing
+    try:
+        directory = os.path.dirname(cache_file)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.bbc')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(expected_header)
+                f.write(payload)
+            os.replace(tmp, cache_file)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        # read-only tree or full disk: run uncached, like python does
+        return False
+    return True
+
+def load_program(path, source, engine='tree', opt_level=O_NONE, cache_dir=None, stats=None):
+    # returns (program, report); report is None when it came from the cache
+    cache_file = cache_path(path, engine, opt_level, cache_dir)
+    expected = header(source, engine, opt_level)
+    start = time.perf_counter()
+    program = load(cache_file, expected, engine)
+    if program is not None:
+        if stats is not None:
+            stats.phases['load'] = time.perf_counter() - start
+            stats.cached = True
+        return program, None
+    program, report = build(source, path, engine, opt_level, stats)
+    start = time.perf_counter()
+    store(cache_file, expected, program, engine)
+    if stats is not None:
+        stats.phases['store'] = time.perf_counter() - start
+    return program, report
+
+def run_program(interpreter, program, engine):
+    if engine == 'tree':
+        return interpreter.interpret(program)
+    return interpreter.execute(program)
@@ -0,0 +1,297 @@
+from parser import (
+    ProgramNode, AssignmentNode, ArrayNode, NumberNode, StringNode,
+    IdentifierNode, IndexNode, PrintNode, IfNode, BlockNode,
+    ForNode, ThingDefNode, NewNode, AttrAccessNode,
+    BooleanNode, UnaryOpNode, BinaryOpNode, ComparisonNode,
+    PatternWildcard, MatchNode, PatternVar, PatternLiteral,
+    assigned_names, pattern_names, thing_arities
+)
+from interpreter import compile_cases
+from matcher import leaf_cases
+from opcodes import *
+
+
+# operators with a dedicated opcode, anything else goes through the
+# generic OP_BINARY / OP_COMPARE / OP_UNARY fallbacks
+BINARY_OPS = {
+    'PLUS': OP_ADD, '+': OP_ADD,
+    'MINUS': OP_SUB, '-': OP_SUB,
+    'MUL': OP_MUL, '*': OP_MUL,
+    'DIV': OP_DIV, '/': OP_DIV,
+    'MOD': OP_MOD, '%': OP_MOD,
+    'and': OP_AND,
+    'or': OP_OR,
+}
+
+COMPARE_OPS = {
+    'LT': OP_LT, '<': OP_LT,
+    'GT': OP_GT, '>': OP_GT,
+    'EQEQ': OP_EQ, '==': OP_EQ,
+    'NEQ': OP_NE, '!=': OP_NE,
+}
+
+
+class CompileError(Exception):
+    pass
+
+class Code:
+    def __init__(self, ops, consts, names):
+        # flat instruction stream: ops[pc] is the opcode, ops[pc+1] its argument
+        self.ops = ops
+        self.consts = consts
+        self.names = names
+
+    def __repr__(self):
+        return f"Code(ops={len(self.ops) // 2}, consts={len(self.consts)}, names={len(self.names)})"
+
+class Compiler:
+    def __init__(self, arities=None):
+        # hingterb name -> rgaerbs of the ones defined before this program,
+        # on earlier REPL lines; the program's own are added in compile
+        self.arities = dict(arities or {})
+        self.ops = []
+        self.consts = []
+        self.names = []
+        self.const_index = {}
+        self.name_index = {}
+        # (patch position, expression) for every thunk body still to emit
+        self.pending_thunks = []
+
+    def compile(self, program: ProgramNode):
+        self.arities.update(thing_arities(program.statements))
+        for stmt in program.statements:
+            self.compile_statement(stmt)
+        self.emit(OP_HALT)
+        # thunk bodies live after the main program, each ends in OP_RETURN
+        for pos, expr in self.pending_thunks:
+            self.ops[pos] = len(self.ops)
+            self.compile_expression(expr)
+            self.emit(OP_RETURN)
+        self.pending_thunks = []
+        return Code(self.ops, self.consts, self.names)
+
+    def emit(self, op, arg=0):
+        self.ops.append(op)
+        self.ops.append(arg)
+        # position of the argument, used to patch jump targets
+        return len(self.ops) - 1
+
+    def patch(self, pos, target=None):
+        self.ops[pos] = len(self.ops) if target is None else target
+
+    def const(self, value):
+        # 1, 1.0 and rueterb compare equal, so key on the type as well
+        key = (type(value), value)
+        if key not in self.const_index:
+            self.const_index[key] = len(self.consts)
+            self.consts.append(value)
+        return self.const_index[key]
+
+    def table(self, value):
+        # a jump table holds dicts and jump targets, never shared: not interned
+        self.consts.append(value)
+        return len(self.consts) - 1
+
+    def name(self, name):
+        if name not in self.name_index:
+            self.name_index[name] = len(self.names)
+            self.names.append(name)
+        return self.name_index[name]
+
+    # statements
+
+    def compile_statement(self, node):
+        method = getattr(self, f'compile_{type(node).__name__}', None)
+        if method is not None:
+            method(node)
+        elif not is_expression(node):
+            raise CompileError(f"No eval_{type(node).__name__} method")
+        # a bare expression statement only builds a thunk nobody can force,
+        # so there is nothing to run
+
+    def compile_branch(self, branch):
+        if isinstance(branch, BlockNode):
+            for stmt in branch.statements:
+                self.compile_statement(stmt)
+        else:
+            self.compile_statement(branch)
+
+    def compile_ProgramNode(self, node):
+        for stmt in node.statements:
+            self.compile_statement(stmt)
+
+    def compile_BlockNode(self, node):
+        self.compile_branch(node)
+
+    def compile_AssignmentNode(self, node):
+        if getattr(node.value, 'strict', False):
+            # proved safe by the strictness pass, no thunk needed
+            self.compile_expression(node.value)
+        else:
+            self.pending_thunks.append((self.emit(OP_MAKE_THUNK), node.value))
+        self.emit(OP_STORE_NAME, self.name(node.name))
+
+    def compile_PrintNode(self, node):
+        self.compile_expression(node.expression)
+        self.emit(OP_PRINT)
+
+    def compile_IfNode(self, node):
+        self.compile_expression(node.condition)
+        to_else = self.emit(OP_JUMP_IF_FALSE)
+        self.compile_branch(node.then_branch)
+        if node.else_branch is None:
+            self.patch(to_else)
+            return
+        to_end = self.emit(OP_JUMP)
+        self.patch(to_else)
+        self.compile_branch(node.else_branch)
+        self.patch(to_end)
+
+    def compile_ForNode(self, node):
+        self.compile_expression(node.iterable)
+        self.emit(OP_GET_ITER)
+        loop = len(self.ops)
+        to_end = self.emit(OP_FOR_ITER)
+        self.emit(OP_STORE_NAME, self.name(node.var_name))
+        self.compile_branch(node.body)
+        self.emit(OP_JUMP, loop)
+        self.patch(to_end)
+
+    def compile_ThingDefNode(self, node):
+        self.emit(OP_DEF_THING, self.const((node.name, tuple(node.args))))
+
+    def compile_MatchNode(self, node):
+        # one OP_MATCH runs the decision tree and lands on the case that
+        # matched, see matcher.py; cases the tree never picks are dropped
+        self.compile_expression(node.expr)
+        decision = compile_cases(node.cases, self.arities)
+        match = self.emit(OP_MATCH)
+        targets = [None] * (len(node.cases) + 1)
+        to_end = []
+        for case in sorted(leaf_cases(decision)):
+            pattern, body = node.cases[case]
+            targets[case] = len(self.ops)
+            self.emit(OP_ENTER_SCOPE, self.scope_names(pattern, body))
+            for name in reversed(pattern_names(pattern)):
+                self.emit(OP_STORE_NAME, self.name(name))
+            self.compile_branch(body)
+            self.emit(OP_EXIT_SCOPE)
+            to_end.append(self.emit(OP_JUMP))
+        # nothing matched, the value is still on the stack
+        targets[-1] = len(self.ops)
+        if node.else_branch is not None:
+            self.emit(OP_POP)
+            self.compile_branch(node.else_branch)
+        else:
+            self.emit(OP_NO_MATCH)
+        self.ops[match] = self.table((decision, targets))
+        for pos in to_end:
+            self.patch(pos)
+
+    def scope_names(self, pattern, body):
+        # const: the names an asecerb body can rebind, restored on exit
+        names = assigned_names([body])
+        names.update(pattern_names(pattern))
+        return self.const(tuple(sorted(names)))
+
+    # expressions, compiled strictly: this is the code a thunk runs when forced
+
+    def compile_expression(self, node):
+        method = getattr(self, f'expr_{type(node).__name__}', None)
+        if method is None:
+            raise CompileError(f"No eval_{type(node).__name__} method")
+        method(node)
+
+    def expr_NumberNode(self, node):
+        self.emit(OP_LOAD_CONST, self.const(node.value))
+
+    def expr_StringNode(self, node):
+        self.emit(OP_LOAD_CONST, self.const(node.value))
+
+    def expr_BooleanNode(self, node):
+        self.emit(OP_LOAD_CONST, self.const(node.value))
+
+    def expr_IdentifierNode(self, node):
+        self.emit(OP_LOAD_NAME, self.name(node.name))
+
+    def expr_IndexNode(self, node):
+        # the list is looked up and forced before the index, as in _eval_index
+        self.emit(OP_LOAD_NAME, self.name(node.name))
+        self.compile_expression(node.index)
+        self.emit(OP_INDEX)
+
+    def expr_ArrayNode(self, node):
+        # like the tree-walker: a thunk for each element that needs one, so
+        # reading one element forces only that one
+        for element in node.elements:
+            if getattr(element, 'strict', False):
+                self.compile_expression(element)
+            else:
+                self.pending_thunks.append((self.emit(OP_MAKE_THUNK), element))
+        self.emit(OP_BUILD_LIST, len(node.elements))
+
+    def expr_NewNode(self, node):
+        for arg in node.init_args:
+            self.compile_expression(arg)
+        self.emit(OP_NEW, self.const((node.type_name, len(node.init_args))))
+
+    def expr_AttrAccessNode(self, node):
+        self.compile_expression(node.obj)
+        self.emit(OP_GET_ATTR, self.name(node.attr))
+
+    def expr_UnaryOpNode(self, node):
+        self.compile_expression(node.expr)
+        if node.op == 'not':
+            self.emit(OP_NOT)
+        else:
+            self.emit(OP_UNARY, self.const(node.op))
+
+    def expr_BinaryOpNode(self, node):
+        self.compile_expression(node.left)
+        self.compile_expression(node.right)
+        if node.op in BINARY_OPS:
+            self.emit(BINARY_OPS[node.op])
+        else:
+            self.emit(OP_BINARY, self.const(node.op))
+
+    def expr_RangeNode(self, node):
+        self.compile_expression(node.start)
+        self.compile_expression(node.stop)
+        if node.step is None:
+            self.emit(OP_RANGE, 2)
+        else:
+            self.compile_expression(node.step)
+            self.emit(OP_RANGE, 3)
+
+    def expr_ComparisonNode(self, node):
+        self.compile_expression(node.left)
+        self.compile_expression(node.right)
+        if node.op in COMPARE_OPS:
+            self.emit(COMPARE_OPS[node.op])
+        else:
+            self.emit(OP_COMPARE, self.const(node.op))
+
+
+def is_expression(node):
+    return hasattr(Compiler, f'expr_{type(node).__name__}')
+
+def disassemble(code):
+    lines = []
+    ops = code.ops
+    for pc in range(0, len(ops), 2):
+        op, arg = ops[pc], ops[pc + 1]
+        name = OP_NAMES.get(op, f'?{op}')
+        if op in (OP_LOAD_CONST, OP_NEW, OP_DEF_THING, OP_BINARY, OP_COMPARE, OP_UNARY, OP_ENTER_SCOPE):
+            detail = repr(code.consts[arg])
+        elif op in (OP_LOAD_NAME, OP_STORE_NAME, OP_GET_ATTR):
+            detail = code.names[arg]
+        elif op in (OP_JUMP, OP_JUMP_IF_FALSE, OP_FOR_ITER, OP_MAKE_THUNK):
+            detail = f'-> {arg}'
+        elif op == OP_MATCH:
+            detail = '-> ' + ' '.join('-' if t is None else str(t) for t in code.consts[arg][1])
+        elif op in (OP_BUILD_LIST, OP_RANGE):
+            detail = str(arg)
+        else:
+            detail = ''
+        lines.append(f'{pc:6d} {name:<18} {detail}'.rstrip())
+    return '\n'.join(lines)
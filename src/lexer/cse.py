@@ -0,0 +1,117 @@
+from parser import (
+    NumberNode, StringNode, BooleanNode, IdentifierNode, IndexNode,
+    BinaryOpNode, ComparisonNode, UnaryOpNode, AttrAccessNode
+)
+from arena import split
+
+# Common subexpressions for the tree-walker. Generated scripts repeat
+# things like person.pos.x or arr[i] * arr[i], and every occurrence used
+# to be evaluated on its own.
+#
+# Every expression is hash-consed into a number: its kind, its own field
+# and the numbers of its children, so structurally identical expressions
+# get the same number after one look at each node. An operator, index or
+# attribute expression whose number occurs more than once is shared: it
+# gets a .cse slot, and the interpreter keeps one value per slot, filled
+# by whichever occurrence is forced first. Expressions have no side
+# effects and a variable's binding is a thunk that, once forced, stays
+# put, so that value is good until one of the variables the expression
+# reads is assigned again; readers says which cse slots to drop when a
+# variable is. Each occurrence keeps its own thunk all the same: one made
+# before an assignment and forced after it must see the new binding.
+#
+# cache.build runs this for the tree engine, so it is cached with the
+# tree; the interpreter renumbers a program whose slots would collide
+# with ones it already handed out (REPL lines, a program run twice).
+
+SHAREABLE = frozenset((BinaryOpNode, ComparisonNode, UnaryOpNode, AttrAccessNode, IndexNode))
+LITERAL = (NumberNode, StringNode, BooleanNode)
+
+
+class Sharer:
+    def __init__(self, base=0):
+        # cse slots are base, base + 1, ... base + count - 1
+        self.base = base
+        self.count = 0
+        # variable name -> cse slots of the expressions that read it
+        self.readers = {}
+        # expression nodes that share a slot with another one
+        self.nodes_shared = 0
+
+    def share(self, program):
+        self.number(program)
+        program.sharing = self
+        return self
+
+    def number(self, program):
+        # nodes in reverse pre-order, which puts every child, left to
+        # right, before its parent: the numbers of a node's children are
+        # then the top of a stack. No recursion
+        order = []
+        stack = [program]
+        while stack:
+            node = stack.pop()
+            kids, value = split(node)
+            kids = [kid for kid in kids if kid is not None]
+            order.append((node, value, len(kids)))
+            stack.extend(kids)
+
+        interned = {}
+        occurrences = []
+        # number -> (variable it reads itself or None, child numbers)
+        parts = {}
+        candidates = []
+        numbers = []
+        for node, value, n in reversed(order):
+            cls = node.__class__
+            if n:
+                kids = tuple(numbers[-n:])
+                del numbers[-n:]
+            else:
+                kids = ()
+            if cls in SHAREABLE:
+                key = (cls, value, getattr(node, 'strict', None), kids)
+            elif cls in LITERAL:
+                # 1, 1.0 and rueterb are equal but print differently
+                key = (cls, type(value), value)
+            elif cls is IdentifierNode:
+                key = (cls, value)
+            else:
+                # never shared, and neither is anything containing it
+                key = None
+            number = None if key is None else interned.get(key)
+            if number is None:
+                number = len(occurrences)
+                occurrences.append(0)
+                if key is not None:
+                    # IdentifierNode and IndexNode have the name as value
+                    read = value if cls in (IdentifierNode, IndexNode) else None
+                    interned[key] = number
+                    parts[number] = (read, kids)
+            occurrences[number] += 1
+            numbers.append(number)
+            if cls in SHAREABLE:
+                candidates.append((node, number))
+
+        # the variables each shared expression reads. Below a shared
+        # expression everything is shared too, or a leaf, and has a smaller
+        # number, so going up in order finds it done
+        slots = {}
+        reads = {}
+        for number in sorted({number for _, number in candidates if occurrences[number] > 1}):
+            slots[number] = self.base + self.count
+            self.count += 1
+            read, kids = parts[number]
+            found = set() if read is None else {read}
+            for kid in kids:
+                if kid in reads:
+                    found |= reads[kid]
+                elif parts[kid][0] is not None:
+                    found.add(parts[kid][0])
+            reads[number] = found
+            for name in found:
+                self.readers.setdefault(name, []).append(slots[number])
+        for node, number in candidates:
+            node.cse = slots.get(number)
+            if node.cse is not None:
+                self.nodes_shared += 1
@@ -1,26 +1,130 @@
+import operator
+from array import array
+from itertools import repeat
+
 from parser import (
     ProgramNode, AssignmentNode, ArrayNode, NumberNode, StringNode,
     IdentifierNode, IndexNode, PrintNode, IfNode, BlockNode,
     ForNode, ThingDefNode, NewNode, AttrAccessNode,
     BooleanNode, UnaryOpNode, BinaryOpNode, ComparisonNode,
-    PatternWildcard, MatchNode, PatternVar, PatternLiteral
+    PatternWildcard, MatchNode, PatternVar, PatternLiteral, RangeNode,
+    thing_arities
 )
-
+from resolver import Resolver, UNBOUND
+from matcher import compile_match, thing_patterns, LEAF, FAIL
+from cse import Sharer, SHAREABLE
+
+
+# Forcing a thunk runs its expression, which may force other thunks, and so
+# on: a chain of a hundred thousand definitions would need as many nested
+# Python calls. Instead at most MAX_FORCE_DEPTH forces nest on the stack.
+# A force that would go deeper unwinds back to the outermost one, taking
+# the chain of thunks it was in the middle of, and those are then forced
+# one at a time from the deepest up, each on a fresh stack. Forcing only
+# evaluates expressions, never statements, so rerunning the unwound ones
+# is safe, and everything below them is already forced when they rerun.
+MAX_FORCE_DEPTH = 64
+
+# stands in for fn while a thunk is being forced, to catch self-reference
+FORCING = object()
+
+# a shared subexpression with nothing memoized for it
+MISSING = object()
+
+# the thunks being forced right now, outermost first, under a None pushed
+# by the outermost force
+active = []
+
+# What a run did, for bgbasic --stats: plain ints bumped where the work is
+# done. Thunk, pack, elementwise and new_object serve all three engines, so
+# each of them fills these the same way; stats.RunStats takes the
+# difference over a run
+thunks_made = 0
+thunks_forced = 0
+elements_built = 0
+records_built = 0
+
+def work_done():
+    return thunks_made, thunks_forced, elements_built, records_built
+
+class Unwind(BaseException):
+    # BaseException: nothing between here and the outermost force may catch it
+    def __init__(self, chain):
+        self.chain = chain
 
 class Thunk:
+    __slots__ = ('fn', '_value')
+
     def __init__(self, fn):
+        global thunks_made
+        thunks_made += 1
         self.fn = fn
         self._value = None
-        self._forced = False
 
     def force(self):
-        if not self._forced:
-            self._value = self.fn()
-            self._forced = True
+        # always returns a plain value: a thunk evaluating to a thunk is
+        # collapsed into the final value
+        global thunks_forced
+        fn = self.fn
+        if fn is None:
+            return self._value
+        if not active:
+            return self._force_outermost()
+        if len(active) > MAX_FORCE_DEPTH:
+            raise Unwind(active[1:] + [self])
+        if fn is FORCING:
+            raise RuntimeError("Cyclic definition: a value depends on itself")
+        self.fn = FORCING
+        active.append(self)
+        try:
+            value = fn()
+            while value.__class__ is Thunk:
+                value = value.force()
+        except BaseException:
+            # errors are not cached: forcing again raises again
+            active.pop()
+            self.fn = fn
+            raise
+        active.pop()
+        # drop the closure, and with it the AST and engine it captured
+        self.fn = None
+        self._value = value
+        thunks_forced += 1
+        return value
+
+    def _force_outermost(self):
+        active.append(None)
+        try:
+            try:
+                return self.force()
+            except Unwind as e:
+                return self._force_chain(e.chain)
+        finally:
+            active.pop()
+
+    def _force_chain(self, chain):
+        # chain[0] is self, each next one is what the previous was forcing
+        pending = list(chain)
+        waiting = set(chain)
+        while pending:
+            thunk = pending[-1]
+            if thunk.fn is None:
+                pending.pop()
+                continue
+            try:
+                thunk.force()
+            except Unwind as e:
+                # e.chain[0] is `thunk`, already pending
+                for t in e.chain[1:]:
+                    if t in waiting:
+                        # needs itself, through a cycle too long to nest
+                        raise RuntimeError("Cyclic definition: a value depends on itself") from None
+                    pending.append(t)
+                    waiting.add(t)
         return self._value
 
     def __repr__(self):
-        if self._forced:
+        if self.fn is None:
             return f"<Thunk(value={self._value!r})>"
         else:
             return "<Thunk (unevaluated)>"
@@ -28,16 +132,531 @@ class Thunk:
 class RuntimeError(Exception):
     pass
 
+# Lists whose elements are all ints or all floats are stored packed, in an
+# array('q') or array('d'): eight bytes an element instead of a pointer to
+# a boxed number. Arithmetic between such lists, or between a list and a
+# number, is elementwise and runs as one map over a C operator, with no
+# bytecode per element. Lists are never changed once built, so the packed
+# form only has to read like a list: it prints, compares, indexes and
+# iterates the same. Bools stay in plain lists (they would print as 1 and
+# 0), and so do ints beyond 64 bits and lists mixing ints and floats.
+
+ELEMENTWISE = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    '%': operator.mod,
+}
+
+INTS = frozenset((int,))
+FLOATS = frozenset((float,))
+NUMBERS = frozenset((int, float))
+
+class ListValue:
+    # what a list stored some other way needs to read like a list: printing
+    # and comparisons go through tolist(), against any form of list
+    __slots__ = ()
+    __hash__ = None
+
+    def __repr__(self):
+        return '[' + ', '.join(map(repr, self)) + ']'
+
+    def _compare(self, other, compare):
+        if isinstance(other, ListValue):
+            other = other.tolist()
+        elif not isinstance(other, list):
+            return NotImplemented
+        return compare(self.tolist(), other)
+
+    def __eq__(self, other):
+        return self._compare(other, operator.eq)
+
+    def __ne__(self, other):
+        return self._compare(other, operator.ne)
+
+    def __lt__(self, other):
+        return self._compare(other, operator.lt)
+
+    def __le__(self, other):
+        return self._compare(other, operator.le)
+
+    def __gt__(self, other):
+        return self._compare(other, operator.gt)
+
+    def __ge__(self, other):
+        return self._compare(other, operator.ge)
+
+class NumArray(ListValue, array):
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if isinstance(other, NumArray):
+            return array.__eq__(self, other)
+        return self._compare(other, operator.eq)
+
+# a..b tepserb c: the ints from a to b, never stored. Length, indexing and
+# membership are O(1), through the range object
+class Range(ListValue):
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __contains__(self, value):
+        return value in self.values
+
+    def tolist(self):
+        return list(self.values)
+
+    def __eq__(self, other):
+        if isinstance(other, Range):
+            return self.values == other.values
+        return self._compare(other, operator.eq)
+
+# A list literal whose elements are not all values yet. Each element is
+# forced on its own the first time it is read, and the thunk is replaced by
+# its value; arr[3] forces arr[3] only, and orferb goes through them in
+# order, forcing as it goes
+class LazyList(ListValue):
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        item = self.items[index]
+        if item.__class__ is Thunk:
+            item = self.items[index] = item.force()
+        return item
+
+    def __iter__(self):
+        for index in range(len(self.items)):
+            yield self[index]
+
+    def tolist(self):
+        return list(self)
+
+# type errors name the type of the value, and to BigBasic these are lists
+NumArray.__name__ = 'list'
+Range.__name__ = 'list'
+LazyList.__name__ = 'list'
+
+LIST = (list, NumArray, Range, LazyList)
+
+def make_range(start, stop, step=1):
+    if not isinstance(start, int) or not isinstance(stop, int):
+        raise RuntimeError(f"Type error: .. requires integers, got {type(start).__name__}, {type(stop).__name__}")
+    if not isinstance(step, int):
+        raise RuntimeError(f"Type error: tepserb requires an integer, got {type(step).__name__}")
+    if step == 0:
+        raise RuntimeError("Range step cannot be zero")
+    # both ends are included
+    return Range(range(start, stop + 1 if step > 0 else stop - 1, step))
+
+def built(values):
+    # a list just materialized, counted for --stats
+    global elements_built
+    elements_built += len(values)
+    return values
+
+def pack(values):
+    # a freshly built list -> LazyList while some elements are thunks,
+    # NumArray when it can be one
+    types = set(map(type, built(values)))
+    if Thunk in types:
+        return LazyList(values)
+    if types == INTS:
+        try:
+            return NumArray('q', values)
+        except OverflowError:
+            return values
+    if types == FLOATS:
+        return NumArray('d', values)
+    return values
+
+def number_types(value):
+    # the types of a number or of the elements of a list of numbers
+    if value.__class__ is NumArray:
+        return FLOATS if value.typecode == 'd' else INTS
+    if value.__class__ is Range:
+        return INTS
+    if value.__class__ is list:
+        types = frozenset(map(type, value))
+        return types if types <= NUMBERS else None
+    if value.__class__ is int or value.__class__ is float:
+        return frozenset((value.__class__,))
+    return None
+
+def elementwise(op, left, right):
+    # list op list, list op number, number op list, op one of + - * / %;
+    # None when the operands are not numbers and lists of them, for the
+    # caller's type error
+    # every element is needed: force them all up front
+    if left.__class__ is LazyList:
+        left = pack(left.tolist())
+    if right.__class__ is LazyList:
+        right = pack(right.tolist())
+    left_types = number_types(left)
+    right_types = number_types(right)
+    if left_types is None or right_types is None:
+        return None
+    if op == '%' and not (left_types == INTS and right_types == INTS):
+        return None
+    left_list = isinstance(left, LIST)
+    right_list = isinstance(right, LIST)
+    if left_list and right_list and len(left) != len(right):
+        raise RuntimeError(f"Type error: {op} on lists of different lengths, {len(left)} and {len(right)}")
+    if op in ('/', '%') and (0 in right if right_list else right == 0):
+        raise RuntimeError("Divide by zero")
+
+    def operands():
+        if not right_list:
+            return left, repeat(right, len(left))
+        if not left_list:
+            return repeat(left, len(right)), right
+        return left, right
+
+    fn = ELEMENTWISE[op]
+    types = left_types | right_types
+    if op == '/' or types == FLOATS:
+        return built(NumArray('d', map(fn, *operands())))
+    if types == INTS:
+        try:
+            return built(NumArray('q', map(fn, *operands())))
+        except OverflowError:
+            pass
+    return pack(list(map(fn, *operands())))
+
+# Operation semantics shared by every execution engine. The tree-walker
+# forces the operands, the VM pops them off its stack; both end up here so
+# type checks and error messages cannot drift apart.
+
+def binary_op(op, left, right):
+    # arithmetic
+    if op in ('+', 'PLUS'):
+        if not isinstance(left, (int,float)) or not isinstance(right, (int,float)):
+            result = elementwise('+', left, right)
+            if result is None:
+                raise RuntimeError(f"Type error: + requires numbers, got {type(left).__name__}, {type(right).__name__}")
+            return result
+        return left + right
+    if op in ('-', 'MINUS'):
+        if not isinstance(left, (int,float)) or not isinstance(right, (int,float)):
+            result = elementwise('-', left, right)
+            if result is None:
+                raise RuntimeError(f"Type error: - requires numbers, got {type(left).__name__}, {type(right).__name__}")
+            return result
+        return left - right
+    if op in ('*', 'MUL'):
+        if not isinstance(left, (int,float)) or not isinstance(right, (int,float)):
+            result = elementwise('*', left, right)
+            if result is None:
+                raise RuntimeError(f"Type error: * requires numbers, got {type(left).__name__}, {type(right).__name__}")
+            return result
+        return left * right
+    if op in ('/', 'DIV'):
+        if not isinstance(left, (int,float)) or not isinstance(right, (int,float)):
+            result = elementwise('/', left, right)
+            if result is None:
+                raise RuntimeError(f"Type error: / requires numbers, got {type(left).__name__}, {type(right).__name__}")
+            return result
+        if right == 0:
+            raise RuntimeError("Divide by zero")
+        return left / right
+    if op in ('%', 'MOD'):
+        if not isinstance(left, int) or not isinstance(right, int):
+            result = elementwise('%', left, right)
+            if result is None:
+                raise RuntimeError(f"Type error: % requires integers, got {type(left).__name__}, {type(right).__name__}")
+            return result
+        if right == 0:
+            raise RuntimeError("Divide by zero")
+        return left % right
+
+    # boolean
+    if op == 'and':
+        if not isinstance(left, bool) or not isinstance(right, bool):
+            raise RuntimeError(f"Type error: and requires booleans, got {type(left).__name__}, {type(right).__name__}")
+        return left and right
+    if op == 'or':
+        if not isinstance(left, bool) or not isinstance(right, bool):
+            raise RuntimeError(f"Type error: or requires booleans, got {type(left).__name__}, {type(right).__name__}")
+        return left or right
+
+    raise RuntimeError(f"Unknown binary operator: {op}")
+
+def compare_op(op, left, right):
+    if op in ('<','LT'):
+        return left < right
+    if op in ('>','GT'):
+        return left > right
+    if op in ('==','EQEQ'):
+        return left == right
+    if op in ('!=','NEQ'):
+        return left != right
+    raise RuntimeError(f"Unknown comparison operator: {op}")
+
+def unary_op(op, val):
+    if op == 'not':
+        if not isinstance(val, bool):
+            raise RuntimeError(f"Type error: 'not' requires boolean, got {type(val).__name__}")
+        return not val
+    raise RuntimeError(f"Unknown unary operator: {op}")
+
+def index_value(arr, idx):
+    if not isinstance(arr, LIST):
+        raise RuntimeError(f"Type error: indexing non-list {arr!r}")
+    if not isinstance(idx, int):
+        raise RuntimeError(f"Type error: list index must be integer, got {type(idx).__name__}")
+    if idx < 1 or idx > len(arr):
+        raise RuntimeError(f"Index out of bounds: {idx} not in [1..{len(arr)}]")
+    return arr[idx-1]
+
+def iter_value(iterable):
+    if not isinstance(iterable, LIST):
+        raise RuntimeError(f"Type error: orferb-in requires a list, got {type(iterable).__name__}")
+    return iter(iterable)
+
+def check_condition(cond):
+    if not isinstance(cond, bool):
+        raise RuntimeError(f"Type error: if condition must be boolean, got {type(cond).__name__}")
+    return cond
+
+class Record(tuple):
+    # a hingterb instance: its rgaerb values at fixed offsets. record_type
+    # makes one subclass per hingterb, which knows the field names; values
+    # print, compare and fail exactly like the dicts objects used to be
+    __slots__ = ()
+    __hash__ = None
+    type_name = None
+    fields = ()
+    # field name -> offset
+    offsets = {}
+
+    def __repr__(self):
+        return repr({'__type__': self.type_name, **dict(zip(self.fields, self))})
+
+    def __eq__(self, other):
+        return self.__class__ is other.__class__ and tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __lt__(self, other):
+        return NotImplemented
+
+    __le__ = __gt__ = __ge__ = __lt__
+
+def record_type(name, args):
+    # named dict, since type errors name the type of the value
+    return type('dict', (Record,), {
+        '__slots__': (),
+        'type_name': name,
+        'fields': tuple(args),
+        'offsets': {arg: i for i, arg in enumerate(args)},
+    })
+
+def define_thing(thing_defs, name, args):
+    if name in thing_defs:
+        raise RuntimeError(f"Redefinition of hingterb {name}")
+    thing_defs[name] = record_type(name, args)
+
+def new_object(thing_defs, type_name, args):
+    global records_built
+    if type_name not in thing_defs:
+        raise RuntimeError(f"Unknown hingterb type: {type_name}")
+    cls = thing_defs[type_name]
+    check_arity(type_name, len(cls.fields), len(args))
+    records_built += 1
+    return cls(args)
+
+def check_arity(type_name, expected, got):
+    if got != expected:
+        raise RuntimeError(f"{type_name} expects {expected} rgaerbs, got {got}")
+
+def record_arities(thing_defs):
+    # hingterb name -> number of rgaerbs, of the hingterbs defined so far
+    return {name: len(cls.fields) for name, cls in thing_defs.items()}
+
+def compile_cases(cases, arities):
+    # matcher.compile_match, once every record pattern naming a hingterb in
+    # arities has been checked against it: ewnerb would refuse to build a
+    # record with that many rgaerbs, so the pattern could never match
+    for pattern, _ in cases:
+        for type_name, got in thing_patterns(pattern):
+            if type_name in arities:
+                check_arity(type_name, arities[type_name], got)
+    return compile_match(cases)
+
+def attr_value(obj, attr):
+    try:
+        return obj[obj.offsets[attr]]
+    except (AttributeError, KeyError):
+        pass
+    if not isinstance(obj, Record):
+        raise RuntimeError(f"Type error: accessing attribute on non-object {obj}")
+    if attr == '__type__':
+        return obj.type_name
+    raise RuntimeError(f"Unknown attribute '{attr}' on {obj.type_name}")
+
+def match_part(value, path):
+    for i in path:
+        value = value[i]
+        if value.__class__ is Thunk:
+            value = value.force()
+    return value
+
+def match_value(decision, value):
+    # runs a matcher.compile_match tree against a forced value: the case
+    # that matched and the values of its pattern variables, or None, ()
+    while decision is not FAIL:
+        if decision[0] == LEAF:
+            paths = decision[2]
+            if not paths:
+                return decision[1], ()
+            return decision[1], tuple([match_part(value, path) for path in paths])
+        _, path, table, default = decision
+        part = match_part(value, path) if path else value
+        # the table key, see matcher.py
+        if isinstance(part, Record):
+            part = ('thing', part.type_name, len(part))
+        elif isinstance(part, LIST):
+            part = ('list', len(part))
+        decision = table.get(part, default)
+    return None, ()
+
+# Hooks let an embedder watch a run without patching the interpreter:
+#
+#   statement  fn(node)              a statement is about to run
+#   eval       fn(node, result)      node was evaluated to result, which
+#                                    may be a thunk
+#   thunk      fn(node, thunk)       eval of node built a thunk
+#   force      fn(node, value)       such a thunk was forced to value
+#   new        fn(node, record)      a ewnerb built a hingterb record
+#   match      fn(node, value, case) an atchmerb picked cases[case], or
+#                                    None for its lseerb or no match
+#
+# Nothing on the hot paths checks for hooks. Registering one sets the
+# _traced_ version of the methods its event goes through as an attribute
+# of the instance, which Python finds before the class's; removing the
+# last one deletes them again. With no hooks an Interpreter is exactly the
+# plain one (see bench.py hooks).
+HOOKED_METHODS = {
+    'statement': ('_exec_statements', '_exec_branch'),
+    'eval': ('eval',),
+    'thunk': ('eval',),
+    'force': ('eval',),
+    'new': ('_eval_new',),
+    'match': ('_dispatch',),
+}
+
+
+class HookedForce:
+    # the fn of a thunk built while thunk or force hooks are registered
+    __slots__ = ('interpreter', 'node', 'fn')
+
+    def __init__(self, interpreter, node, fn):
+        self.interpreter = interpreter
+        self.node = node
+        self.fn = fn
+
+    def __call__(self):
+        value = self.fn()
+        while value.__class__ is Thunk:
+            value = value.force()
+        for hook in self.interpreter.hooks.get('force', ()):
+            hook(self.node, value)
+        return value
+
+
 class Interpreter:
     def __init__(self):
-        # variable environment: name -> value
-        self.env = {}
-        # thing definitions: name -> list of arg names
+        # variables live in frame[slot]; the resolver hands out the slots
+        # and keeps the name <-> slot maps for messages and the REPL
+        self.resolver = Resolver()
+        self.frame = []
+        # thing definitions: name -> record type
         self.thing_defs = {}
+        # Thunks not allocated thanks to the strictness pass
+        self.thunks_avoided = 0
+        # variables bound now, and the most there ever were at once
+        self.bound = 0
+        self.env_peak = 0
+        # cse slot -> the value of that shared subexpression, and
+        # variable slot -> the cse slots to drop when it is assigned
+        self.shared = []
+        self.readers = {}
+        self.nodes_shared = 0
+        self.evaluations_saved = 0
+        # event -> callbacks, see HOOKED_METHODS
+        self.hooks = {}
+
+    def add_hook(self, event, fn):
+        if event not in HOOKED_METHODS:
+            raise ValueError(f"Unknown hook event: {event}")
+        self.hooks.setdefault(event, []).append(fn)
+        self._install_hooks()
+
+    def remove_hook(self, event, fn):
+        hooks = self.hooks.get(event)
+        if not hooks or fn not in hooks:
+            raise ValueError(f"No such {event} hook: {fn}")
+        hooks.remove(fn)
+        if not hooks:
+            del self.hooks[event]
+        self._install_hooks()
+
+    def _install_hooks(self):
+        traced = {name for event in self.hooks for name in HOOKED_METHODS[event]}
+        for names in HOOKED_METHODS.values():
+            for name in names:
+                if name in traced:
+                    setattr(self, name, getattr(self, '_traced_' + name.lstrip('_')))
+                else:
+                    self.__dict__.pop(name, None)
+
+    @property
+    def env(self):
+        # name -> value or Thunk, for whoever wants to look at variables
+        names = self.resolver.names
+        return {names[slot]: value for slot, value in enumerate(self.frame) if value is not UNBOUND}
 
     def interpret(self, program: ProgramNode):
+        self.resolver.resolve(program)
+        # decision trees up front, as the compiler builds them, so that a
+        # record pattern that could never match fails before anything runs
+        arities = record_arities(self.thing_defs)
+        arities.update(thing_arities(program.statements))
+        for node in self.resolver.matches:
+            if node.decision is None:
+                node.decision = compile_cases(node.cases, arities)
+        # room for names this program introduced
+        self.frame.extend([UNBOUND] * (len(self.resolver.names) - len(self.frame)))
+        sharing = program.sharing
+        if sharing is None or sharing.base != len(self.shared):
+            sharing = Sharer(len(self.shared)).share(program)
+        self.shared.extend([MISSING] * sharing.count)
+        for name, cses in sharing.readers.items():
+            self.readers.setdefault(self.resolver.slot(name), []).extend(cses)
+        self.nodes_shared += sharing.nodes_shared
+        return self._exec_statements(program.statements)
+
+    def _exec_statements(self, statements):
         result = None
-        for stmt in program.statements:
+        for stmt in statements:
             result = self.eval(stmt)
         return result
 
@@ -45,51 +664,114 @@ class Interpreter:
         method = f'eval_{type(node).__name__}'
         if not hasattr(self, method):
             raise RuntimeError(f"No eval_{type(node).__name__} method")
+        if node.__class__ in SHAREABLE and node.cse is not None:
+            return self._eval_shared(node, getattr(self, method))
         return getattr(self, method)(node)
+
+    def _eval_shared(self, node, evaluate):
+        # every occurrence still gets its own thunk: a thunk reads its
+        # variables when forced, so the slot is only looked at then
+        if getattr(node, 'strict', False):
+            return self._shared_value(node, evaluate)
+        return Thunk(lambda: self._shared_value(node, evaluate))
+
+    def _shared_value(self, node, evaluate):
+        # one evaluation per slot until a variable it reads is assigned,
+        # see cse.py
+        value = self.shared[node.cse]
+        if value is MISSING:
+            value = self.shared[node.cse] = self._force(evaluate(node))
+        else:
+            self.evaluations_saved += 1
+        return value
+
+    def sharing_report(self):
+        return (f"sharing: {self.nodes_shared} expression nodes share {len(self.shared)} memoized values, "
+                f"{self.evaluations_saved} evaluations saved at runtime")
+
+    def _bound(self):
+        # an unbound variable is being assigned
+        self.bound += 1
+        if self.bound > self.env_peak:
+            self.env_peak = self.bound
+
+    def _assigned(self, slot):
+        # frame[slot] changed: forget what was shared on its old value
+        readers = self.readers.get(slot)
+        if readers is not None:
+            shared = self.shared
+            for cse in readers:
+                shared[cse] = MISSING
     
     def _force(self, x):
-        if isinstance(x, Thunk):
-            return self._force(x.force())
-        return x
+        # x is what eval just returned, and a thunk from it was made to be
+        # forced right here: nothing else holds it. It is forced on this
+        # stack and off active, so only the variables it reads count
+        # towards MAX_FORCE_DEPTH. On active, an unwind would rerun the
+        # thunk that built it, which builds it and everything below it
+        # anew: a deep expression would be evaluated again for every level
+        global thunks_forced
+        if x.__class__ is not Thunk:
+            return x
+        fn = x.fn
+        if fn is None:
+            return x._value
+        value = fn()
+        while value.__class__ is Thunk:
+            value = value.force()
+        x.fn = None
+        x._value = value
+        thunks_forced += 1
+        return value
     
     def eval_ProgramNode(self, node):
         return self.interpret(node)
 
     def eval_NumberNode(self, node):
+        if node.strict:
+            self.thunks_avoided += 1
+            return node.value
         return Thunk(lambda: node.value)
 
     def eval_StringNode(self, node):
+        if node.strict:
+            self.thunks_avoided += 1
+            return node.value
         return Thunk(lambda: node.value)
 
     def eval_BooleanNode(self, node):
+        if node.strict:
+            self.thunks_avoided += 1
+            return node.value
         return Thunk(lambda: node.value)
 
     def eval_ArrayNode(self, node):
-        thunks = [ Thunk(lambda e=e: self._force(self.eval(e))) for e in node.elements ]
-        return Thunk(lambda: [self._force(t) for t in thunks])
+        if node.strict:
+            # one thunk for the list plus one per element
+            self.thunks_avoided += 1 + len(node.elements)
+            return pack([self._force(self.eval(e)) for e in node.elements])
+        # a thunk for each element that needs one, none for the list
+        self.thunks_avoided += 1
+        return pack([self.eval(e) for e in node.elements])
 
     def eval_IdentifierNode(self, node):
-        return Thunk(lambda: (
-            self._force(self.env[node.name])
-            if node.name in self.env
-            else (_ for _ in ()).throw(RuntimeError(f"Undefined variable: {node.name}"))
-        ))
+        return Thunk(lambda: self._load(node))
+
+    def _load(self, node):
+        value = self.frame[node.slot]
+        if value is UNBOUND:
+            raise RuntimeError(f"Undefined variable: {node.name}")
+        if value.__class__ is Thunk:
+            return value.force()
+        return value
 
     def eval_IndexNode(self, node):
         return Thunk(lambda: self._eval_index(node))
 
     def _eval_index(self, node):
-        if node.name not in self.env:
-            raise RuntimeError(f"Undefined variable: {node.name}")
-        arr = self._force(self.env[node.name])
+        arr = self._load(node)
         idx = self._force(self.eval(node.index))
-        if not isinstance(arr, list):
-            raise RuntimeError(f"Type error: indexing non-list {arr!r}")
-        if not isinstance(idx, int):
-            raise RuntimeError(f"Type error: list index must be integer, got {type(idx).__name__}")
-        if idx < 1 or idx > len(arr):
-            raise RuntimeError(f"Index out of bounds: {idx} not in [1..{len(arr)}]")
-        return arr[idx-1]
+        return index_value(arr, idx)
 
 
     def eval_PrintNode(self, node):
@@ -99,13 +781,14 @@ class Interpreter:
 
     def eval_AssignmentNode(self, node):
         thunk = self.eval(node.value)
-        self.env[node.name] = thunk
+        if self.frame[node.slot] is UNBOUND:
+            self._bound()
+        self.frame[node.slot] = thunk
+        self._assigned(node.slot)
         return thunk
 
     def eval_IfNode(self, node):
-        cond = self._force(self.eval(node.condition))
-        if not isinstance(cond, bool):
-            raise RuntimeError(f"Type error: if condition must be boolean, got {type(cond).__name__}")
+        cond = check_condition(self._force(self.eval(node.condition)))
         if cond:
             return self._exec_branch(node.then_branch)
         if node.else_branch is not None:
@@ -113,6 +796,8 @@ class Interpreter:
         return None
 
     def _exec_branch(self, branch):
+        # keeps a loop of its own rather than calling _exec_statements: it
+        # runs once per loop iteration
         if isinstance(branch, BlockNode):
             result = None
             for stmt in branch.statements:
@@ -122,20 +807,21 @@ class Interpreter:
             return self.eval(branch)
 
     def eval_ForNode(self, node):
-        iterable = self._force(self.eval(node.iterable))
-        if not isinstance(iterable, list):
-            raise RuntimeError(f"Type error: orferb-in requires a list, got {type(iterable).__name__}")
+        iterable = iter_value(self._force(self.eval(node.iterable)))
         result = None
         for item in iterable:
-            self.env[node.var_name] = Thunk(lambda i=item: i)
+            # item is already a value, wrapping it in a Thunk buys nothing
+            if self.frame[node.slot] is UNBOUND:
+                self._bound()
+            self.frame[node.slot] = item
+            self._assigned(node.slot)
+            self.thunks_avoided += 1
             result = self._exec_branch(node.body)
         return result
 
     def eval_ThingDefNode(self, node):
         # register the type definition
-        if node.name in self.thing_defs:
-            raise RuntimeError(f"Redefinition of hingterb {node.name}")
-        self.thing_defs[node.name] = node.args
+        define_thing(self.thing_defs, node.name, node.args)
         return None
 
     def eval_NewNode(self, node):
@@ -143,124 +829,139 @@ class Interpreter:
 
     def _eval_new(self, node):
         args = [ self._force(self.eval(arg)) for arg in node.init_args ]
-        if node.type_name not in self.thing_defs:
-            raise RuntimeError(f"Unknown hingterb type: {node.type_name}")
-        params = self.thing_defs[node.type_name]
-        if len(args) != len(params):
-            raise RuntimeError(f"{node.type_name} expects {len(params)} rgaerbs, got {len(args)}")
-        obj = {'__type__': node.type_name}
-        for k,v in zip(params, args):
-            obj[k] = v
-        return obj
+        return new_object(self.thing_defs, node.type_name, args)
 
     def eval_AttrAccessNode(self, node):
         return Thunk(lambda: self._eval_attr(node))
 
     def _eval_attr(self, node):
-        obj = self._force(self.eval(node.obj))
-        if not isinstance(obj, dict) or '__type__' not in obj:
-            raise RuntimeError(f"Type error: accessing attribute on non-object {obj}")
-        if node.attr not in obj:
-            raise RuntimeError(f"Unknown attribute '{node.attr}' on {obj['__type__']}")
-        return obj[node.attr]
+        # a.b.c is looked up in one go rather than through a thunk per dot,
+        # down to a shared a.b if there is one
+        attrs = [node.attr]
+        node = node.obj
+        while node.__class__ is AttrAccessNode and node.cse is None:
+            attrs.append(node.attr)
+            node = node.obj
+        obj = self._force(self.eval(node))
+        for attr in reversed(attrs):
+            obj = attr_value(obj, attr)
+        return obj
 
     def eval_UnaryOpNode(self, node):
+        if node.strict:
+            self.thunks_avoided += 1
+            return self._eval_unary(node)
         return Thunk(lambda: self._eval_unary(node))
 
     def _eval_unary(self, node):
         val = self._force(self.eval(node.expr))
-        if node.op == 'not':
-            if not isinstance(val, bool):
-                raise RuntimeError(f"Type error: 'not' requires boolean, got {type(val).__name__}")
-            return not val
-        raise RuntimeError(f"Unknown unary operator: {node.op}")
+        return unary_op(node.op, val)
 
     def eval_BinaryOpNode(self, node):
+        if node.strict:
+            self.thunks_avoided += 1
+            return self._eval_binary(node)
         return Thunk(lambda: self._eval_binary(node))
 
     def _eval_binary(self, node):
         left = self._force(self.eval(node.left))
         right = self._force(self.eval(node.right))
-        op = node.op
+        return binary_op(node.op, left, right)
 
-        # arithmetic
-        if op in ('+', 'PLUS'):
-            if not isinstance(left, (int,float)) or not isinstance(right, (int,float)):
-                raise RuntimeError(f"Type error: + requires numbers, got {type(left).__name__}, {type(right).__name__}")
-            return left + right
-        if op in ('-', 'MINUS'):
-            if not isinstance(left, (int,float)) or not isinstance(right, (int,float)):
-                raise RuntimeError(f"Type error: - requires numbers, got {type(left).__name__}, {type(right).__name__}")
-            return left - right
-        if op in ('*', 'MUL'):
-            if not isinstance(left, (int,float)) or not isinstance(right, (int,float)):
-                raise RuntimeError(f"Type error: * requires numbers, got {type(left).__name__}, {type(right).__name__}")
-            return left * right
-        if op in ('/', 'DIV'):
-            if not isinstance(left, (int,float)) or not isinstance(right, (int,float)):
-                raise RuntimeError(f"Type error: / requires numbers, got {type(left).__name__}, {type(right).__name__}")
-            if right == 0:
-                raise RuntimeError("Divide by zero")
-            return left / right
-        if op in ('%', 'MOD'):
-            if not isinstance(left, int) or not isinstance(right, int):
-                raise RuntimeError(f"Type error: % requires integers, got {type(left).__name__}, {type(right).__name__}")
-            if right == 0:
-                raise RuntimeError("Divide by zero")
-            return left % right
-
-        # boolean
-        if op == 'and':
-            if not isinstance(left, bool) or not isinstance(right, bool):
-                raise RuntimeError(f"Type error: and requires booleans, got {type(left).__name__}, {type(right).__name__}")
-            return left and right
-        if op == 'or':
-            if not isinstance(left, bool) or not isinstance(right, bool):
-                raise RuntimeError(f"Type error: or requires booleans, got {type(left).__name__}, {type(right).__name__}")
-            return left or right
-
-        raise RuntimeError(f"Unknown binary operator: {op}")
+    def eval_RangeNode(self, node):
+        if node.strict:
+            self.thunks_avoided += 1
+            return self._eval_range(node)
+        return Thunk(lambda: self._eval_range(node))
+
+    def _eval_range(self, node):
+        start = self._force(self.eval(node.start))
+        stop = self._force(self.eval(node.stop))
+        if node.step is None:
+            return make_range(start, stop)
+        return make_range(start, stop, self._force(self.eval(node.step)))
 
     def eval_ComparisonNode(self, node):
+        if node.strict:
+            self.thunks_avoided += 1
+            return self._eval_comparison(node)
         return Thunk(lambda: self._eval_comparison(node))
 
     def _eval_comparison(self, node):
         left = self._force(self.eval(node.left))
         right = self._force(self.eval(node.right))
-        op = node.op
-        if op in ('<','LT'):
-            return left < right
-        if op in ('>','GT'):
-            return left > right
-        if op in ('==','EQEQ'):
-            return left == right
-        if op in ('!=','NEQ'):
-            return left != right
-        raise RuntimeError(f"Unknown comparison operator: {op}")
-
-    def _match_pattern(self, pattern, value):
-        if isinstance(pattern, PatternWildcard):
-            return True, {}
-        if isinstance(pattern, PatternLiteral):
-            return (value == pattern.value), {}
-        if isinstance(pattern, PatternVar):
-            return True, {pattern.name: value}
-        raise RuntimeError(f"Unknown pattern type: {pattern}")
+        return compare_op(node.op, left, right)
 
     def eval_MatchNode(self, node):
         val = self._force(self.eval(node.expr))
-        for pattern, body in node.cases:
-            ok, binds = self._match_pattern(pattern, val)
-            if ok:
-                old_env = self.env.copy()
-                for k,v in binds.items():
-                    self.env[k] = Thunk(lambda x=v: x)
-                result = self._exec_branch(body)
-                self.env = old_env
-                return result
+        case, values = self._dispatch(node, val)
+        if case is not None:
+            # the body's bindings are undone afterwards; only the slots
+            # it can rebind need saving, not the whole frame
+            frame = self.frame
+            slots = node.case_slots[case]
+            saved = [frame[slot] for slot in slots]
+            for slot, v in zip(node.bind_slots[case], values):
+                if frame[slot] is UNBOUND:
+                    self._bound()
+                frame[slot] = v
+                self._assigned(slot)
+                self.thunks_avoided += 1
+            result = self._exec_branch(node.cases[case][1])
+            for slot, v in zip(slots, saved):
+                if v is UNBOUND and frame[slot] is not UNBOUND:
+                    self.bound -= 1
+                frame[slot] = v
+                self._assigned(slot)
+            return result
         if node.else_branch is not None:
             return self._exec_branch(node.else_branch)
         raise RuntimeError(f"No pattern matched value: {val}")
 
+    def _dispatch(self, node, val):
+        return match_value(node.decision, val)
+
+    # the hooked versions of HOOKED_METHODS; they call the class's method,
+    # which may be a subclass's, for the actual work
+
+    def _traced_exec_statements(self, statements):
+        result = None
+        for stmt in statements:
+            for hook in self.hooks.get('statement', ()):
+                hook(stmt)
+            result = self.eval(stmt)
+        return result
+
+    def _traced_exec_branch(self, branch):
+        if isinstance(branch, BlockNode):
+            return self._traced_exec_statements(branch.statements)
+        return self._traced_exec_statements((branch,))
+
+    def _traced_eval(self, node):
+        result = type(self).eval(self, node)
+        if result.__class__ is Thunk:
+            fn = result.fn
+            # an assignment hands up the thunk its value built: report and
+            # wrap each thunk once
+            if fn is not None and fn is not FORCING and fn.__class__ is not HookedForce:
+                for hook in self.hooks.get('thunk', ()):
+                    hook(node, result)
+                result.fn = HookedForce(self, node, fn)
+        for hook in self.hooks.get('eval', ()):
+            hook(node, result)
+        return result
+
+    def _traced_eval_new(self, node):
+        record = type(self)._eval_new(self, node)
+        for hook in self.hooks.get('new', ()):
+            hook(node, record)
+        return record
+
+    def _traced_dispatch(self, node, val):
+        case, values = type(self)._dispatch(self, node, val)
+        for hook in self.hooks.get('match', ()):
+            hook(node, val, case)
+        return case, values
+
 
 
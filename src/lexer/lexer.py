@@ -1,10 +1,15 @@
+import re
+from collections import deque
+from itertools import accumulate, compress, repeat
+from operator import sub
+
 from token import (
-    Token,
+    Token, TokenBuffer,
     TK_ADD, TK_SUB, TK_ASSIGN, TK_LESS, TK_MORE,
     TK_L_PAREN, TK_R_PAREN, TK_L_BRACKET, TK_R_BRACKET,
     TK_FLOAT, TK_INT, TK_STRING, TK_NAME, TK_RESERVED,
     TK_SEP, TK_LINEBREAK, TK_DONE, TK_BOOL, TK_EQEQ, TK_NEQ,
-    TK_MUL, TK_DIV, TK_MOD, TK_DOT,
+    TK_MUL, TK_DIV, TK_MOD, TK_DOT, TK_RANGE,
     RESERVED_WORDS
 )
 
@@ -12,7 +17,241 @@ DIGITS = set('0123456789')
 LETTERS = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
 NAME_BITS = LETTERS.union(DIGITS).union({'_'})
 
+# One master pattern, tried at every token start. Every alternative starts
+# with a different character class (a dot starts .. first, then a number,
+# then a lone dot), so the match is exactly the branch CharLexer.tokenize
+# would have taken. Leading blanks are swallowed by the match itself and
+# trailing ones simply never match. A number never takes a dot that starts
+# .., so 1..10 is three tokens.
+LEXEME = r"""(
+     [A-Za-z_][A-Za-z0-9_]*          # identifier or keyword
+    |==|!=|\.\.|[-+=<>()\[\],\n*/%]   # punctuation
+    |[0-9](?:[0-9]|\.(?!\.))*        # number, validated in make_token
+    |\.[0-9](?:[0-9]|\.(?!\.))*
+    |\.
+    |\^\^[^\n]*                      # comment, dropped
+    |"[^"]*"?|'[^']*'?               # string, may be unterminated
+    |[^ \t]                          # anything else is UNKNOWN
+)"""
+TOKEN_RE = re.compile(r"[ \t]*" + LEXEME, re.VERBOSE)
+# the same, but findall returns whole matches, blanks included, so
+# Lexer.buffer() can add up their lengths into source offsets
+MATCH_RE = re.compile(r"[ \t]*(?:" + LEXEME[1:], re.VERBOSE)
+
+PUNCTUATION = {
+    '==': Token(TK_EQEQ, '=='),
+    '!=': Token(TK_NEQ, '!='),
+    '+': Token(TK_ADD),
+    '-': Token(TK_SUB),
+    '=': Token(TK_ASSIGN),
+    '<': Token(TK_LESS),
+    '>': Token(TK_MORE),
+    '(': Token(TK_L_PAREN),
+    ')': Token(TK_R_PAREN),
+    '[': Token(TK_L_BRACKET),
+    ']': Token(TK_R_BRACKET),
+    ',': Token(TK_SEP),
+    '\n': Token(TK_LINEBREAK),
+    '*': Token(TK_MUL),
+    '/': Token(TK_DIV),
+    '%': Token(TK_MOD),
+    '.': Token(TK_DOT),
+    '..': Token(TK_RANGE),
+}
+RESERVED = frozenset(RESERVED_WORDS)
+QUOTES = ('"', "'")
+
+# source is scanned in pieces of about this many characters, cut at a
+# newline, so the list of matched lexemes never grows with the file
+CHUNK_SIZE = 1 << 20
+# smaller reads when streaming from a file, so the first statement runs
+# as soon as possible
+STREAM_CHUNK_SIZE = 64 * 1024
+
 class Lexer:
+    # input_text is either the whole source as a string or an open text
+    # file, which is then read chunk by chunk and never held in full
+    def __init__(self, file_name, input_text):
+        self.file_name = file_name
+        self.text = input_text
+
+    def tokenize(self):
+        tokens = []
+        for chunk in self.token_chunks():
+            tokens.extend(chunk)
+        tokens.append(Token(TK_DONE))
+        return tokens
+
+    def stream(self):
+        # lazily yields the same tokens tokenize() returns
+        for chunk in self.token_chunks():
+            yield from chunk
+        yield Token(TK_DONE)
+
+    def buffer(self):
+        # the compact form of tokenize(): same tokens, plus source offsets.
+        # Columns are filled a chunk at a time with map() so the per-token
+        # work stays out of the interpreter loop.
+        buf = TokenBuffer()
+        table = buf.table
+        kinds = []
+        # lexeme -> index into table, None for a comment
+        ids = {}
+        pos = 0
+        for matches in self.lexeme_chunks(blanks=True):
+            lexemes = list(map(str.lstrip, matches, repeat(' \t', len(matches))))
+            ends = list(accumulate(map(len, matches), initial=pos))
+            pos = ends[-1]
+            del ends[0]
+            starts = list(map(sub, ends, map(len, lexemes)))
+            for lexeme in set(lexemes).difference(ids):
+                tok = PUNCTUATION.get(lexeme) or self.make_token(lexeme)
+                if tok is None:
+                    ids[lexeme] = None
+                else:
+                    ids[lexeme] = len(table)
+                    table.append(tok)
+                    kinds.append(tok.kind)
+            chunk_ids = list(map(ids.__getitem__, lexemes))
+            if None in chunk_ids:
+                keep = [i is not None for i in chunk_ids]
+                chunk_ids = list(compress(chunk_ids, keep))
+                starts = list(compress(starts, keep))
+                ends = list(compress(ends, keep))
+            buf.kinds.frombytes(bytes(map(kinds.__getitem__, chunk_ids)))
+            buf.ids.fromlist(chunk_ids)
+            buf.starts.fromlist(starts)
+            buf.ends.fromlist(ends)
+        done = Token(TK_DONE)
+        buf.kinds.append(done.kind)
+        buf.ids.append(len(table))
+        buf.starts.append(pos)
+        buf.ends.append(pos)
+        table.append(done)
+        return buf
+
+    def token_chunks(self):
+        # tokens are never mutated, so every occurrence of the same lexeme
+        # shares one Token object
+        cache = dict(PUNCTUATION)
+        get = cache.get
+        make_token = self.make_token
+        for lexemes in self.lexeme_chunks():
+            tokens = []
+            append = tokens.append
+            for lexeme in lexemes:
+                tok = get(lexeme)
+                if tok is None:
+                    tok = make_token(lexeme)
+                    if tok is None:
+                        continue
+                    cache[lexeme] = tok
+                append(tok)
+            yield tokens
+
+    def blocks(self):
+        if isinstance(self.text, str):
+            for start in range(0, len(self.text), CHUNK_SIZE):
+                yield self.text[start:start + CHUNK_SIZE]
+        else:
+            while True:
+                block = self.text.read(STREAM_CHUNK_SIZE)
+                if not block:
+                    break
+                yield block
+
+    def lexeme_chunks(self, blanks=False):
+        # lists of lexemes; with blanks=True each keeps its leading blanks
+        findall = (MATCH_RE if blanks else TOKEN_RE).findall
+        carry = ''
+        for block in self.blocks():
+            text = carry + block if carry else block
+            cut = text.rfind('\n') + 1
+            if cut == 0:
+                carry = text
+                continue
+            lexemes = findall(text, 0, cut)
+            if lexemes and is_open_string(lexemes[-1].lstrip(' \t')):
+                # only a string literal can run across a newline: hold it
+                # back and scan it again together with the next block
+                cut -= len(lexemes.pop())
+            yield lexemes
+            carry = text[cut:]
+        if carry:
+            yield findall(carry)
+
+    def make_token(self, lexeme):
+        first = lexeme[0]
+        if first in LETTERS or first == '_':
+            if lexeme == 'rueterb' or lexeme == 'alseferb':
+                return Token(TK_BOOL, lexeme == 'rueterb')
+            return Token(TK_RESERVED if lexeme in RESERVED else TK_NAME, lexeme)
+        if first in DIGITS or (first == '.' and len(lexeme) > 1):
+            dots = lexeme.count('.')
+            if dots > 1:
+                return Token('INVALID_NUMBER', lexeme)
+            return Token(TK_FLOAT, float(lexeme)) if dots else Token(TK_INT, int(lexeme))
+        if first in QUOTES:
+            if is_open_string(lexeme):
+                # unterminated: runs to the end of the input
+                return Token(TK_STRING, lexeme[1:])
+            return Token(TK_STRING, lexeme[1:-1])
+        if lexeme.startswith('^^'):
+            return None
+        return Token('UNKNOWN', lexeme)
+
+def is_open_string(lexeme):
+    return lexeme[0] in QUOTES and (len(lexeme) == 1 or lexeme[-1] != lexeme[0])
+
+# Token source for interactive input. The parser pulls tokens from it like
+# from any iterator; only when it asks for a token past the end of the last
+# line is the next line read, so nothing is ever lexed or parsed twice.
+class LineFeed:
+    def __init__(self, read_line, file_name='<stdin>'):
+        # read_line(prompt) returns the next line, or None at end of input
+        self.read_line = read_line
+        self.file_name = file_name
+        self.tokens = deque()
+        # a statement has started and not been run yet: prompt for more
+        self.pending = False
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self.tokens:
+            if self.closed:
+                return Token(TK_DONE)
+            line = self.read_line("... " if self.pending else ">>> ")
+            if line is None:
+                self.closed = True
+            elif line.strip():
+                self.tokens.extend(Lexer(self.file_name, line + '\n').tokenize()[:-1])
+            elif self.pending:
+                # a blank line ends whatever is open, like end of file does
+                return Token(TK_DONE)
+        tok = self.tokens.popleft()
+        if tok.type != TK_LINEBREAK:
+            self.pending = True
+        return tok
+
+    def line_done(self):
+        # every token of the lines read so far has been handed out: the
+        # next one would have to come from a new line
+        return not self.tokens
+
+    def statement_done(self):
+        self.pending = False
+
+    def discard(self):
+        # drop the rest of the line after an error
+        self.tokens.clear()
+        self.pending = False
+
+# The original char-at-a-time lexer, kept as the reference implementation
+# that Lexer is checked against (see bench.py).
+class CharLexer:
     def __init__(self, file_name, input_text):
         self.file_name = file_name
         self.text = input_text
@@ -57,6 +296,9 @@ class Lexer:
 
         # count dots
         while self.char is not None and (self.char in DIGITS or self.char == '.'):
+            if self.char == '.' and self.peek() == '.':
+                # the start of a range, 1..10
+                break
             if self.char == '.':
                 dot_count += 1
             self.advance()
@@ -121,6 +363,11 @@ class Lexer:
                 tokens.append(Token(TK_NEQ, '!='))
                 continue
 
+            if self.char == '.' and self.peek() == '.':
+                self.advance(); self.advance()
+                tokens.append(Token(TK_RANGE))
+                continue
+
             if self.char in DIGITS or (
                 self.char == '.' and self.peek() is not None and self.peek() in DIGITS
             ):
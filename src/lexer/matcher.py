@@ -0,0 +1,119 @@
+from parser import (
+    PatternWildcard, PatternVar, PatternLiteral, PatternList, PatternThing,
+    irrefutable, pattern_names
+)
+
+# Compiles the asecerb cases of an atchmerb into a decision tree, once, so
+# running a match costs one dict lookup per part of the value it looks at
+# instead of one test per case. Hundreds of literal cases become a single
+# jump table; variables and _ are what a lookup falls back to when the
+# key is not in the table.
+#
+# The tree is plain tuples and dicts, so the VM can keep it in its consts
+# and the cache can marshal it:
+#
+#   (LEAF, case, paths)               cases[case] matched; paths locate the
+#                                     values of its pattern_names
+#   (SWITCH, path, table, default)    look up the key of the value at path
+#                                     in table, go to default if it is not
+#   FAIL                              no case matches
+#
+# A path is a tuple of indexes from the matched value down to a part of
+# it: record rgaerbs and list items are both value[i]. The key of a value
+# is the value itself for numbers, strings and booleans, ('list', n) for a
+# list of n items and ('thing', name, n) for a record of hingterb name. A
+# record pattern with the wrong number of rgaerbs could never match, so the
+# engines check thing_patterns against the hingterbs they know first.
+
+LEAF = 0
+SWITCH = 1
+FAIL = None
+
+WILDCARD = PatternWildcard()
+
+
+def pattern_key(pattern):
+    # (key, sub-patterns) of a refutable pattern
+    if isinstance(pattern, PatternLiteral):
+        return pattern.value, ()
+    if isinstance(pattern, PatternList):
+        return ('list', len(pattern.elements)), tuple(pattern.elements)
+    if isinstance(pattern, PatternThing):
+        return ('thing', pattern.type_name, len(pattern.args)), tuple(pattern.args)
+    raise Exception(f"Unknown pattern type: {pattern}")
+
+def thing_patterns(pattern):
+    # (hingterb name, rgaerbs) of each record pattern in pattern, outermost first
+    if isinstance(pattern, PatternThing):
+        yield pattern.type_name, len(pattern.args)
+        parts = pattern.args
+    elif isinstance(pattern, PatternList):
+        parts = pattern.elements
+    else:
+        return
+    for part in parts:
+        yield from thing_patterns(part)
+
+def compile_match(cases):
+    # a row is (patterns, case, binds): what is left to match of one case,
+    # one pattern per path in paths, and the paths of the variables it
+    # has already bound
+    rows = [((pattern,), case, ()) for case, (pattern, _) in enumerate(cases)]
+    return build(cases, [()], rows)
+
+def build(cases, paths, rows):
+    if not rows:
+        return FAIL
+    patterns, case, binds = rows[0]
+    column = next((i for i, p in enumerate(patterns) if not irrefutable(p)), None)
+    if column is None:
+        # the first case still standing matches whatever is left
+        binds = dict(binds + bound(patterns, paths))
+        return (LEAF, case, tuple(binds[name] for name in pattern_names(cases[case][0])))
+
+    path = paths[column]
+    rest = paths[:column] + paths[column + 1:]
+    # one pass: a refutable row joins the rows of its key, an irrefutable
+    # one joins every key and the default. Keys are dict keys, so 1, 1.0
+    # and rueterb are one key, like == says
+    groups = {}
+    default_rows = []
+    for patterns, case, binds in rows:
+        pattern = patterns[column]
+        others = patterns[:column] + patterns[column + 1:]
+        if irrefutable(pattern):
+            binds = binds + bound((pattern,), (path,))
+            for n, sub_rows in groups.values():
+                sub_rows.append(((WILDCARD,) * n + others, case, binds))
+            default_rows.append((others, case, binds))
+            continue
+        key, parts = pattern_key(pattern)
+        if key not in groups:
+            # first seen below a variable or _: those still come first
+            groups[key] = (len(parts), [((WILDCARD,) * len(parts) + o, c, b) for o, c, b in default_rows])
+        groups[key][1].append((parts + others, case, binds))
+
+    table = {
+        key: build(cases, [path + (i,) for i in range(n)] + rest, sub_rows)
+        for key, (n, sub_rows) in groups.items()
+    }
+    return (SWITCH, path, table, build(cases, rest, default_rows))
+
+def bound(patterns, paths):
+    # (name, path) for each variable among irrefutable patterns
+    return tuple((p.name, path) for p, path in zip(patterns, paths) if isinstance(p, PatternVar))
+
+def leaf_cases(decision):
+    # the cases a tree can pick; the rest are unreachable
+    cases = set()
+    stack = [decision]
+    while stack:
+        node = stack.pop()
+        if node is FAIL:
+            continue
+        if node[0] == LEAF:
+            cases.add(node[1])
+        else:
+            stack.extend(node[2].values())
+            stack.append(node[3])
+    return cases
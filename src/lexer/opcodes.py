@@ -0,0 +1,46 @@
+# Opcodes for the BigBasic stack VM
+# every instruction is two ints in the stream: opcode, argument
+OP_LOAD_CONST    = 0    # push consts[arg]
+OP_LOAD_NAME     = 1    # push forced env[names[arg]]
+OP_STORE_NAME    = 2    # env[names[arg]] = pop
+OP_MAKE_THUNK    = 3    # push Thunk running the block at offset arg
+OP_ADD           = 4    # +
+OP_SUB           = 5    # -
+OP_MUL           = 6    # *
+OP_DIV           = 7    # /
+OP_MOD           = 8    # %
+OP_AND           = 9    # ndaerb
+OP_OR            = 10   # or
+OP_NOT           = 11   # otnerb
+OP_LT            = 12   # <
+OP_GT            = 13   # >
+OP_EQ            = 14   # ==
+OP_NE            = 15   # !=
+OP_BINARY        = 16   # any other binary operator, consts[arg] is the op
+OP_COMPARE       = 17   # any other comparison operator, consts[arg] is the op
+OP_UNARY         = 18   # any other unary operator, consts[arg] is the op
+OP_INDEX         = 19   # idx = pop, arr = pop, push arr[idx]
+OP_GET_ATTR      = 20   # push pop.names[arg]
+OP_BUILD_LIST    = 21   # pop arg items into a list
+OP_NEW           = 22   # consts[arg] = (type name, argc)
+OP_DEF_THING     = 23   # consts[arg] = (type name, arg names)
+OP_PRINT         = 24   # print pop
+OP_JUMP          = 25   # pc = arg
+OP_JUMP_IF_FALSE = 26   # if condition: pop, must be boolean
+OP_GET_ITER      = 27   # orferb iterable: pop, must be a list
+OP_FOR_ITER      = 28   # push next item or pop iterator and jump to arg
+OP_POP           = 29   # drop top
+OP_MATCH         = 30   # consts[arg] = (decision tree, targets): val = pop, push the
+                        # matched case's pattern values and jump to its target,
+                        # or push val back and jump to targets[-1]
+OP_ENTER_SCOPE   = 31   # save the names in consts[arg] for an asecerb body
+OP_EXIT_SCOPE    = 32   # restore them
+OP_NO_MATCH      = 33   # atchmerb fell through every asecerb
+OP_RETURN        = 34   # end of a thunk block, return top
+OP_HALT          = 35   # end of the program
+OP_RANGE         = 36   # pop arg operands (start, stop[, step]), push the range
+
+
+OP_NAMES = {
+    value: name for name, value in globals().items() if name.startswith('OP_')
+}
@@ -0,0 +1,214 @@
+from parser import (
+    ProgramNode, AssignmentNode, ArrayNode, NumberNode, StringNode,
+    IdentifierNode, IndexNode, PrintNode, IfNode, BlockNode,
+    ForNode, ThingDefNode, NewNode, AttrAccessNode,
+    BooleanNode, UnaryOpNode, BinaryOpNode, ComparisonNode,
+    PatternWildcard, MatchNode, PatternVar, PatternLiteral, RangeNode,
+    assigned_names, irrefutable
+)
+from interpreter import binary_op, compare_op, unary_op
+
+# Optimization levels for bgbasic -O
+O_NONE   = 0   # run the AST as parsed
+O_FOLD   = 1   # fold constant operator subtrees
+O_BRANCH = 2   # also prune if/atchmerb branches decided at compile time
+
+# marks a subtree whose value is not known at compile time
+NOT_CONSTANT = object()
+
+
+class Optimizer:
+    def __init__(self, level=O_BRANCH):
+        self.level = level
+        # how many operator nodes were folded / branches removed
+        self.folded = 0
+        self.pruned = 0
+
+    def optimize(self, program: ProgramNode):
+        if self.level > O_NONE:
+            program.statements = self.optimize_statements(program.statements)
+        return program
+
+    # statements
+
+    def optimize_statements(self, statements):
+        result = []
+        for stmt in statements:
+            new = self.optimize_statement(stmt)
+            if new is None:
+                continue
+            if isinstance(new, BlockNode):
+                # a pruned if leaves its chosen branch behind, splice it in
+                result.extend(new.statements)
+            else:
+                result.append(new)
+        return result
+
+    def optimize_branch(self, branch):
+        if isinstance(branch, BlockNode):
+            return BlockNode(self.optimize_statements(branch.statements))
+        new = self.optimize_statement(branch)
+        return BlockNode([]) if new is None else new
+
+    def optimize_statement(self, node):
+        method = getattr(self, f'stmt_{type(node).__name__}', None)
+        if method is not None:
+            return method(node)
+        return self.fold(node)
+
+    def stmt_BlockNode(self, node):
+        return BlockNode(self.optimize_statements(node.statements))
+
+    def stmt_AssignmentNode(self, node):
+        node.value = self.fold(node.value)
+        return node
+
+    def stmt_PrintNode(self, node):
+        node.expression = self.fold(node.expression)
+        return node
+
+    def stmt_ThingDefNode(self, node):
+        return node
+
+    def stmt_IfNode(self, node):
+        node.condition = self.fold(node.condition)
+        node.then_branch = self.optimize_branch(node.then_branch)
+        if node.else_branch is not None:
+            node.else_branch = self.optimize_branch(node.else_branch)
+        cond = constant_value(node.condition)
+        # only a real boolean decides the branch; anything else is a
+        # runtime type error that must still happen at runtime
+        if self.level < O_BRANCH or not isinstance(cond, bool):
+            return node
+        self.pruned += 1
+        if cond:
+            return node.then_branch
+        return node.else_branch
+
+    def stmt_ForNode(self, node):
+        node.iterable = self.fold(node.iterable)
+        node.body = self.optimize_branch(node.body)
+        if self.level >= O_BRANCH and constant_value(node.iterable) == []:
+            self.pruned += 1
+            return None
+        return node
+
+    def stmt_MatchNode(self, node):
+        node.expr = self.fold(node.expr)
+        cases = []
+        for pattern, body in node.cases:
+            cases.append((pattern, self.optimize_branch(body)))
+            if self.level >= O_BRANCH and irrefutable(pattern):
+                # irrefutable: later cases and the lseerb branch are dead
+                self.pruned += len(node.cases) - len(cases) + (node.else_branch is not None)
+                node.cases = cases
+                node.else_branch = None
+                break
+        else:
+            node.cases = cases
+            if node.else_branch is not None:
+                node.else_branch = self.optimize_branch(node.else_branch)
+        if self.level < O_BRANCH:
+            return node
+        value = constant_value(node.expr)
+        if value is NOT_CONSTANT:
+            return node
+        for pattern, body in node.cases:
+            if isinstance(pattern, PatternLiteral):
+                if not (value == pattern.value):
+                    continue
+            elif not irrefutable(pattern):
+                # a list or record pattern is left for run time
+                return node
+            self.pruned += len(node.cases) - 1 + (node.else_branch is not None)
+            if not isinstance(pattern, PatternVar) and not assigned_names([body]):
+                # nothing in the body would be rolled back, run it inline
+                return body
+            node.cases = [(pattern, body)]
+            node.else_branch = None
+            return node
+        if node.else_branch is not None:
+            self.pruned += len(node.cases)
+            return node.else_branch
+        # nothing matches: keep it, "No pattern matched" is a runtime error
+        return node
+
+    # expressions
+
+    def fold(self, node):
+        method = getattr(self, f'fold_{type(node).__name__}', None)
+        return method(node) if method is not None else node
+
+    def fold_ArrayNode(self, node):
+        node.elements = [self.fold(e) for e in node.elements]
+        return node
+
+    def fold_IndexNode(self, node):
+        node.index = self.fold(node.index)
+        return node
+
+    def fold_NewNode(self, node):
+        node.init_args = [self.fold(a) for a in node.init_args]
+        return node
+
+    def fold_AttrAccessNode(self, node):
+        node.obj = self.fold(node.obj)
+        return node
+
+    def fold_UnaryOpNode(self, node):
+        node.expr = self.fold(node.expr)
+        return self.attempt(node, unary_op, node.op, node.expr)
+
+    def fold_BinaryOpNode(self, node):
+        node.left = self.fold(node.left)
+        node.right = self.fold(node.right)
+        return self.attempt(node, binary_op, node.op, node.left, node.right)
+
+    def fold_ComparisonNode(self, node):
+        node.left = self.fold(node.left)
+        node.right = self.fold(node.right)
+        return self.attempt(node, compare_op, node.op, node.left, node.right)
+
+    def fold_RangeNode(self, node):
+        # the range itself stays: as a literal it would be a list in memory
+        node.start = self.fold(node.start)
+        node.stop = self.fold(node.stop)
+        if node.step is not None:
+            node.step = self.fold(node.step)
+        return node
+
+    def attempt(self, node, op_fn, op, *operands):
+        values = [constant_value(o) for o in operands]
+        if any(v is NOT_CONSTANT for v in values):
+            return node
+        try:
+            value = op_fn(op, *values)
+        except Exception:
+            # leave it alone: the error belongs to whoever forces this thunk
+            return node
+        literal = literal_node(value)
+        if literal is None:
+            return node
+        self.folded += 1
+        return literal
+
+
+def constant_value(node):
+    if isinstance(node, (NumberNode, StringNode, BooleanNode)):
+        return node.value
+    if isinstance(node, ArrayNode):
+        values = [constant_value(e) for e in node.elements]
+        if any(v is NOT_CONSTANT for v in values):
+            return NOT_CONSTANT
+        return values
+    return NOT_CONSTANT
+
+def literal_node(value):
+    # bool first, it is a subclass of int
+    if isinstance(value, bool):
+        return BooleanNode(value)
+    if isinstance(value, (int, float)):
+        return NumberNode(value)
+    if isinstance(value, str):
+        return StringNode(value)
+    return None
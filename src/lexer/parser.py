@@ -1,65 +1,91 @@
 from token import (
-    Token,
-    TK_ADD, TK_SUB, TK_ASSIGN, TK_LESS, TK_MORE,
-    TK_L_PAREN, TK_R_PAREN, TK_L_BRACKET, TK_R_BRACKET,
-    TK_FLOAT, TK_INT, TK_STRING, TK_NAME, TK_RESERVED,
-    TK_SEP, TK_LINEBREAK, TK_DONE, TK_BOOL, TK_EQEQ, TK_NEQ,
-    TK_MUL, TK_DIV, TK_MOD, TK_DOT,
-    RESERVED_WORDS
+    Token, TokenBuffer, KIND_NAMES,
+    K_ADD, K_SUB, K_ASSIGN, K_LESS, K_MORE,
+    K_L_PAREN, K_R_PAREN, K_L_BRACKET, K_R_BRACKET,
+    K_FLOAT, K_INT, K_STRING, K_NAME,
+    K_SEP, K_LINEBREAK, K_DONE, K_BOOL, K_EQEQ, K_NEQ,
+    K_MUL, K_DIV, K_MOD, K_DOT, K_RANGE,
+    KW_PRINT, KW_THING, KW_ARG, KW_END, KW_NEW, KW_IF, KW_THEN, KW_ELSE,
+    KW_BUTIF, KW_FOR, KW_IN, KW_AND, KW_OR, KW_NOT, KW_MATCH, KW_CASE, KW_STEP,
 )
+from lexer import LineFeed
 
 # AST Nodes
+# Nodes use __slots__: large generated programs have millions of them and a
+# per-instance __dict__ would triple their size (see bench.py ast).
+# `strict` marks expressions the strictness pass proved pure, cheap and
+# unable to raise, so the interpreter may evaluate them without a Thunk;
+# `slot` is the frame index resolver.py gives a variable reference
 class ProgramNode:
+    __slots__ = ('statements', 'sharing')
     def __init__(self, statements):
         self.statements = statements
+        # the cse.Sharer that numbered its shared subexpressions, if any
+        self.sharing = None
     def __repr__(self):
         return f"ProgramNode(statements={self.statements})"
 
 class AssignmentNode:
+    __slots__ = ('name', 'value', 'slot')
     def __init__(self, name, value):
         self.name = name
         self.value = value
+        self.slot = None
     def __repr__(self):
         return f"AssignmentNode(name={self.name}, value={self.value})"
 
 class ArrayNode:
+    __slots__ = ('elements', 'strict')
     def __init__(self, elements):
         self.elements = elements
+        self.strict = False
     def __repr__(self):
         return f"ArrayNode(elements={self.elements})"
 
 class NumberNode:
+    __slots__ = ('value', 'strict')
     def __init__(self, value):
         self.value = value
+        self.strict = False
     def __repr__(self):
         return f"NumberNode(value={self.value})"
 
 class StringNode:
+    __slots__ = ('value', 'strict')
     def __init__(self, value):
         self.value = value
+        self.strict = False
     def __repr__(self):
         return f"StringNode(value={self.value})"
 
 class IdentifierNode:
+    __slots__ = ('name', 'slot')
     def __init__(self, name):
         self.name = name
+        self.slot = None
     def __repr__(self):
         return f"IdentifierNode(name={self.name})"
 
 class IndexNode:
+    __slots__ = ('name', 'index', 'slot', 'cse')
     def __init__(self, name, index):
         self.name = name
         self.index = index
+        self.slot = None
+        # shared subexpression number, see cse.py
+        self.cse = None
     def __repr__(self):
         return f"IndexNode(name={self.name}, index={self.index})"
 
 class PrintNode:
+    __slots__ = ('expression',)
     def __init__(self, expression):
         self.expression = expression
     def __repr__(self):
         return f"PrintNode(expression={self.expression})"
 
 class IfNode:
+    __slots__ = ('condition', 'then_branch', 'else_branch')
     def __init__(self, condition, then_branch, else_branch=None):
         self.condition = condition
         self.then_branch = then_branch
@@ -68,49 +94,74 @@ class IfNode:
         return f"IfNode(condition={self.condition}, then={self.then_branch}, else={self.else_branch})"
 
 class ComparisonNode:
+    __slots__ = ('left', 'op', 'right', 'strict', 'cse')
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
         self.right = right
+        self.strict = False
+        self.cse = None
     def __repr__(self):
         return f"ComparisonNode({self.left} {self.op} {self.right})"
 
+class RangeNode:
+    __slots__ = ('start', 'stop', 'step', 'strict')
+    def __init__(self, start, stop, step=None):
+        self.start = start
+        self.stop = stop
+        self.step = step      # None for 1
+        self.strict = False
+    def __repr__(self):
+        return f"RangeNode({self.start}..{self.stop} step {self.step})"
+
 class BooleanNode:
+    __slots__ = ('value', 'strict')
     def __init__(self, value):
         self.value = value
+        self.strict = False
     def __repr__(self):
         return f"BooleanNode(value={self.value})"
 
 class UnaryOpNode:
+    __slots__ = ('op', 'expr', 'strict', 'cse')
     def __init__(self, op, expr):
         self.op = op
         self.expr = expr
+        self.strict = False
+        self.cse = None
     def __repr__(self):
         return f"UnaryOpNode(op={self.op}, expr={self.expr})"
 
 class BinaryOpNode:
+    __slots__ = ('left', 'op', 'right', 'strict', 'cse')
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
         self.right = right
+        self.strict = False
+        self.cse = None
     def __repr__(self):
         return f"BinaryOpNode({self.left} {self.op} {self.right})"
 
 class BlockNode:
+    __slots__ = ('statements',)
     def __init__(self, statements):
         self.statements = statements
     def __repr__(self):
         return f"BlockNode(statements={self.statements})"
     
 class ForNode:
+    __slots__ = ('var_name', 'iterable', 'body', 'slot')
     def __init__(self, var_name, iterable, body):
         self.var_name = var_name
         self.iterable = iterable
         self.body = body
+        self.slot = None
     def __repr__(self):
         return f"ForNode(var={self.var_name}, iterable={self.iterable}, body={self.body})"
 
 class ThingDefNode:
+    __slots__ = ('name', 'args')
     def __init__(self, name, args):
         self.name = name      
         self.args = args        
@@ -118,6 +169,7 @@ class ThingDefNode:
         return f"ThingDefNode(name={self.name}, args={self.args})"
 
 class NewNode:
+    __slots__ = ('type_name', 'init_args')
     def __init__(self, type_name, init_args):
         self.type_name = type_name  
         self.init_args = init_args  
@@ -125,176 +177,267 @@ class NewNode:
         return f"NewNode(type={self.type_name}, init_args={self.init_args})"
 
 class AttrAccessNode:
+    __slots__ = ('obj', 'attr', 'cse')
     def __init__(self, obj, attr):
         self.obj = obj          
         self.attr = attr        
+        self.cse = None
     def __repr__(self):
         return f"AttrAccessNode(obj={self.obj}, attr={self.attr})"
 
 class PatternLiteral:
+    __slots__ = ('value',)
     def __init__(self, value):
         self.value = value
     def __repr__(self):
         return f"PatternLiteral({self.value})"
 
 class PatternVar:
+    __slots__ = ('name', 'slot')
     def __init__(self, name):
         self.name = name
+        self.slot = None
     def __repr__(self):
         return f"PatternVar({self.name})"
 
 class PatternWildcard:
+    __slots__ = ()
     def __repr__(self):
         return "PatternWildcard()"
 
+class PatternList:
+    # [p1, p2, ...]: a list of exactly that many items
+    __slots__ = ('elements',)
+    def __init__(self, elements):
+        self.elements = elements
+    def __repr__(self):
+        return f"PatternList({self.elements})"
+
+class PatternThing:
+    # Name[p1, p2, ...]: a hingterb record, its rgaerbs in order
+    __slots__ = ('type_name', 'args')
+    def __init__(self, type_name, args):
+        self.type_name = type_name
+        self.args = args
+    def __repr__(self):
+        return f"PatternThing(type={self.type_name}, args={self.args})"
+
 class MatchNode:
+    __slots__ = ('expr', 'cases', 'else_branch', 'case_slots', 'bind_slots', 'decision')
     def __init__(self, expr, cases, else_branch=None):
         # cases: list of (pattern, body_node)
         self.expr = expr
         self.cases = cases
         self.else_branch = else_branch
+        # per case, the slots it can rebind and the slots of its pattern
+        # variables in pattern_names order (set by the resolver)
+        self.case_slots = None
+        self.bind_slots = None
+        # matcher.compile_match of the cases, built by Interpreter.interpret
+        self.decision = None
     def __repr__(self):
         return f"MatchNode(expr={self.expr}, cases={self.cases}, else={self.else_branch})"
 
+def irrefutable(pattern):
+    return isinstance(pattern, (PatternVar, PatternWildcard))
+
+def pattern_names(pattern):
+    # the variables a pattern binds, left to right
+    if isinstance(pattern, PatternVar):
+        return [pattern.name]
+    if isinstance(pattern, PatternList):
+        parts = pattern.elements
+    elif isinstance(pattern, PatternThing):
+        parts = pattern.args
+    else:
+        return []
+    return [name for part in parts for name in pattern_names(part)]
+
+# names a statement list can bind: assignments, orferb variables and
+# atchmerb pattern variables, at any depth
+def assigned_names(statements):
+    names = set()
+    for stmt in statements:
+        if isinstance(stmt, AssignmentNode):
+            names.add(stmt.name)
+        elif isinstance(stmt, ForNode):
+            names.add(stmt.var_name)
+            names |= assigned_names([stmt.body])
+        elif isinstance(stmt, IfNode):
+            names |= assigned_names([stmt.then_branch])
+            if stmt.else_branch is not None:
+                names |= assigned_names([stmt.else_branch])
+        elif isinstance(stmt, MatchNode):
+            for pattern, body in stmt.cases:
+                names.update(pattern_names(pattern))
+                names |= assigned_names([body])
+            if stmt.else_branch is not None:
+                names |= assigned_names([stmt.else_branch])
+        elif isinstance(stmt, (BlockNode, ProgramNode)):
+            names |= assigned_names(stmt.statements)
+    return names
+
+# hingterb name -> number of rgaerbs, for the hingterbs a statement list
+# defines at any depth
+def thing_arities(statements):
+    arities = {}
+    for stmt in statements:
+        if isinstance(stmt, ThingDefNode):
+            arities[stmt.name] = len(stmt.args)
+        elif isinstance(stmt, ForNode):
+            arities.update(thing_arities([stmt.body]))
+        elif isinstance(stmt, IfNode):
+            arities.update(thing_arities([stmt.then_branch]))
+            if stmt.else_branch is not None:
+                arities.update(thing_arities([stmt.else_branch]))
+        elif isinstance(stmt, MatchNode):
+            for _, body in stmt.cases:
+                arities.update(thing_arities([body]))
+            if stmt.else_branch is not None:
+                arities.update(thing_arities([stmt.else_branch]))
+        elif isinstance(stmt, (BlockNode, ProgramNode)):
+            arities.update(thing_arities(stmt.statements))
+    return arities
+
 class Parser:
     def __init__(self, tokens):
-        self.tokens = tokens
+        # tokens is any iterable of tokens: a list, Lexer.stream() to parse
+        # without holding the whole token stream in memory, or a TokenBuffer,
+        # which also gives span() the source offsets of each token
+        self.buffer = tokens if isinstance(tokens, TokenBuffer) else None
+        # the REPL's LineFeed, which reads a line only when asked for a token
+        self.feed = tokens if isinstance(tokens, LineFeed) else None
+        self.tokens = iter(tokens)
+        self.lookahead = []
         self.position = -1
         self.current_token = None
+        self.kind = None
         self.advance()
 
     def advance(self):
         self.position += 1
-        self.current_token = self.tokens[self.position] if self.position < len(self.tokens) else None
+        tok = self.lookahead.pop(0) if self.lookahead else next(self.tokens, None)
+        self.current_token = tok
+        self.kind = tok.kind if tok is not None else None
 
     def peek(self, offset=1):
-        pos = self.position + offset
-        return self.tokens[pos] if pos < len(self.tokens) else None
-
-    def check(self, expected_type):
-        return self.current_token and self.current_token.type == expected_type
-
-    def expect(self, expected_type):
+        while len(self.lookahead) < offset:
+            tok = next(self.tokens, None)
+            if tok is None:
+                return None
+            self.lookahead.append(tok)
+        return self.lookahead[offset - 1]
+
+    def span(self):
+        if self.buffer is None or self.position >= len(self.buffer):
+            return None
+        return self.buffer.span(self.position)
+
+    def check(self, expected_kind):
+        return self.kind == expected_kind
+
+    def expect(self, expected_kind):
         if not self.current_token:
             raise Exception("Unexpected end of input")
-        if self.current_token.type != expected_type:
-            raise Exception(f"Expected {expected_type}, got {self.current_token.type}")
+        if self.kind != expected_kind:
+            raise Exception(f"Expected {KIND_NAMES[expected_kind]}, got {self.current_token.type}")
         token = self.current_token
         self.advance()
         return token
 
     def parse(self):
-        statements = []
-        while self.current_token and self.current_token.type != TK_DONE:
-            if self.check(TK_LINEBREAK):
+        return ProgramNode(list(self.statements()))
+
+    def statements(self):
+        # yields each top-level statement as soon as it is parsed
+        while self.current_token and self.kind != K_DONE:
+            if self.kind == K_LINEBREAK:
                 self.advance()
                 continue
-            if self.check(TK_RESERVED) and self.current_token.value == 'hingterb':
-                stmt = self.parse_thing_def()
-            elif self.check(TK_RESERVED) and self.current_token.value == 'rintperb':
-                stmt = self.parse_print()
-            elif self.check(TK_RESERVED) and self.current_token.value in ('if', 'utifberb'):
-                stmt = self.parse_if()
-            elif self.check(TK_RESERVED) and self.current_token.value == 'atchmerb':
-                stmt = self.parse_match()
-            elif self.check(TK_RESERVED) and self.current_token.value == 'orferb':
-                stmt = self.parse_for()
-            elif self.check(TK_NAME) and self.peek().type == TK_ASSIGN:
-                stmt = self.parse_variable()
-            else:
-                stmt = self.parse_expression()
-            statements.append(stmt)
-            while self.check(TK_LINEBREAK):
-                self.advance()
-        return ProgramNode(statements)
+            # hand it over before reading any further: line breaks after
+            # it are skipped at the top of the loop
+            yield self.parse_statement()
 
     def parse_variable(self):
-        name = self.expect(TK_NAME).value
-        self.expect(TK_ASSIGN)
-        value = self.parse_array_expression() if self.check(TK_L_BRACKET) else self.parse_expression()
+        name = self.expect(K_NAME).value
+        self.expect(K_ASSIGN)
+        value = self.parse_array_expression() if self.kind == K_L_BRACKET else self.parse_expression()
         return AssignmentNode(name, value)
 
-    def parse_expression(self):
-        return self.parse_or()
-
-    def parse_or(self):
-        left = self.parse_and()
-        while self.check(TK_RESERVED) and self.current_token.value == 'or':
-            op = self.current_token.value
+    def parse_expression(self, rbp=0):
+        # precedence climbing: keep absorbing infix operators that bind
+        # tighter than the caller's right binding power
+        if self.kind == KW_NOT and rbp < NOT_POWER:
             self.advance()
-            right = self.parse_and()
-            left = BinaryOpNode(left, op, right)
-        return left
-
-    def parse_and(self):
-        left = self.parse_not()
-        while self.check(TK_RESERVED) and self.current_token.value == 'ndaerb':
-            op = 'and'
+            # its operand may be another otnerb, but stops at ndaerb
+            left = UnaryOpNode('not', self.parse_expression(NOT_POWER - 1))
+        else:
+            left = self.parse_primary()
+        op = INFIX.get(self.kind)
+        # the range this loop just built, if it did: (a..b)..c is a range
+        # over a range, a..b..c is an error
+        ranged = False
+        while op is not None and op[0] > rbp:
+            if ranged and op[2] is RangeNode:
+                raise Exception("Expected one '..' in a range, use tepserb for the step")
+            tok = self.current_token
             self.advance()
-            right = self.parse_not()
-            left = BinaryOpNode(left, op, right)
+            # nothing binds tighter than * / %, their operand is a primary
+            right = self.parse_primary() if op[1] == MUL_POWER else self.parse_expression(op[1])
+            if op[2] is RangeNode:
+                left = self.parse_range(left, right)
+            else:
+                left = op[2](left, op[3] or tok.value or tok.type, right)
+            ranged = op[2] is RangeNode
+            op = INFIX.get(self.kind)
         return left
 
-    def parse_not(self):
-        if self.check(TK_RESERVED) and self.current_token.value == 'otnerb':
-            op = 'not'
-            self.advance()
-            expr = self.parse_not()
-            return UnaryOpNode(op, expr)
-        return self.parse_comparison()
-
-    def parse_comparison(self):
-        left = self.parse_add_sub()
-
-        while (self.check(TK_LESS) or self.check(TK_MORE)
-               or self.check(TK_EQEQ) or self.check(TK_NEQ)):
-            op_tok = self.current_token
+    def parse_range(self, start, stop):
+        step = None
+        if self.kind == KW_STEP:
             self.advance()
-            right = self.parse_comparison()
-            left = ComparisonNode(left, op_tok.value or op_tok.type, right)
-
-        return left
-
+            step = self.parse_expression(RANGE_POWER)
+        return RangeNode(start, stop, step)
 
     def parse_literal(self):
         tok = self.current_token
-        if tok.type == TK_INT:
+        if self.kind == K_INT:
             self.advance()
             return NumberNode(int(tok.value))
-        if tok.type == TK_FLOAT:
+        if self.kind == K_FLOAT:
             self.advance()
             return NumberNode(float(tok.value))
-        if tok.type == TK_STRING:
+        if self.kind == K_STRING:
             self.advance()
             return StringNode(tok.value)
-        if tok.type == TK_BOOL:
+        if self.kind == K_BOOL:
             self.advance()
             return BooleanNode(tok.value)
         raise Exception(f"Invalid literal: {tok}")
 
     def parse_array_expression(self):
-        self.expect(TK_L_BRACKET)
+        self.expect(K_L_BRACKET)
         elements = []
-        while not self.check(TK_R_BRACKET):
+        while not self.kind == K_R_BRACKET:
             elements.append(self.parse_expression())
-            if self.check(TK_SEP):
+            if self.kind == K_SEP:
                 self.advance()
-            elif self.check(TK_R_BRACKET):
+            elif self.kind == K_R_BRACKET:
                 break
             else:
                 raise Exception(f"Expected ',' or ']', got {self.current_token}")
-        self.expect(TK_R_BRACKET)
+        self.expect(K_R_BRACKET)
         return ArrayNode(elements)
 
     def parse_indexing(self):
-        name = self.expect(TK_NAME).value
-        self.expect(TK_L_BRACKET)
+        name = self.expect(K_NAME).value
+        self.expect(K_L_BRACKET)
         idx = self.parse_expression()
-        self.expect(TK_R_BRACKET)
+        self.expect(K_R_BRACKET)
         return IndexNode(name, idx)
 
     def parse_print(self):
-        self.expect(TK_RESERVED)
+        self.expect(KW_PRINT)
         expr = self.parse_expression()
         return PrintNode(expr)
 
@@ -306,147 +449,131 @@ class Parser:
     def _parse_if_branch(self):
         condition = self.parse_expression()
 
-        if not (self.check(TK_RESERVED) and self.current_token.value == 'henterb'):
+        if not (self.kind == KW_THEN):
             raise Exception(f"Expected 'henterb', got {self.current_token}")
         self.advance()
 
-        if self.check(TK_LINEBREAK):
+        if self.kind == K_LINEBREAK:
             then_branch = self.parse_block()    
         else:
             then_branch = self.parse_statement()
-        while self.check(TK_LINEBREAK):
-            self.advance()
+        self.skip_linebreaks()
 
         else_branch = None
-        if self.check(TK_RESERVED) and self.current_token.value in ('utifberb', 'lseerb'):
+        if self.kind in (KW_BUTIF, KW_ELSE):
             kind = self.current_token.value
             self.advance()
+            same_line = self.kind != K_LINEBREAK
             # if block, skip blank lines
-            while self.check(TK_LINEBREAK):
+            while self.kind == K_LINEBREAK:
                 self.advance()
             if kind == 'utifberb':
                 else_branch = self._parse_if_branch()  # recursive chain
             else:
-                else_branch = self.parse_block()
+                else_branch = self.parse_block(same_line)
 
-        while self.check(TK_LINEBREAK):
-            self.advance()
+        self.skip_linebreaks()
         # now consume 'end' if present
-        if self.check(TK_RESERVED) and self.current_token.value == 'ndeerb':
+        if self.kind == KW_END:
             self.advance()
         # skip any blank lines after 'end'
-        while self.check(TK_LINEBREAK):
-            self.advance()
+        self.skip_linebreaks()
 
         return IfNode(condition, then_branch, else_branch)
 
+    def skip_linebreaks(self):
+        # past the line breaks an if may go on after. Typed into the REPL,
+        # an if whose line is done is finished, as in Python's: it runs
+        # when Enter is pressed instead of waiting on the next line
+        while self.kind == K_LINEBREAK and not (
+                self.feed is not None and not self.lookahead and self.feed.line_done()):
+            self.advance()
+
     def parse_statement(self):
-        while self.check(TK_LINEBREAK):
+        while self.kind == K_LINEBREAK:
             self.advance()
-        if self.check(TK_RESERVED) and self.current_token.value == 'hingterb':
-            return self.parse_thing_def()
-        if self.check(TK_RESERVED) and self.current_token.value == 'rintperb':
-            return self.parse_print()
-        if self.check(TK_RESERVED) and self.current_token.value in ('if', 'utifberb'):
-            return self.parse_if()
-        if self.check(TK_RESERVED) and self.current_token.value == 'atchmerb':
-            return self.parse_match()
-        if self.check(TK_RESERVED) and self.current_token.value == 'orferb':
-            return self.parse_for()
-        if self.check(TK_NAME) and self.peek().type == TK_ASSIGN:
+        handler = STATEMENTS.get(self.kind)
+        if handler is not None:
+            return handler(self)
+        if self.kind == K_NAME and self.peek().kind == K_ASSIGN:
             return self.parse_variable()
         return self.parse_expression()
     
-    def parse_block(self):
-        # assumes we just saw a linebreak before the block
+    def parse_block(self, same_line=False):
+        # assumes we just saw a linebreak before the block, or with
+        # same_line, an lseerb followed by more on its line: in the REPL
+        # that block ends with the line, like a one-line henterb
         statements = []
         # skip leading blank lines
-        while self.check(TK_LINEBREAK):
+        while self.kind == K_LINEBREAK:
             self.advance()
         while (self.current_token and
-               not (self.check(TK_RESERVED) and self.current_token.value in ('utifberb', 'lseerb', 'ndeerb')) and
-               self.current_token.type != TK_DONE):
+               not (self.kind in (KW_BUTIF, KW_ELSE, KW_END)) and
+               self.kind != K_DONE):
             statements.append(self.parse_statement())
-            while self.check(TK_LINEBREAK):
+            if same_line:
+                self.skip_linebreaks()
+                if self.kind == K_LINEBREAK:
+                    break
+            while self.kind == K_LINEBREAK:
                 self.advance()
         return BlockNode(statements)
     
     def parse_primary(self):
-        
-        # new TypeName [args]
-        if self.check(TK_RESERVED) and self.current_token.value == 'ewnerb':
-            self.advance()  # consume 'new'
-            type_name = self.expect(TK_NAME).value
-            # parse the array literal and pull out its elements
-            init_args = self.parse_array_expression().elements
-            node = NewNode(type_name, init_args)
-            return self._maybe_parse_attr(node)
-        
+        kind = self.kind
+
+        # indexing name[expr], or a variable reference
+        if kind == K_NAME:
+            if self.peek().kind == K_L_BRACKET:
+                return self.parse_indexing()
+            name = self.current_token.value
+            self.advance()
+            node = IdentifierNode(name)
+            return self._maybe_parse_attr(node) if self.kind == K_DOT else node
+
+        # literals
+        if kind in LITERALS:
+            return self.parse_literal()
+
         # grouping: ( expr )
-        if self.check(TK_L_PAREN):
+        if kind == K_L_PAREN:
             self.advance()
             expr = self.parse_expression()
-            self.expect(TK_R_PAREN)
+            self.expect(K_R_PAREN)
             return expr
 
         # array literal
-        if self.check(TK_L_BRACKET):
+        if kind == K_L_BRACKET:
             return self.parse_array_expression()
 
-        # indexing: name[expr]
-        if self.check(TK_NAME) and self.peek().type == TK_L_BRACKET:
-            return self.parse_indexing()
-
-        # variable reference
-        if self.check(TK_NAME):
-            name = self.current_token.value
-            self.advance()
-            return self._maybe_parse_attr(IdentifierNode(name))
-
-        # literals
-        if self.check(TK_INT) or self.check(TK_FLOAT) \
-           or self.check(TK_STRING) or self.check(TK_BOOL):
-            return self.parse_literal()
+        # new TypeName [args]
+        if kind == KW_NEW:
+            self.advance()  # consume 'new'
+            type_name = self.expect(K_NAME).value
+            # parse the array literal and pull out its elements
+            init_args = self.parse_array_expression().elements
+            node = NewNode(type_name, init_args)
+            return self._maybe_parse_attr(node)
 
         raise Exception(f"Unexpected token in primary: {self.current_token}")
-    
-    def parse_add_sub(self):
-        left = self.parse_mul_div()
-        # left‐associative + and -
-        while self.check(TK_ADD) or self.check(TK_SUB):
-            op = self.current_token.value or self.current_token.type
-            self.advance()
-            right = self.parse_mul_div()
-            left = BinaryOpNode(left, op, right)
-        return left
 
-    def parse_mul_div(self):
-        left = self.parse_primary()
-        # left‐associative *, /, %
-        while self.check(TK_MUL) or self.check(TK_DIV) or self.check(TK_MOD):  # ADDED TK_MOD
-            op = self.current_token.value or self.current_token.type
-            self.advance()
-            right = self.parse_primary()
-            left = BinaryOpNode(left, op, right)
-        return left
-    
     def parse_for(self):
         # consume 'for'
-        self.expect(TK_RESERVED)  # 'for'
+        self.expect(KW_FOR)
         # loop variable
-        var_name = self.expect(TK_NAME).value
+        var_name = self.expect(K_NAME).value
         # consume 'in'
-        if not (self.check(TK_RESERVED) and self.current_token.value == 'in'):
+        if not (self.kind == KW_IN):
             raise Exception(f"Expected 'in', got {self.current_token}")
         self.advance()
         # iterable expression
         iterable = self.parse_expression()
 
         # body: either a block if newline, or single statement
-        if self.check(TK_LINEBREAK):
+        if self.kind == K_LINEBREAK:
             body = self.parse_block()
             # consume optional 'end' after the block
-            if self.check(TK_RESERVED) and self.current_token.value == 'ndeerb':
+            if self.kind == KW_END:
                 self.advance()
         else:
             body = self.parse_statement()
@@ -454,91 +581,231 @@ class Parser:
         return ForNode(var_name, iterable, body)
 
     def parse_thing_def(self):
-        self.expect(TK_RESERVED)      
-        name = self.expect(TK_NAME).value
-        while self.check(TK_LINEBREAK):
+        self.expect(KW_THING)
+        name = self.expect(K_NAME).value
+        while self.kind == K_LINEBREAK:
             self.advance()
         args = []
-        while self.check(TK_RESERVED) and self.current_token.value == 'rgaerb':
+        while self.kind == KW_ARG:
             self.advance()               # skip 'arg'
-            arg_name = self.expect(TK_NAME).value
+            arg_name = self.expect(K_NAME).value
             args.append(arg_name)
-            while self.check(TK_LINEBREAK):
+            while self.kind == K_LINEBREAK:
                 self.advance()
-        if not (self.check(TK_RESERVED) and self.current_token.value == 'ndeerb'):
+        if not (self.kind == KW_END):
             raise Exception(f"Expected 'ndeerb', got {self.current_token}")
         self.advance()  # consume 'end'
 
         return ThingDefNode(name, args)
     
     def _maybe_parse_attr(self, node):
-        while self.check(TK_DOT):
+        while self.kind == K_DOT:
             self.advance()
-            field = self.expect(TK_NAME).value
+            field = self.expect(K_NAME).value
             node = AttrAccessNode(node, field)
         return node
 
     def parse_pattern(self):
+        pattern = self.parse_subpattern()
+        names = pattern_names(pattern)
+        if len(set(names)) != len(names):
+            repeated = next(name for name in names if names.count(name) > 1)
+            raise Exception(f"Pattern variable {repeated} is bound more than once")
+        return pattern
+
+    def parse_subpattern(self):
         # literal patterns
-        if self.check(TK_INT) or self.check(TK_FLOAT) \
-           or self.check(TK_STRING) or self.check(TK_BOOL):
+        if self.kind in LITERALS:
             lit = self.parse_literal()  # yields NumberNode, StringNode, or BooleanNode
             return PatternLiteral(lit.value)
 
+        # list [p, ...]
+        if self.kind == K_L_BRACKET:
+            return PatternList(self.parse_pattern_items())
+
         # wildcard _
-        if self.check(TK_NAME) and self.current_token.value == '_':
+        if self.kind == K_NAME and self.current_token.value == '_':
             self.advance()
             return PatternWildcard()
 
-        # variable binding
-        if self.check(TK_NAME):
+        # record Name[p, ...], or a variable binding
+        if self.kind == K_NAME:
             name = self.current_token.value
             self.advance()
+            if self.kind == K_L_BRACKET:
+                return PatternThing(name, self.parse_pattern_items())
             return PatternVar(name)
 
         raise Exception(f"Unexpected token in pattern: {self.current_token}")
+
+    def parse_pattern_items(self):
+        # [p, ...], like parse_array_expression with patterns for elements
+        self.expect(K_L_BRACKET)
+        items = []
+        while not self.kind == K_R_BRACKET:
+            items.append(self.parse_subpattern())
+            if self.kind == K_SEP:
+                self.advance()
+            elif self.kind == K_R_BRACKET:
+                break
+            else:
+                raise Exception(f"Expected ',' or ']' in pattern, got {self.current_token}")
+        self.expect(K_R_BRACKET)
+        return items
     
     def parse_match(self):
-        self.expect(TK_RESERVED)           # 'match'
+        self.expect(KW_MATCH)
         expr = self.parse_expression()
-        while self.check(TK_LINEBREAK):
+        while self.kind == K_LINEBREAK:
             self.advance()
         cases = []
-        while self.check(TK_RESERVED) and self.current_token.value == 'asecerb':
+        while self.kind == KW_CASE:
             self.advance()                 # skip 'case'
             pattern = self.parse_pattern()
-            if not (self.check(TK_RESERVED) and self.current_token.value == 'henterb'):
+            if not (self.kind == KW_THEN):
                 raise Exception(f"Expected 'henterb' in case, got {self.current_token}")
             self.advance()
 
-            while self.check(TK_LINEBREAK):
+            while self.kind == K_LINEBREAK:
                 self.advance()
 
-            if self.check(TK_LINEBREAK):
+            if self.kind == K_LINEBREAK:
                 body = self.parse_block()
             else:
                 body = self.parse_statement()
             cases.append((pattern, body))
 
-            while self.check(TK_LINEBREAK):
+            while self.kind == K_LINEBREAK:
                 self.advance()
 
         else_branch = None
-        if self.check(TK_RESERVED) and self.current_token.value == 'lseerb':
+        if self.kind == KW_ELSE:
             self.advance()
-            while self.check(TK_LINEBREAK):
+            while self.kind == K_LINEBREAK:
                 self.advance()
 
-            if self.check(TK_LINEBREAK):
+            if self.kind == K_LINEBREAK:
                 else_branch = self.parse_block()
             else:
                 else_branch = self.parse_statement()
 
-        if self.check(TK_RESERVED) and self.current_token.value == 'ndeerb':
+        if self.kind == KW_END:
             self.advance()
 
         return MatchNode(expr, cases, else_branch)
 
 
+LITERALS = frozenset((K_INT, K_FLOAT, K_STRING, K_BOOL))
+
+# statement keyword -> Parser method
+STATEMENTS = {
+    KW_THING: Parser.parse_thing_def,
+    KW_PRINT: Parser.parse_print,
+    KW_IF: Parser.parse_if,
+    KW_BUTIF: Parser.parse_if,
+    KW_MATCH: Parser.parse_match,
+    KW_FOR: Parser.parse_for,
+}
+
+# infix operator kind -> (binding power, right operand's binding power,
+# node class, op name if not the token's own). Comparisons parse their
+# right operand one level lower, which makes them right-associative:
+# a < b < c is a < (b < c). Prefix otnerb sits between ndaerb and the
+# comparisons, so it is not allowed as an operand of those. A range sits
+# between the comparisons and + -: 1..n+1 == xs is (1..(n+1)) == xs.
+NOT_POWER = 3
+RANGE_POWER = 5
+MUL_POWER = 7
+INFIX = {
+    KW_OR:   (1, 1, BinaryOpNode, None),
+    KW_AND:  (2, 2, BinaryOpNode, 'and'),
+    K_LESS:  (4, NOT_POWER, ComparisonNode, None),
+    K_MORE:  (4, NOT_POWER, ComparisonNode, None),
+    K_EQEQ:  (4, NOT_POWER, ComparisonNode, None),
+    K_NEQ:   (4, NOT_POWER, ComparisonNode, None),
+    K_RANGE: (RANGE_POWER, RANGE_POWER, RangeNode, None),
+    K_ADD:   (6, 6, BinaryOpNode, None),
+    K_SUB:   (6, 6, BinaryOpNode, None),
+    K_MUL:   (MUL_POWER, MUL_POWER, BinaryOpNode, None),
+    K_DIV:   (MUL_POWER, MUL_POWER, BinaryOpNode, None),
+    K_MOD:   (MUL_POWER, MUL_POWER, BinaryOpNode, None),
+}
+
+
+# The original one-method-per-level expression parser, kept as the
+# reference the Pratt parser is checked against (see bench.py parse).
+class DescentParser(Parser):
+    def parse_expression(self):
+        return self.parse_or()
+
+    def parse_or(self):
+        left = self.parse_and()
+        while self.kind == KW_OR:
+            op = self.current_token.value
+            self.advance()
+            right = self.parse_and()
+            left = BinaryOpNode(left, op, right)
+        return left
+
+    def parse_and(self):
+        left = self.parse_not()
+        while self.kind == KW_AND:
+            op = 'and'
+            self.advance()
+            right = self.parse_not()
+            left = BinaryOpNode(left, op, right)
+        return left
+
+    def parse_not(self):
+        if self.kind == KW_NOT:
+            op = 'not'
+            self.advance()
+            expr = self.parse_not()
+            return UnaryOpNode(op, expr)
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        left = self.parse_range_expression()
+
+        while (self.kind == K_LESS or self.kind == K_MORE
+               or self.kind == K_EQEQ or self.kind == K_NEQ):
+            op_tok = self.current_token
+            self.advance()
+            right = self.parse_comparison()
+            left = ComparisonNode(left, op_tok.value or op_tok.type, right)
 
+        return left
 
+    def parse_range_expression(self):
+        left = self.parse_add_sub()
+        if self.kind == K_RANGE:
+            self.advance()
+            stop = self.parse_add_sub()
+            step = None
+            if self.kind == KW_STEP:
+                self.advance()
+                step = self.parse_add_sub()
+            left = RangeNode(left, stop, step)
+            if self.kind == K_RANGE:
+                raise Exception("Expected one '..' in a range, use tepserb for the step")
+        return left
+
+    def parse_add_sub(self):
+        left = self.parse_mul_div()
+        # left‐associative + and -
+        while self.kind == K_ADD or self.kind == K_SUB:
+            op = self.current_token.value or self.current_token.type
+            self.advance()
+            right = self.parse_mul_div()
+            left = BinaryOpNode(left, op, right)
+        return left
+
+    def parse_mul_div(self):
+        left = self.parse_primary()
+        # left‐associative *, /, %
+        while self.kind == K_MUL or self.kind == K_DIV or self.kind == K_MOD:  # ADDED K_MOD
+            op = self.current_token.value or self.current_token.type
+            self.advance()
+            right = self.parse_primary()
+            left = BinaryOpNode(left, op, right)
+        return left
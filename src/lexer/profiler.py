@@ -0,0 +1,217 @@
+import os
+import re
+import time
+from bisect import bisect_right
+
+from token import K_LINEBREAK
+from lexer import Lexer
+from parser import Parser
+from interpreter import Interpreter, Thunk, FORCING
+from optimizer import Optimizer, O_NONE
+from strictness import StrictnessAnalyzer
+from cse import Sharer
+
+# bgbasic --profile: where a script spends its time, by source line and by
+# kind of AST node.
+#
+# LineParser reads a TokenBuffer and notes the source offset each
+# statement starts at, which build turns into a line; an expression
+# belongs to the line of its statement. ProfilingInterpreter times every
+# eval, and wraps the thunks eval hands out so the time spent forcing one
+# later is charged to the line that built it, not to whoever happened to
+# need it. Both are subclasses only --profile uses: Parser and Interpreter
+# are not touched and run at full speed.
+#
+# For each line and each node kind:
+#   hits     statements run (lines), nodes evaluated (kinds)
+#   self     time in its own evaluation, children excluded
+#   total    inclusive time, counted once however deep it nests in itself
+#   forced   thunks it built that were forced to a value
+#
+# The collapsed stacks are one "a.erb:3;a.erb:7 <microseconds>" line per
+# call path, a frame wherever evaluation moves to another line, which is
+# what flamegraph.pl and speedscope read.
+
+# what _timed is timing
+STATEMENT = 0
+EXPRESSION = 1
+FORCED = 2
+
+
+class LineParser(Parser):
+    # a Parser that also fills starts: statement node -> source offset of
+    # its first token
+    def __init__(self, tokens):
+        self.starts = {}
+        super().__init__(tokens)
+
+    def parse_statement(self):
+        while self.kind == K_LINEBREAK:
+            self.advance()
+        span = self.span()
+        node = Parser.parse_statement(self)
+        if span is not None:
+            self.starts[node] = span[0]
+        return node
+
+
+def build(source, path, opt_level=O_NONE):
+    # cache.build for the tree engine, plus the statement lines; never
+    # cached, the cache keeps no line numbers
+    parser = LineParser(Lexer(path, source).buffer())
+    ast = Optimizer(opt_level).optimize(parser.parse())
+    StrictnessAnalyzer().analyze(ast)
+    Sharer().share(ast)
+    # a statement is on line 1 + the number of newlines before its start
+    newlines = [match.start() for match in re.finditer('\n', source)]
+    lines = {node: bisect_right(newlines, start) + 1 for node, start in parser.starts.items()}
+    return ast, lines
+
+
+class Stats:
+    __slots__ = ('hits', 'self_ns', 'total_ns', 'forced', 'active')
+
+    def __init__(self):
+        self.hits = 0
+        self.self_ns = 0
+        self.total_ns = 0
+        self.forced = 0
+        # entries for it on the stack right now
+        self.active = 0
+
+
+class Forcing:
+    # the fn of a thunk eval handed out, timed as the node that built it
+    __slots__ = ('interpreter', 'line', 'kind', 'fn')
+
+    def __init__(self, interpreter, line, kind, fn):
+        self.interpreter = interpreter
+        self.line = line
+        self.kind = kind
+        self.fn = fn
+
+    def __call__(self):
+        return self.interpreter._timed(self.line, self.kind, FORCED, self.fn)
+
+
+class Profile:
+    def __init__(self, path, source):
+        self.file_name = os.path.basename(path)
+        self.source_lines = source.split('\n')
+        self.lines = {}
+        self.kinds = {}
+        # collapsed stack -> self time in ns
+        self.stacks = {}
+        self.total_ns = 0
+
+    def line(self, line):
+        stats = self.lines.get(line)
+        if stats is None:
+            stats = self.lines[line] = Stats()
+        return stats
+
+    def kind(self, kind):
+        stats = self.kinds.get(kind)
+        if stats is None:
+            stats = self.kinds[kind] = Stats()
+        return stats
+
+    def format(self, top=20):
+        out = [f"profile: {self.file_name}, {self.total_ns / 1e9:.3f}s"]
+        out.append(f"{'line':>6} {'hits':>9} {'self ms':>10} {'total ms':>10} {'forced':>9}  source")
+        for line, stats in self.heaviest(self.lines, top):
+            source = self.source_lines[line - 1].strip() if 0 < line <= len(self.source_lines) else ''
+            out.append(f"{line:>6} {self.columns(stats)}  {source[:40]}")
+        out.append(f"{'kind':<16} {'hits':>9} {'self ms':>10} {'total ms':>10} {'forced':>9}")
+        for kind, stats in self.heaviest(self.kinds, top):
+            out.append(f"{kind:<16} {self.columns(stats)}")
+        return '\n'.join(out)
+
+    def heaviest(self, table, top):
+        return sorted(table.items(), key=lambda item: -item[1].self_ns)[:top]
+
+    def columns(self, stats):
+        return (f"{stats.hits:>9} {stats.self_ns / 1e6:>10.2f} "
+                f"{stats.total_ns / 1e6:>10.2f} {stats.forced:>9}")
+
+    def collapsed(self):
+        # flamegraph counts are integers: microseconds, empty paths dropped
+        lines = []
+        for path, ns in sorted(self.stacks.items()):
+            if path and ns >= 1000:
+                lines.append(f"{path} {ns // 1000}\n")
+        return ''.join(lines)
+
+
+class ProfilingInterpreter(Interpreter):
+    def __init__(self, profile, lines):
+        super().__init__()
+        self.profile = profile
+        # statement node -> line, from LineParser
+        self.lines = lines
+        # what is being timed, innermost last:
+        # [line, collapsed stack, ns spent in children]
+        self.timing = [[0, '', 0]]
+
+    def interpret(self, program):
+        start = time.perf_counter_ns()
+        try:
+            return super().interpret(program)
+        finally:
+            self.profile.total_ns += time.perf_counter_ns() - start
+
+    def eval(self, node):
+        line = self.lines.get(node)
+        what = STATEMENT
+        if line is None:
+            line = self.timing[-1][0]
+            what = EXPRESSION
+        kind = node.__class__.__name__
+        result = self._timed(line, kind, what, Interpreter.eval, self, node)
+        if result.__class__ is Thunk:
+            fn = result.fn
+            # None once forced, and the same thunk comes back up through
+            # the assignment that stores it: wrap each one once
+            if fn is not None and fn is not FORCING and fn.__class__ is not Forcing:
+                result.fn = Forcing(self, line, kind, fn)
+        return result
+
+    def _timed(self, line, kind, what, fn, *args):
+        profile = self.profile
+        timing = self.timing
+        parent = timing[-1]
+        path = parent[1]
+        if line != parent[0]:
+            label = f"{profile.file_name}:{line}"
+            path = f"{path};{label}" if path else label
+        line_stats = profile.line(line)
+        kind_stats = profile.kind(kind)
+        if what == STATEMENT:
+            line_stats.hits += 1
+        if what != FORCED:
+            kind_stats.hits += 1
+        entry = [line, path, 0]
+        timing.append(entry)
+        line_stats.active += 1
+        kind_stats.active += 1
+        start = time.perf_counter_ns()
+        try:
+            result = fn(*args)
+            if what == FORCED:
+                line_stats.forced += 1
+                kind_stats.forced += 1
+            return result
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            timing.pop()
+            timing[-1][2] += elapsed
+            own = elapsed - entry[2]
+            line_stats.self_ns += own
+            kind_stats.self_ns += own
+            profile.stacks[path] = profile.stacks.get(path, 0) + own
+            line_stats.active -= 1
+            if not line_stats.active:
+                line_stats.total_ns += elapsed
+            kind_stats.active -= 1
+            if not kind_stats.active:
+                kind_stats.total_ns += elapsed
@@ -0,0 +1,64 @@
+from parser import (
+    AssignmentNode, IdentifierNode, IndexNode, ForNode, PatternVar, MatchNode,
+    assigned_names, pattern_names
+)
+from arena import split
+
+# Gives every variable a slot number, so the tree-walker keeps variables in
+# a list (a frame) instead of a dict keyed by name. BigBasic has a single
+# scope, so one number per distinct name is enough. An asecerb body runs
+# against the frame and everything it bound is undone afterwards, so each
+# case also gets the slots it can rebind, to save and restore just those,
+# and the slots its pattern variables go to.
+
+# frame entry of a variable that has not been assigned yet
+UNBOUND = object()
+
+NAME_FIELDS = {
+    AssignmentNode: 'name',
+    IdentifierNode: 'name',
+    IndexNode: 'name',
+    ForNode: 'var_name',
+    PatternVar: 'name',
+}
+
+
+class Resolver:
+    def __init__(self):
+        # name -> slot and slot -> name, kept across programs so that
+        # later REPL lines see the variables of earlier ones
+        self.slots = {}
+        self.names = []
+        self.matches = []
+
+    def slot(self, name):
+        slot = self.slots.get(name)
+        if slot is None:
+            slot = self.slots[name] = len(self.names)
+            self.names.append(name)
+        return slot
+
+    def case_slots(self, pattern, body):
+        names = assigned_names([body])
+        names.update(pattern_names(pattern))
+        return tuple(self.slot(name) for name in sorted(names))
+
+    def resolve(self, program):
+        # sets .slot on every node that names a variable, and lists the
+        # atchmerbs for the interpreter to build their decision trees; an
+        # explicit stack keeps deep expressions off the Python call stack
+        self.matches = []
+        stack = [program]
+        while stack:
+            node = stack.pop()
+            field = NAME_FIELDS.get(type(node))
+            if field is not None:
+                node.slot = self.slot(getattr(node, field))
+            elif type(node) is MatchNode:
+                node.case_slots = [self.case_slots(pattern, body) for pattern, body in node.cases]
+                node.bind_slots = [tuple(self.slot(name) for name in pattern_names(pattern))
+                                   for pattern, _ in node.cases]
+                self.matches.append(node)
+            kids, _ = split(node)
+            stack.extend(kid for kid in kids if kid is not None)
+        return program
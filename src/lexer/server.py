@@ -0,0 +1,180 @@
+import gc
+import os
+import sys
+import stat
+import select
+import signal
+import socket
+import multiprocessing as mp
+from multiprocessing.connection import wait
+
+from interpreter import RuntimeError as InterpreterError
+import cache
+import wire
+
+# bgbasic serve: a parent process owns the listening socket and keeps a
+# fixed set of forked workers alive. Each worker has every module already
+# imported and accepts connections itself, one submission at a time, with
+# a brand new engine per submission.
+
+# script output is sent in frames of at most this many bytes
+FLUSH_SIZE = 16 * 1024
+
+
+class Timeout(Exception):
+    pass
+
+
+class FrameWriter:
+    # stands in for sys.stdout / sys.stderr while a submission runs
+    def __init__(self, sock, tag, other=None):
+        self.sock = sock
+        self.tag = tag
+        # stdout, flushed before anything goes to stderr so the client
+        # sees both in the order they were written
+        self.other = other
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        if self.other is not None:
+            self.other.flush()
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= FLUSH_SIZE:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.parts:
+            wire.send_frame(self.sock, self.tag, ''.join(self.parts).encode('utf-8'))
+            self.parts = []
+            self.size = 0
+
+
+def run_source(source, path, engine, opt_level, engines):
+    # the server-side run_file: returns the exit status instead of exiting
+    try:
+        with cache.gc_paused():
+            program, _ = cache.build(source, path, engine, opt_level)
+        cache.run_program(engines[engine](), program, engine)
+    except InterpreterError as e:
+        print(f"Runtime error: {e}", file=sys.stderr)
+        return 1
+    except Timeout:
+        print("Error: time limit exceeded", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+def handle(sock, engines, timeout):
+    tag, payload = wire.recv_frame(sock)
+    if tag != wire.REQUEST:
+        return
+    source, path, engine, opt_level = wire.decode_request(payload)
+    out = FrameWriter(sock, wire.STDOUT)
+    err = FrameWriter(sock, wire.STDERR, out)
+    saved = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = out, err
+    try:
+        if engine not in engines:
+            print(f"Error: unknown engine '{engine}'", file=sys.stderr)
+            status = 2
+        else:
+            if timeout:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            try:
+                status = run_source(source, path, engine, opt_level, engines)
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        out.flush()
+        err.flush()
+    finally:
+        sys.stdout, sys.stderr = saved
+    wire.send_frame(sock, wire.EXIT, str(status).encode('ascii'))
+
+def raise_timeout(signum, frame):
+    raise Timeout()
+
+def worker(listener, engines, timeout):
+    # ^C is for the parent, which then stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGALRM, raise_timeout)
+    parent = os.getppid()
+    # wake up now and then, so workers do not outlive a parent that was
+    # killed without the chance to stop them
+    while os.getppid() == parent:
+        if not select.select([listener], [], [], 1.0)[0]:
+            continue
+        try:
+            sock, _ = listener.accept()
+        except BlockingIOError:
+            # another worker took it
+            continue
+        sock.setblocking(True)
+        with sock:
+            try:
+                handle(sock, engines, timeout)
+            except (OSError, ValueError):
+                # client went away or sent garbage: nothing to answer
+                pass
+        # drop whatever the script left behind before the next one
+        gc.collect()
+
+def bind(socket_path):
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        mode = None
+    if mode is not None:
+        # only ever remove a socket, never a file that happens to be there
+        if not stat.S_ISSOCK(mode):
+            raise OSError(f"{socket_path} exists and is not a socket")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            # left over from a server that did not shut down cleanly
+            os.unlink(socket_path)
+        else:
+            raise OSError(f"a server is already listening on {socket_path}")
+        finally:
+            probe.close()
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(128)
+    # all workers wait on it; the ones that lose the race must not block
+    listener.setblocking(False)
+    return listener
+
+def serve(socket_path, workers, engines, timeout=None):
+    listener = bind(socket_path)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # everything imported so far is shared with the workers; keep the
+    # collector from touching it so those pages stay shared
+    gc.freeze()
+
+    def start():
+        process = mp.Process(target=worker, args=(listener, engines, timeout), daemon=True)
+        process.start()
+        return process
+
+    processes = [start() for _ in range(workers)]
+    print(f"bgbasic: serving on {socket_path} with {workers} workers", file=sys.stderr)
+    try:
+        while True:
+            wait([p.sentinel for p in processes])
+            # a worker only dies if something went badly wrong, replace it
+            processes = [p if p.is_alive() else start() for p in processes]
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        listener.close()
+        os.unlink(socket_path)
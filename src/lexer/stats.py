@@ -0,0 +1,110 @@
+import json
+
+import interpreter
+from arena import split
+
+# bgbasic --stats: counters for one run, for capacity planning.
+#
+# cache.build and cache.load_program fill in the phases (seconds spent
+# lexing, parsing, compiling, loading or storing the cache) and what the
+# lexer and parser made. The rest is counted by the engines as they run,
+# in plain ints that are always on: the runtime all three share counts
+# thunks, list elements and records, and each engine keeps its env peak.
+# begin and end take the difference over the run.
+#
+#   nodes          AST nodes per kind in the program that ran; evaluations
+#                  per kind are what --profile reports
+#   thunks         created, forced, and never forced
+#   env            the most variables bound at once
+#   things         hingterb records built
+#   list_elements  elements of the lists list literals and list arithmetic
+#                  built; a..b ranges are never stored and do not count
+
+
+def count_nodes(program):
+    # node class -> how many there are below program, no recursion
+    counts = {}
+    stack = list(program.statements)
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        counts[node.__class__] = counts.get(node.__class__, 0) + 1
+        stack.extend(split(node)[0])
+    return counts
+
+
+class RunStats:
+    def __init__(self, path, engine):
+        self.path = path
+        self.engine = engine
+        self.cached = False
+        self.phases = {}
+        self.tokens = None
+        self.statements = None
+        # node class -> count; None when the program came from the cache
+        self.nodes = None
+        self.thunks_created = 0
+        self.thunks_forced = 0
+        self.env_peak = 0
+        self.things = 0
+        self.list_elements = 0
+        self.status = 'ok'
+        # interpreter.work_done() when the run began
+        self.work = None
+
+    def begin(self):
+        self.work = interpreter.work_done()
+
+    def end(self, engine):
+        made, forced, elements, records = (
+            now - before for now, before in zip(interpreter.work_done(), self.work))
+        self.thunks_created = made
+        self.thunks_forced = forced
+        self.list_elements = elements
+        self.things = records
+        self.env_peak = engine.env_peak
+
+    def as_dict(self):
+        nodes = None
+        if self.nodes is not None:
+            nodes = {cls.__name__: n for cls, n in sorted(self.nodes.items(), key=lambda item: -item[1])}
+        return {
+            'file': self.path,
+            'engine': self.engine,
+            'status': self.status,
+            'cached': self.cached,
+            'phases': {phase: round(seconds, 6) for phase, seconds in self.phases.items()},
+            'tokens': self.tokens,
+            'statements': self.statements,
+            'nodes': nodes,
+            'nodes_total': sum(self.nodes.values()) if nodes is not None else None,
+            'thunks': {
+                'created': self.thunks_created,
+                'forced': self.thunks_forced,
+                'never_forced': self.thunks_created - self.thunks_forced,
+            },
+            'env': {'peak': self.env_peak},
+            'things': self.things,
+            'list_elements': self.list_elements,
+        }
+
+    def format(self, style='text'):
+        stats = self.as_dict()
+        if style == 'json':
+            return json.dumps(stats, separators=(',', ':'))
+        out = [f"stats: {stats['file']} on {stats['engine']}, {stats['status']}"
+               f"{', from cache' if stats['cached'] else ''}"]
+        out.append("  phases: " + ', '.join(f"{phase} {seconds * 1000:.2f}ms"
+                                            for phase, seconds in stats['phases'].items()))
+        if stats['tokens'] is not None:
+            out.append(f"  tokens: {stats['tokens']}, statements: {stats['statements']}")
+        if stats['nodes'] is not None:
+            out.append(f"  program nodes: {stats['nodes_total']} ("
+                       + ', '.join(f"{kind} {n}" for kind, n in stats['nodes'].items()) + ")")
+        thunks = stats['thunks']
+        out.append(f"  thunks: {thunks['created']} created, {thunks['forced']} forced, "
+                   f"{thunks['never_forced']} never forced")
+        out.append(f"  env: {stats['env']['peak']} variables bound at most")
+        out.append(f"  hingterb records: {stats['things']}, list elements built: {stats['list_elements']}")
+        return '\n'.join(out)
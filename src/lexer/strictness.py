@@ -0,0 +1,170 @@
+from parser import (
+    ProgramNode, AssignmentNode, ArrayNode, NumberNode, StringNode,
+    IdentifierNode, IndexNode, PrintNode, IfNode, BlockNode,
+    ForNode, ThingDefNode, NewNode, AttrAccessNode,
+    BooleanNode, UnaryOpNode, BinaryOpNode, ComparisonNode,
+    PatternWildcard, MatchNode, PatternVar, PatternLiteral, RangeNode
+)
+from interpreter import binary_op, compare_op, unary_op, make_range
+
+# Laziness in BigBasic is only observable through two things: a deferred
+# error (y = 1 / 0 never fails unless y is forced) and late variable lookup
+# (y = x sees whatever x holds when y is forced). An expression built from
+# literals alone reads no variables, so it is strict-safe exactly when
+# evaluating it cannot raise. We find out by evaluating it once, here, with
+# the same helpers the interpreter uses.
+
+# marks an expression we could not prove safe
+UNSAFE = object()
+
+
+class StrictnessReport:
+    def __init__(self):
+        # expression nodes visited / proved strict, by node kind
+        self.expressions = {}
+        self.strict = {}
+        # assignment right-hand sides stored as values instead of thunks
+        self.bindings = 0
+        self.strict_bindings = 0
+
+    def count(self, node, strict):
+        kind = type(node).__name__
+        self.expressions[kind] = self.expressions.get(kind, 0) + 1
+        if strict:
+            self.strict[kind] = self.strict.get(kind, 0) + 1
+
+    def format(self, thunks_avoided=None):
+        total = sum(self.expressions.values())
+        strict = sum(self.strict.values())
+        kinds = ', '.join(f"{kind} {n}" for kind, n in sorted(self.strict.items()))
+        lines = [
+            f"strictness: {strict} of {total} expression nodes eager" + (f" ({kinds})" if kinds else ""),
+            f"strictness: {self.strict_bindings} of {self.bindings} bindings stored without a thunk",
+        ]
+        if thunks_avoided is not None:
+            lines.append(f"strictness: {thunks_avoided} thunk allocations avoided at runtime")
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return f"StrictnessReport(strict={self.strict}, bindings={self.strict_bindings}/{self.bindings})"
+
+class StrictnessAnalyzer:
+    def __init__(self):
+        self.report = StrictnessReport()
+
+    def analyze(self, program: ProgramNode):
+        for stmt in program.statements:
+            self.visit_statement(stmt)
+        return self.report
+
+    # statements
+
+    def visit_statement(self, node):
+        if isinstance(node, (ProgramNode, BlockNode)):
+            for stmt in node.statements:
+                self.visit_statement(stmt)
+        elif isinstance(node, AssignmentNode):
+            self.report.bindings += 1
+            if self.visit_expr(node.value) is not UNSAFE:
+                self.report.strict_bindings += 1
+        elif isinstance(node, PrintNode):
+            self.visit_expr(node.expression)
+        elif isinstance(node, IfNode):
+            self.visit_expr(node.condition)
+            self.visit_statement(node.then_branch)
+            if node.else_branch is not None:
+                self.visit_statement(node.else_branch)
+        elif isinstance(node, ForNode):
+            self.visit_expr(node.iterable)
+            self.visit_statement(node.body)
+        elif isinstance(node, MatchNode):
+            self.visit_expr(node.expr)
+            for pattern, body in node.cases:
+                self.visit_statement(body)
+            if node.else_branch is not None:
+                self.visit_statement(node.else_branch)
+        elif isinstance(node, ThingDefNode):
+            pass
+        else:
+            self.visit_expr(node)
+
+    # expressions: returns the constant value, or UNSAFE
+
+    def visit_expr(self, node):
+        method = getattr(self, f'visit_{type(node).__name__}', None)
+        value = method(node) if method is not None else UNSAFE
+        if hasattr(type(node), 'strict'):
+            node.strict = value is not UNSAFE
+            self.report.count(node, node.strict)
+        else:
+            self.report.count(node, False)
+        return value
+
+    def visit_NumberNode(self, node):
+        return node.value
+
+    def visit_StringNode(self, node):
+        return node.value
+
+    def visit_BooleanNode(self, node):
+        return node.value
+
+    def visit_ArrayNode(self, node):
+        values = [self.visit_expr(e) for e in node.elements]
+        if any(v is UNSAFE for v in values):
+            return UNSAFE
+        return values
+
+    def visit_UnaryOpNode(self, node):
+        return self.attempt(unary_op, node.op, self.visit_expr(node.expr))
+
+    def visit_BinaryOpNode(self, node):
+        left = self.visit_expr(node.left)
+        right = self.visit_expr(node.right)
+        return self.attempt(binary_op, node.op, left, right)
+
+    def visit_ComparisonNode(self, node):
+        left = self.visit_expr(node.left)
+        right = self.visit_expr(node.right)
+        return self.attempt(compare_op, node.op, left, right)
+
+    def visit_RangeNode(self, node):
+        # a range is built in O(1) whatever its length, so it is as cheap as
+        # any operator once its ends are known
+        ends = [self.visit_expr(node.start), self.visit_expr(node.stop)]
+        if node.step is not None:
+            ends.append(self.visit_expr(node.step))
+        if any(v is UNSAFE for v in ends):
+            return UNSAFE
+        try:
+            return make_range(*ends)
+        except Exception:
+            return UNSAFE
+
+    # variable reads, hingterb construction and attribute access depend on
+    # runtime state, so they stay lazy, but their operands are still visited
+
+    def visit_IdentifierNode(self, node):
+        return UNSAFE
+
+    def visit_IndexNode(self, node):
+        self.visit_expr(node.index)
+        return UNSAFE
+
+    def visit_NewNode(self, node):
+        for arg in node.init_args:
+            self.visit_expr(arg)
+        return UNSAFE
+
+    def visit_AttrAccessNode(self, node):
+        self.visit_expr(node.obj)
+        return UNSAFE
+
+    def attempt(self, op_fn, op, *operands):
+        if any(v is UNSAFE for v in operands):
+            return UNSAFE
+        try:
+            return op_fn(op, *operands)
+        except Exception:
+            # whatever it was, it has to surface when (and if) the thunk is forced
+            return UNSAFE
@@ -0,0 +1,126 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+from testutil import ENGINES, HERE, Result
+
+SOURCE = ('hingterb P rgaerb a rgaerb b ndeerb\n'
+          'p = ewnerb P[1, 2]\n'
+          'orferb i in 1..3 rintperb i * p.b\n')
+OUT = '2\n4\n6\n'
+
+
+def bgbasic(*args):
+    # bgbasic with the cache on, unlike testutil.run
+    return Result(subprocess.run([sys.executable, os.path.join(HERE, 'bgbasic'), *args],
+                                 cwd=HERE, capture_output=True, text=True))
+
+
+def script(directory, source=SOURCE, name='prog.erb'):
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    path.write_text(source)
+    return str(path)
+
+
+def cached_run(path, *args):
+    # (output, whether it came from the cache)
+    result = bgbasic('--stats', 'json', *args, path)
+    assert result.status == 0, result.err
+    return result.out, json.loads(result.err.splitlines()[-1])['cached']
+
+
+def cache_files(directory):
+    return sorted(name for _, _, names in os.walk(directory) for name in names)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_second_run_loads_from_the_cache(tmp_path, engine):
+    path = script(tmp_path)
+    assert cached_run(path, '--engine', engine) == (OUT, False)
+    assert cached_run(path, '--engine', engine) == (OUT, True)
+    [name] = cache_files(tmp_path / '__bbcache__')
+    assert name.startswith('prog.') and name.endswith(f'-{engine}-O0.bbc')
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_edited_source_is_rebuilt(tmp_path, engine):
+    path = script(tmp_path)
+    cached_run(path, '--engine', engine)
+    script(tmp_path, SOURCE.replace('p.b', 'p.a'))
+    assert cached_run(path, '--engine', engine) == ('1\n2\n3\n', False)
+    assert cached_run(path, '--engine', engine) == ('1\n2\n3\n', True)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('damage', ('truncate', 'payload', 'version', 'empty'))
+def test_damaged_cache_file_is_ignored_and_replaced(tmp_path, engine, damage):
+    path = script(tmp_path)
+    cached_run(path, '--engine', engine)
+    [name] = cache_files(tmp_path / '__bbcache__')
+    cache_file = tmp_path / '__bbcache__' / name
+    data = cache_file.read_bytes()
+    header = data.index(b'\n') + 1
+    if damage == 'truncate':
+        data = data[:header + (len(data) - header) // 2]
+    elif damage == 'payload':
+        data = data[:header] + bytes(b ^ 0xff for b in data[header:])
+    elif damage == 'version':
+        # what a build with another FORMAT_VERSION wrote
+        data = data[:4] + bytes([data[4] ^ 1]) + data[5:]
+    else:
+        data = b''
+    cache_file.write_bytes(data)
+    assert cached_run(path, '--engine', engine) == (OUT, False)
+    assert cached_run(path, '--engine', engine) == (OUT, True)
+
+
+def test_each_engine_and_level_has_its_own_file(tmp_path):
+    path = script(tmp_path)
+    keys = [('--engine', engine, '-O', level) for engine in ENGINES for level in ('0', '2')]
+    for key in keys:
+        assert cached_run(path, *key) == (OUT, False)
+    assert len(cache_files(tmp_path / '__bbcache__')) == len(keys)
+    for key in keys:
+        assert cached_run(path, *key) == (OUT, True)
+
+
+def test_no_cache_neither_reads_nor_writes(tmp_path):
+    path = script(tmp_path)
+    assert cached_run(path, '--no-cache') == (OUT, False)
+    assert not (tmp_path / '__bbcache__').exists()
+    cached_run(path)
+    assert cached_run(path, '--no-cache') == (OUT, False)
+
+
+def test_cache_dir_mirrors_the_script_directory(tmp_path):
+    path = script(tmp_path / 'src')
+    cache_dir = tmp_path / 'cache'
+    assert cached_run(path, '--cache-dir', str(cache_dir)) == (OUT, False)
+    assert cached_run(path, '--cache-dir', str(cache_dir)) == (OUT, True)
+    assert not (tmp_path / 'src' / '__bbcache__').exists()
+    mirrored = cache_dir / str(tmp_path / 'src').lstrip(os.sep)
+    assert cache_files(mirrored) == cache_files(cache_dir) != []
+
+
+def test_compile_fills_the_cache(tmp_path):
+    script(tmp_path, name='a.erb')
+    script(tmp_path / 'sub', name='b.erb')
+    result = bgbasic('compile', '--engine', 'vm', '-j', '2', str(tmp_path))
+    assert (result.status, result.out) == (0, 'Compiled 2 of 2 files\n')
+    assert cached_run(str(tmp_path / 'sub' / 'b.erb'), '--engine', 'vm') == (OUT, True)
+    # another engine was not compiled
+    assert cached_run(str(tmp_path / 'a.erb'), '--engine', 'py') == (OUT, False)
+
+
+def test_compile_fails_if_any_file_does(tmp_path):
+    script(tmp_path, name='good.erb')
+    bad = script(tmp_path, 'rintperb (1 +\n', name='bad.erb')
+    result = bgbasic('compile', str(tmp_path))
+    assert result.status == 1
+    assert result.out == 'Compiled 1 of 2 files\n'
+    assert result.err.startswith(f'{bad}: ')
+    assert cache_files(tmp_path / '__bbcache__') != []
@@ -0,0 +1,71 @@
+import pytest
+
+from testutil import ENGINES, run
+
+
+def sharing(result):
+    [line] = [line for line in result.err.splitlines() if line.startswith('sharing:')]
+    return line
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_reassignment_drops_shared_values(engine):
+    result = run('hingterb Pos rgaerb x ndeerb\n'
+                 'p = ewnerb Pos[1]\n'
+                 'rintperb p.x + p.x\n'
+                 'p = ewnerb Pos[2]\n'
+                 'rintperb p.x + p.x\n'
+                 'xs = [1, 2]\n'
+                 'i = 1\n'
+                 'rintperb xs[i] * xs[i]\n'
+                 'i = 2\n'
+                 'rintperb xs[i] * xs[i]\n', '--engine', engine)
+    assert result.lines() == ['2', '4', '1', '4']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_loop_and_match_bindings_drop_shared_values(engine):
+    # the case binds a and the restore after it rebinds the old one:
+    # both have to drop the a * a memoized on the other
+    result = run('a = 2\n'
+                 'rintperb a * a\n'
+                 'a = 3\n'
+                 'rintperb a * a\n'
+                 'orferb a in [4, 5] rintperb a * a\n'
+                 'rintperb a * a\n'
+                 'atchmerb 6\n'
+                 'asecerb a henterb rintperb a * a\n'
+                 'ndeerb\n'
+                 'rintperb a * a\n', '--engine', engine)
+    assert result.lines() == ['4', '9', '16', '25', '25', '36', '25']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_thunk_made_before_an_assignment_sees_the_new_binding(engine):
+    result = run('a = 2\n'
+                 't = a * a\n'
+                 'a = 3\n'
+                 'rintperb a * a\n'
+                 'rintperb t\n', '--engine', engine)
+    assert result.lines() == ['9', '9']
+
+
+def test_sharing_report():
+    result = run('a = 2\n'
+                 't = a * a\n'
+                 'a = 3\n'
+                 'rintperb a * a\n'
+                 'rintperb t\n'
+                 'rintperb a * a\n', '--thunk-report')
+    assert sharing(result) == 'sharing: 3 expression nodes share 1 memoized values, 2 evaluations saved at runtime'
+
+
+def test_nothing_saved_across_reassignments():
+    result = run('a = 1\n'
+                 'rintperb a + 1\n'
+                 'a = 2\n'
+                 'rintperb a + 1\n'
+                 'a = 3\n'
+                 'rintperb a + 1\n', '--thunk-report')
+    assert result.lines() == ['2', '3', '4']
+    assert sharing(result).endswith(', 0 evaluations saved at runtime')
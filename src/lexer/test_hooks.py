@@ -0,0 +1,125 @@
+import json
+
+import pytest
+
+from testutil import python
+
+EVENTS = ('statement', 'eval', 'thunk', 'force', 'new', 'match')
+
+SOURCE = ('hingterb P rgaerb a rgaerb b ndeerb\n'
+          'p = ewnerb P[1, 2]\n'
+          'orferb i in [1, 2, 3]\n'
+          '  rintperb i * p.a\n'
+          'ndeerb\n'
+          'atchmerb p\n'
+          'asecerb P[x, y] henterb rintperb x + y\n'
+          'ndeerb\n')
+
+# runs stdin on an Interpreter with a hook on each event in argv, and
+# prints what the run printed and, per event, the calls as the names of
+# the node classes and the values that came with them
+HOOKS = '''
+import io, sys, json, contextlib
+from lexer import Lexer
+from parser import Parser
+from interpreter import Interpreter
+source = sys.stdin.read()
+interpreter = Interpreter()
+calls = {event: [] for event in sys.argv[1:]}
+for event in calls:
+    interpreter.add_hook(event, lambda *args, seen=calls[event]: seen.append(args))
+out = io.StringIO()
+with contextlib.redirect_stdout(out):
+    interpreter.interpret(Parser(Lexer('t', source).tokenize()).parse())
+def describe(arg):
+    if type(arg).__module__ == 'parser':
+        return type(arg).__name__
+    if type(arg).__name__ == 'Thunk':
+        return 'Thunk'
+    return repr(arg)
+print(json.dumps({'out': out.getvalue(),
+                  'calls': {event: [[describe(arg) for arg in args] for args in seen]
+                            for event, seen in calls.items()}}))
+'''
+
+# what removing hooks leaves on the instance
+REMOVE = '''
+from interpreter import Interpreter, HOOKED_METHODS
+def noop(*args):
+    pass
+interpreter = Interpreter()
+for event in HOOKED_METHODS:
+    interpreter.add_hook(event, noop)
+print(sorted(name for name in vars(interpreter) if not name.startswith('_traced')
+             and callable(getattr(interpreter, name))))
+for event in HOOKED_METHODS:
+    interpreter.remove_hook(event, noop)
+print(sorted(name for name in vars(interpreter) if callable(getattr(interpreter, name))))
+print(interpreter.hooks)
+'''
+
+ERRORS = '''
+from interpreter import Interpreter
+interpreter = Interpreter()
+def noop(*args):
+    pass
+for call in (lambda: interpreter.add_hook('evaluate', noop),
+             lambda: interpreter.remove_hook('eval', noop),
+             lambda: (interpreter.add_hook('eval', noop), interpreter.remove_hook('force', noop)),
+             lambda: (interpreter.remove_hook('eval', noop), interpreter.remove_hook('eval', noop))):
+    try:
+        call()
+        print('no error')
+    except ValueError as e:
+        print(str(e).split(':')[0])
+print(interpreter.hooks, sorted(vars(interpreter).keys() & {'eval', '_exec_statements', '_dispatch'}))
+'''
+
+
+def hooked(*events):
+    result = python(HOOKS, SOURCE, *events)
+    assert result.status == 0, result.err
+    return json.loads(result.out)
+
+
+@pytest.mark.parametrize('events', [(event,) for event in EVENTS] + [(), EVENTS])
+def test_hooks_leave_the_output_alone(events):
+    assert hooked(*events)['out'] == '1\n2\n3\n3\n'
+
+
+def test_statement_hook():
+    calls = hooked('statement')['calls']['statement']
+    assert calls == [['ThingDefNode'], ['AssignmentNode'], ['ForNode'],
+                     ['PrintNode'], ['PrintNode'], ['PrintNode'],
+                     ['MatchNode'], ['PrintNode']]
+
+
+def test_new_and_match_hooks():
+    calls = hooked('new', 'match')['calls']
+    assert [kind for kind, _ in calls['new']] == ['NewNode']
+    assert [(kind, case) for kind, _, case in calls['match']] == [('MatchNode', '0')]
+
+
+def test_eval_thunk_and_force_hooks():
+    calls = hooked('eval', 'thunk', 'force')['calls']
+    assert len(calls['eval']) == 31
+    # nothing in the program is left unforced
+    assert len(calls['thunk']) == len(calls['force']) == 22
+    assert all(thunk == 'Thunk' for _, thunk in calls['thunk'])
+    # the four printed values, as their thunks were forced
+    assert [value for kind, value in calls['force'] if kind == 'BinaryOpNode'] == ['1', '2', '3', '3']
+
+
+def test_removing_every_hook_leaves_the_plain_interpreter():
+    result = python(REMOVE)
+    assert result.status == 0, result.err
+    installed, left, hooks = result.lines()
+    assert installed == "['_dispatch', '_eval_new', '_exec_branch', '_exec_statements', 'eval']"
+    assert (left, hooks) == ('[]', '{}')
+
+
+def test_unknown_events_and_hooks_are_errors():
+    result = python(ERRORS)
+    assert result.status == 0, result.err
+    assert result.lines() == ['Unknown hook event', 'No such eval hook', 'No such force hook',
+                              'No such eval hook', '{} []']
@@ -0,0 +1,48 @@
+import pytest
+
+from testutil import ENGINES, run
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_indexing_forces_only_that_element(engine):
+    result = run('xs = [1, 1 / 0, 3]\n'
+                 'rintperb xs[1]\n'
+                 'rintperb xs[3]\n'
+                 'rintperb xs\n', '--engine', engine)
+    assert (result.status, result.out, result.err) == (1, '1\n3\n', 'Runtime error: Divide by zero\n')
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_elements_read_variables_when_forced_and_keep_the_value(engine):
+    result = run('n = 1\n'
+                 'ys = [n, n + 1]\n'
+                 'n = 5\n'
+                 'rintperb ys[2]\n'
+                 'n = 10\n'
+                 'rintperb ys\n', '--engine', engine)
+    assert result.lines() == ['6', '[10, 6]']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_loop_forces_elements_in_order(engine):
+    result = run('orferb x in [1, 2 * 1, 1 / 0] rintperb x\n', '--engine', engine)
+    assert (result.out, result.err) == ('1\n2\n', 'Runtime error: Divide by zero\n')
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_element_may_read_another_element_of_its_own_list(engine):
+    result = run('q = [q[2], 1]\nrintperb q[1]\n', '--engine', engine)
+    assert result.out == '1\n'
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_lazy_lists_in_comparisons_and_arithmetic(engine):
+    result = run('a = 5\n'
+                 'zs = [[1, a], [a / 0]]\n'
+                 'inner = zs[1]\n'
+                 'rintperb inner[2]\n'
+                 'a = 7\n'
+                 'rintperb [a, 2] + 1\n'
+                 'rintperb [a, 2] == [7, 2]\n'
+                 'rintperb [a, 2] * [a, 2]\n', '--engine', engine)
+    assert result.lines() == ['5', '[8, 3]', 'True', '[49, 4]']
@@ -0,0 +1,96 @@
+import pytest
+
+from testutil import ENGINES, run, python
+
+CASE_NAMES = '''
+import sys
+from lexer import Lexer
+from parser import Parser
+from resolver import Resolver
+from compiler import Compiler, disassemble
+from transpiler import Transpiler
+ast = Parser(Lexer('t', sys.stdin.read()).tokenize()).parse()
+resolver = Resolver()
+resolver.resolve(ast)
+[match] = [stmt for stmt in ast.statements if type(stmt).__name__ == 'MatchNode']
+print([tuple(resolver.names[slot] for slot in slots) for slots in match.case_slots])
+print(' | '.join(line.split(None, 2)[2] for line in disassemble(Compiler().compile(ast)).splitlines()
+                 if 'ENTER_SCOPE' in line))
+print(' | '.join(line.split(' = ')[1] for line in Transpiler().transpile(ast).splitlines()
+                 if line.strip().startswith('_s')))
+'''
+
+
+def test_only_rebindable_names_are_saved():
+    # three globals, but each case can only rebind its own names
+    source = ('a = 1\nb = 2\nc = 3\n'
+              'atchmerb 5\n'
+              'asecerb 1 henterb rintperb a\n'
+              'asecerb [x, _] henterb if rueterb henterb\n'
+              '  orferb i in [1] rintperb i\n'
+              'ndeerb\n'
+              'asecerb v henterb b = v\n'
+              'ndeerb\n')
+    result = python(CASE_NAMES, source)
+    assert result.status == 0, result.err
+    tree, vm, py = result.lines()
+    assert tree == "[(), ('i', 'x'), ('b', 'v')]"
+    assert vm == "() | ('i', 'x') | ('b', 'v')"
+    # py saves nothing for a case that rebinds nothing
+    assert py == "(v_i, v_x, ) | (v_b, v_v, )"
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_bindings_are_undone_after_the_case(engine):
+    result = run('a = 1\n'
+                 'b = 2\n'
+                 'atchmerb [3, 4]\n'
+                 'asecerb [a, c] henterb if rueterb henterb\n'
+                 '  b = a + c\n'
+                 '  atchmerb b\n'
+                 '  asecerb a henterb rintperb a\n'
+                 '  ndeerb\n'
+                 '  rintperb a\n'
+                 '  rintperb b\n'
+                 'ndeerb\n'
+                 'ndeerb\n'
+                 'rintperb [a, b]\n'
+                 'rintperb c\n', '--engine', engine)
+    assert result.lines() == ['7', '3', '7', '[1, 2]']
+    assert result.err == 'Runtime error: Undefined variable: c\n'
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_thunks_made_outside_see_the_case_only_if_forced_in_it(engine):
+    result = run('v = 100\n'
+                 'inside = v + 1\n'
+                 'outside = v + 2\n'
+                 'atchmerb 5\n'
+                 'asecerb v henterb rintperb inside\n'
+                 'ndeerb\n'
+                 'rintperb [inside, outside, v]\n', '--engine', engine)
+    assert result.lines() == ['6', '[6, 102, 100]']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_nested_loops_and_matches_restore_in_order(engine):
+    result = run('v = 100\n'
+                 'orferb i in [1, 2, 3]\n'
+                 '  atchmerb i\n'
+                 '  asecerb 2 henterb if rueterb henterb\n'
+                 '    orferb k in [10, 20]\n'
+                 '      atchmerb k\n'
+                 '      asecerb 10 henterb rintperb "ten"\n'
+                 '      asecerb z henterb if rueterb henterb\n'
+                 '        v = z + i\n'
+                 '        rintperb v\n'
+                 '      ndeerb\n'
+                 '      ndeerb\n'
+                 '    ndeerb\n'
+                 '    rintperb v\n'
+                 '  ndeerb\n'
+                 '  asecerb _ henterb rintperb i\n'
+                 '  ndeerb\n'
+                 'ndeerb\n'
+                 'rintperb v\n', '--engine', engine)
+    assert result.lines() == ['1', 'ten', '22', '100', '3', '100']
@@ -0,0 +1,56 @@
+import sys
+import subprocess
+
+import pytest
+
+from testutil import ENGINES, HERE, run
+
+THING = 'hingterb P rgaerb a rgaerb b ndeerb\n'
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('pattern, got', [
+    ('P[a]', 1),
+    ('P[a, b, c]', 3),
+    ('[P[a]]', 1),
+    ('P[P[a], b]', 1),
+])
+def test_record_pattern_with_wrong_arity_is_an_error(engine, pattern, got):
+    # raised when the match is compiled, before anything runs
+    result = run(THING +
+                 'rintperb "start"\n'
+                 'atchmerb ewnerb P[1, 2]\n'
+                 f'asecerb {pattern} henterb rintperb 1\n'
+                 'asecerb _ henterb rintperb "other"\n'
+                 'ndeerb\n', '--engine', engine)
+    assert (result.status, result.out, result.err) == (
+        1, '', f'Runtime error: P expects 2 rgaerbs, got {got}\n')
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_same_message_as_ewnerb(engine):
+    result = run(THING + 'p = ewnerb P[1]\nrintperb p\n', '--engine', engine)
+    assert result.err == 'Runtime error: P expects 2 rgaerbs, got 1\n'
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_matching_arity_and_unknown_hingterbs_still_work(engine):
+    result = run(THING +
+                 'atchmerb [ewnerb P[1, 2]]\n'
+                 'asecerb [Q[a]] henterb rintperb "q"\n'
+                 'asecerb [P[a, b]] henterb rintperb a + b\n'
+                 'ndeerb\n', '--engine', engine)
+    assert (result.status, result.out) == (0, '3\n')
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_hingterb_from_an_earlier_repl_line(engine):
+    lines = (THING +
+             'atchmerb 1\n'
+             'asecerb P[a] henterb rintperb a\n'
+             'lseerb rintperb "no" ndeerb\n'
+             'rintperb "after"\n')
+    result = subprocess.run([sys.executable, 'bgbasic', '--engine', engine], input=lines,
+                            cwd=HERE, capture_output=True, text=True)
+    assert 'Runtime error: P expects 2 rgaerbs, got 1\n' in result.stdout
+    assert 'after\n' in result.stdout
@@ -0,0 +1,106 @@
+import pytest
+
+from testutil import ENGINES, run, python
+
+OPTIMIZE = '''
+import sys
+from lexer import Lexer
+from parser import Parser
+from optimizer import Optimizer
+ast = Parser(Lexer('t', sys.stdin.read()).tokenize()).parse()
+for stmt in Optimizer(int(sys.argv[1])).optimize(ast).statements:
+    print(stmt)
+'''
+
+
+def optimized(source, level):
+    # the statements left after -O level, one repr a line
+    result = python(OPTIMIZE, source, str(level))
+    assert result.status == 0, result.err
+    return result.lines()
+
+
+def test_fold_literal_arithmetic():
+    assert optimized('a = 1 + 2 * 3\nb = (4 - 1) / 2\n', 1) == [
+        'AssignmentNode(name=a, value=NumberNode(value=7))',
+        'AssignmentNode(name=b, value=NumberNode(value=1.5))',
+    ]
+
+
+@pytest.mark.parametrize('level', (1, 2))
+def test_subtrees_that_raise_are_not_folded(level):
+    assert optimized('y = 1 / 0\nz = 1 + "a"\n', level) == [
+        'AssignmentNode(name=y, value=BinaryOpNode(NumberNode(value=1) DIV NumberNode(value=0)))',
+        'AssignmentNode(name=z, value=BinaryOpNode(NumberNode(value=1) PLUS StringNode(value=a)))',
+    ]
+
+
+def test_level_one_keeps_branches():
+    source = 'if rueterb henterb rintperb "t" lseerb rintperb "f" ndeerb\n'
+    [stmt] = optimized(source, 1)
+    assert stmt.startswith('IfNode(')
+
+
+def test_constant_if_keeps_only_the_branch_taken():
+    source = 'if rueterb henterb rintperb "t" lseerb rintperb "f" ndeerb\n'
+    assert optimized(source, 2) == ['PrintNode(expression=StringNode(value=t))']
+
+
+def test_loop_over_empty_literal_is_dropped():
+    assert optimized('orferb i in [] rintperb i\nrintperb 1\n', 2) == [
+        'PrintNode(expression=NumberNode(value=1))',
+    ]
+
+
+def test_cases_after_an_irrefutable_pattern_are_dropped():
+    source = ('atchmerb x\n'
+              'asecerb 1 henterb rintperb "one"\n'
+              'asecerb _ henterb rintperb "any"\n'
+              'asecerb 2 henterb rintperb "two"\n'
+              'lseerb rintperb "else" ndeerb\n')
+    [stmt] = optimized(source, 2)
+    assert 'StringNode(value=any)' in stmt
+    assert 'value=two' not in stmt and 'value=else' not in stmt
+    assert stmt.endswith('else=None)')
+
+
+def test_match_on_a_constant_runs_the_case_inline():
+    source = ('atchmerb 1 + 1\n'
+              'asecerb 1 henterb rintperb "one"\n'
+              'asecerb 2 henterb rintperb "two"\n'
+              'ndeerb\n')
+    assert optimized(source, 2) == ['PrintNode(expression=StringNode(value=two))']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('source, error', [
+    ('if 5 henterb rintperb "bad" ndeerb\n',
+     'Runtime error: Type error: if condition must be boolean, got int\n'),
+    ('atchmerb 7\nasecerb 8 henterb q = 1\nndeerb\n',
+     'Runtime error: No pattern matched value: 7\n'),
+])
+def test_runtime_errors_survive_pruning(engine, source, error):
+    for level in ('0', '2'):
+        result = run(source, '--engine', engine, '-O', level)
+        assert (result.status, result.err) == (1, error)
+
+
+PROGRAM = '''a = 1 + 2 * 3
+rintperb a
+if 1 > 2 henterb rintperb "no" lseerb rintperb "yes" ndeerb
+orferb i in [] rintperb i
+y = 1 / 0
+x = 2
+atchmerb 5
+asecerb w henterb x = w
+ndeerb
+rintperb x
+atchmerb 3
+asecerb 1 henterb rintperb "one" lseerb rintperb "three" ndeerb
+'''
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_levels_give_the_same_output(engine):
+    outputs = [run(PROGRAM, '--engine', engine, '-O', level).out for level in ('0', '1', '2')]
+    assert outputs == ['7\nyes\n2\nthree\n'] * 3
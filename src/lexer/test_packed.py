@@ -0,0 +1,65 @@
+import pytest
+
+from testutil import ENGINES, run, python
+
+PACK = '''
+from interpreter import pack, NumArray
+values = [[1, 2], [1.5, 2.0], [True, 1], [2 ** 70, 1], [1, 2.5], ["a"], []]
+for value in values:
+    packed = pack(value)
+    print(packed.typecode if isinstance(packed, NumArray) else 'list')
+'''
+
+
+def test_only_all_int_or_all_float_lists_are_packed():
+    result = python(PACK)
+    assert result.status == 0, result.err
+    assert result.lines() == ['q', 'd', 'list', 'list', 'list', 'list', 'list']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_packed_lists_behave_like_lists(engine):
+    result = run('xs = [1, 2, 3]\n'
+                 'rintperb xs\n'
+                 'rintperb xs[2]\n'
+                 'rintperb xs == [1, 2, 3]\n'
+                 'rintperb [xs, [1.5]]\n'
+                 'orferb x in xs rintperb x\n', '--engine', engine)
+    assert result.lines() == ['[1, 2, 3]', '2', 'True', '[[1, 2, 3], [1.5]]', '1', '2', '3']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_elementwise_arithmetic(engine):
+    result = run('xs = [1, 2, 3]\n'
+                 'ys = [10, 20, 30]\n'
+                 'rintperb xs + ys\n'
+                 'rintperb xs * 2\n'
+                 'rintperb 2 - xs\n'
+                 'rintperb [1.5, 2.5] / 2\n'
+                 'rintperb ys % [3, 7, 4]\n'
+                 'rintperb [1, 2.5] + [1, 1]\n'
+                 'rintperb [9223372036854775807 + 1, 1] + [1, 1]\n', '--engine', engine)
+    assert result.lines() == ['[11, 22, 33]', '[2, 4, 6]', '[1, 0, -1]', '[0.75, 1.25]',
+                              '[1, 6, 2]', '[2, 3.5]', '[9223372036854775809, 2]']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('expression, error', [
+    ('[1, 2] + [1, 2, 3]', 'Type error: + on lists of different lengths, 2 and 3'),
+    ('[1, 2] / [1, 0]', 'Divide by zero'),
+    ('[1, 2] % 0', 'Divide by zero'),
+    ('[1.0, 2.0] / 0', 'Divide by zero'),
+    # lists of anything but numbers keep the messages from before packing
+    ('[1, "a"] + [1, 2]', 'Type error: + requires numbers, got list, list'),
+    ('["a"] * 2', 'Type error: * requires numbers, got list, int'),
+    ('[rueterb] + [1]', 'Type error: + requires numbers, got list, list'),
+])
+def test_elementwise_errors(engine, expression, error):
+    result = run(f'rintperb 1\nrintperb {expression}\n', '--engine', engine)
+    assert (result.status, result.out, result.err) == (1, '1\n', f'Runtime error: {error}\n')
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_packed_index_out_of_bounds(engine):
+    result = run('xs = [1, 2]\nrintperb xs[5]\n', '--engine', engine)
+    assert result.err == 'Runtime error: Index out of bounds: 5 not in [1..2]\n'
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from testutil import python
+
+# each source through both parsers: the tree, or the error it raised,
+# and how many statements the first to parse it found
+PARSE = '''
+import json
+import sys
+from lexer import Lexer
+from parser import Parser, DescentParser
+results = []
+for source in json.load(sys.stdin):
+    tokens = Lexer('t', source).tokenize()
+    row = []
+    statements = None
+    for parser in (Parser, DescentParser):
+        try:
+            program = parser(tokens).parse()
+            row.append(repr(program))
+            if statements is None:
+                statements = len(program.statements)
+        except Exception as e:
+            row.append(f'error: {e}')
+    results.append(row + [statements])
+print(json.dumps(results))
+'''
+
+CHAINED = "error: Expected one '..' in a range, use tepserb for the step"
+
+RANGES = [
+    ('x = (1..2)..3\n', 'RangeNode(RangeNode(NumberNode(value=1)..NumberNode(value=2) step None)'
+                        '..NumberNode(value=3) step None)'),
+    ('x = 1..(2..3)\n', None),
+    ('x = (1..2)..(3..4) tepserb 2\n', None),
+    ('x = ((1..2))..3\n', None),
+    ('x = 1..2 < 3..4\n', None),
+    ('x = 1 + 2..3 * 4 tepserb 5\n', None),
+    ('x = 1..2..3\n', CHAINED),
+    ('x = 1..2 tepserb 3..4\n', CHAINED),
+    ('x = (1..2)..3..4\n', CHAINED),
+    ('x = 1..2..\n', CHAINED),
+]
+
+
+def parse_both(sources):
+    result = python(PARSE, json.dumps(sources))
+    assert result.status == 0, result.err
+    return json.loads(result.out)
+
+
+def test_pratt_and_descent_agree_on_ranges():
+    results = parse_both([source for source, _ in RANGES])
+    for (source, expected), (pratt, descent, _) in zip(RANGES, results):
+        assert pratt == descent, source
+        if expected is not None and expected.startswith('error'):
+            assert pratt == expected, source
+        elif expected is not None:
+            assert expected in pratt, source
+        else:
+            assert not pratt.startswith('error'), source
+
+
+@pytest.mark.parametrize('source', [
+    'x = 1 + 2 * 3 - 4 % 5 / 6\n',
+    'x = a < b < c\n',
+    'x = otnerb a ndaerb b or otnerb otnerb c\n',
+    'x = (1 + 2) * (3 - 4)\n',
+    'rintperb xs[1 + 2] == p.pos.x\n',
+])
+def test_pratt_and_descent_agree(source):
+    [(pratt, descent, statements)] = parse_both([source])
+    assert pratt == descent
+    assert statements == 1, pratt
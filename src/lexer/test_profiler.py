@@ -0,0 +1,40 @@
+from testutil import run
+
+SOURCE = ('^^ a comment\n'
+          '\n'
+          's = "two\n'
+          'lines"\n'
+          'orferb i in 1..3\n'
+          '\n'
+          '  t = i * 2 ^^ trailing\n'
+          'ndeerb\n'
+          'rintperb   t\n'
+          'rintperb "a\n'
+          '\n'
+          'b"\n'
+          'u = 1\n')
+
+
+def profiled_lines(result):
+    # line -> (hits, source) from the per-line table
+    rows = {}
+    table = result.err.split('\n')[2:]
+    for row in table:
+        if row.startswith('kind'):
+            break
+        line, hits, _, _, _, *source = row.split()
+        rows[int(line)] = (int(hits), ' '.join(source))
+    return rows
+
+
+def test_statements_are_charged_to_the_line_they_start_on():
+    result = run(SOURCE, '--profile')
+    assert result.status == 0, result.err
+    assert profiled_lines(result) == {
+        3: (1, 's = "two'),
+        5: (1, 'orferb i in 1..3'),
+        7: (3, 't = i * 2 ^^ trailing'),
+        9: (1, 'rintperb t'),
+        10: (1, 'rintperb "a'),
+        13: (1, 'u = 1'),
+    }
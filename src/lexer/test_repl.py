@@ -0,0 +1,47 @@
+import sys
+import subprocess
+
+import pytest
+
+from testutil import ENGINES, HERE
+
+BANNER = 'FERB Latin REPL v0.1  (Ctrl-D to exit)\n\n'
+
+
+def repl(lines, *args):
+    # what the REPL printed for lines piped in, prompts included: output
+    # right after a prompt was printed before the next line was read
+    result = subprocess.run([sys.executable, 'bgbasic', *args], input=''.join(lines),
+                            cwd=HERE, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.startswith(BANNER)
+    return result.stdout[len(BANNER):]
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_one_line_if_runs_on_enter(engine):
+    out = repl(['if rueterb henterb rintperb 1\n',
+                'if alseferb henterb rintperb 0 lseerb rintperb 2\n',
+                'if alseferb henterb rintperb 0 utifberb rueterb henterb rintperb 3\n',
+                'if alseferb henterb rintperb 0 lseerb rintperb 4 ndeerb\n',
+                'rintperb 5\n'], '--engine', engine)
+    assert out == '>>> 1\n>>> 2\n>>> 3\n>>> 4\n>>> 5\n>>> \n'
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_block_if_runs_at_its_ndeerb(engine):
+    out = repl(['if alseferb henterb\n',
+                '  rintperb 0\n',
+                'utifberb rueterb henterb\n',
+                '  rintperb 1\n',
+                '  rintperb 2\n',
+                'lseerb\n',
+                '  rintperb 0\n',
+                'ndeerb\n',
+                'rintperb 3\n'], '--engine', engine)
+    assert out == '>>> ... ... ... ... ... ... ... 1\n2\n>>> 3\n>>> \n'
+
+
+def test_blank_line_ends_an_open_block():
+    out = repl(['if rueterb henterb\n', '  rintperb 1\n', '\n', 'rintperb 2\n'])
+    assert out == '>>> ... ... 1\n>>> 2\n>>> \n'
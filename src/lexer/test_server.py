@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+import subprocess
+
+from testutil import HERE, python
+
+BIND = '''
+import socket
+import sys
+import server
+path = sys.argv[1]
+if sys.argv[2] == 'stale':
+    # bound once and closed, as a server killed with -9 leaves it
+    old = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old.bind(path)
+    old.close()
+elif sys.argv[2] == 'live':
+    live = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    live.bind(path)
+    live.listen(1)
+try:
+    server.bind(path).close()
+    print('bound')
+except OSError as e:
+    print(e)
+'''
+
+
+def bind(path, what):
+    result = python(BIND, '', path, what)
+    assert result.status == 0, result.err
+    return result.out.strip()
+
+
+def test_stale_socket_is_replaced():
+    with tempfile.TemporaryDirectory() as tmp:
+        assert bind(os.path.join(tmp, 's'), 'stale') == 'bound'
+
+
+def test_live_socket_is_left_alone():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 's')
+        assert bind(path, 'live') == f'a server is already listening on {path}'
+
+
+def test_file_that_is_not_a_socket_is_left_alone():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 's')
+        with open(path, 'w') as f:
+            f.write('keep me\n')
+        assert bind(path, 'file') == f'{path} exists and is not a socket'
+        with open(path) as f:
+            assert f.read() == 'keep me\n'
+
+
+def test_serve_refuses_a_path_that_is_not_a_socket():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 's')
+        os.mkdir(path)
+        result = subprocess.run([sys.executable, os.path.join(HERE, 'bgbasic'), 'serve',
+                                 '--socket', path, '-w', '1'],
+                                cwd=HERE, capture_output=True, text=True, timeout=30)
+        assert result.returncode == 1
+        assert result.stderr == f'Could not serve on {path}: {path} exists and is not a socket\n'
+        assert os.path.isdir(path)
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from testutil import ENGINES, run
+
+PROGRAM = ('hingterb P rgaerb a rgaerb b ndeerb\n'
+           'xs = [1, 2, 3]\n'
+           'ys = xs * 2\n'
+           'p = ewnerb P[ys, ewnerb P[1, 2]]\n'
+           'unused = 1 / 0\n'
+           'rintperb p.a\n')
+
+# four bound at most while the case runs, two once it has been undone
+CASES = ('a = 1\n'
+         'orferb i in [1, 2]\n'
+         '  atchmerb [i, 3]\n'
+         '  asecerb [x, y] henterb rintperb x + y\n'
+         '  ndeerb\n'
+         'ndeerb\n')
+
+
+def stats(source, *args):
+    result = run(source, '--stats', 'json', *args)
+    return result, json.loads(result.err.splitlines()[-1])
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_every_engine_fills_every_counter(engine):
+    result, counts = stats(PROGRAM, '--engine', engine)
+    assert result.out == '[2, 4, 6]\n'
+    assert (counts['status'], counts['things'], counts['list_elements'], counts['env']) == (
+        'ok', 2, 6, {'peak': 4})
+    assert counts['nodes']['AssignmentNode'] == 4
+    thunks = counts['thunks']
+    assert thunks['never_forced'] == thunks['created'] - thunks['forced'] > 0
+
+
+def test_vm_and_py_count_the_same_thunks():
+    _, vm = stats(PROGRAM, '--engine', 'vm')
+    _, py = stats(PROGRAM, '--engine', 'py')
+    assert vm['thunks'] == py['thunks']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_env_peak_includes_bindings_a_case_undid(engine):
+    _, counts = stats(CASES + 'b = 2\n', '--engine', engine)
+    assert counts['env'] == {'peak': 4}
+    _, counts = stats(CASES + 'b = 2\nc = 3\nd = 4\n', '--engine', engine)
+    assert counts['env'] == {'peak': 5}
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_counters_are_printed_when_the_run_fails(engine):
+    result, counts = stats('a = 1\n'
+                           'atchmerb [1, 2]\n'
+                           'asecerb [x, y] henterb rintperb x / 0\n'
+                           'ndeerb\n', '--engine', engine)
+    assert result.status == 1
+    assert (counts['status'], counts['env']) == ('error', {'peak': 3})
+
+
+def test_py_without_locals_keeps_the_same_env_peak():
+    # past LOCALS_LIMIT the py engine keeps variables in its env dict
+    source = ''.join(f'v{i} = {i}\n' for i in range(600)) + CASES
+    peaks = [stats(source, '--engine', engine)[1]['env'] for engine in ENGINES]
+    assert peaks == [{'peak': 604}] * 3
@@ -0,0 +1,82 @@
+import pytest
+
+from testutil import ENGINES, run, python
+
+STRICT = '''
+import sys
+from lexer import Lexer
+from parser import Parser
+from strictness import StrictnessAnalyzer
+ast = Parser(Lexer('t', sys.stdin.read()).tokenize()).parse()
+StrictnessAnalyzer().analyze(ast)
+for stmt in ast.statements:
+    print(stmt.name, getattr(stmt.value, 'strict', False))
+'''
+
+
+def strict_names(source):
+    # names whose right-hand side the pass marked strict
+    result = python(STRICT, source)
+    assert result.status == 0, result.err
+    return [name for name, strict in (line.split() for line in result.lines()) if strict == 'True']
+
+
+def test_literals_and_safe_arithmetic_are_strict():
+    source = 'x = 1 + 2\ny = [1, 2.5, "s"]\nz = 1 < 2\nw = 7 % 3\n'
+    assert strict_names(source) == ['x', 'y', 'z', 'w']
+
+
+def test_what_could_be_observed_stays_lazy():
+    source = ('n = 1\n'
+              'a = 1 / 0\n'
+              'b = 1 + "a"\n'
+              'c = n\n'
+              'd = [n, 1]\n'
+              'e = d[0]\n'
+              'f = ewnerb P[1]\n'
+              'g = n + 1\n')
+    assert strict_names(source) == ['n']
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_deferred_errors_stay_deferred(engine):
+    result = run('hingterb P rgaerb a rgaerb b ndeerb\n'
+                 'p = ewnerb P[1, 2]\n'
+                 'a = 1 / 0\n'
+                 'b = 1 + "a"\n'
+                 'c = [1, 2][5]\n'
+                 'd = ewnerb Q[1]\n'
+                 'e = p.zz\n'
+                 'rintperb "ok"\n', '--engine', engine)
+    assert (result.status, result.out, result.err) == (0, 'ok\n', '')
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_forcing_a_deferred_error_raises_it(engine):
+    result = run('a = 1 / 0\nrintperb 1\nrintperb a\n', '--engine', engine)
+    assert result.status == 1
+    assert result.out == '1\n'
+    assert result.err == 'Runtime error: Divide by zero\n'
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_variables_are_read_when_forced(engine):
+    result = run('x = 1\ny = x + 1\nx = 5\nrintperb y\n', '--engine', engine)
+    assert result.out == '6\n'
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_loop_items_and_match_bindings_hold_values(engine):
+    result = run('orferb i in [1, 2, 3]\n'
+                 '  rintperb i * 10\n'
+                 'ndeerb\n'
+                 'atchmerb [4, 5]\n'
+                 'asecerb k henterb rintperb k\n'
+                 'ndeerb\n', '--engine', engine)
+    assert result.lines() == ['10', '20', '30', '[4, 5]']
+
+
+def test_thunk_report_counts_avoided_thunks():
+    result = run('x = 1 + 2\nxs = [1, 2, 3]\norferb i in xs\n  rintperb i\nndeerb\n', '--thunk-report')
+    assert 'strictness: 2 of 2 bindings stored without a thunk' in result.err
+    assert 'thunk allocations avoided at runtime' in result.err
@@ -0,0 +1,54 @@
+import pytest
+
+from testutil import ENGINES, run
+
+# far past the recursion limit, and past what the py engine could
+# compile with every variable a local
+DEPTH = 200000
+CYCLE = 'Runtime error: Cyclic definition: a value depends on itself\n'
+
+
+def chain(depth, cyclic=False):
+    # the same chain as bench.py thunks: a{i} = a{i-1} + 1
+    first = f'a{depth - 1} + 1' if cyclic else '1'
+    lines = [f'a0 = {first}'] + [f'a{i} = a{i - 1} + 1' for i in range(1, depth)]
+    lines.append(f'rintperb a{depth - 1}')
+    return '\n'.join(lines) + '\n'
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_deep_chain_forces(engine):
+    result = run(chain(DEPTH), '--engine', engine)
+    assert (result.status, result.out, result.err) == (0, f'{DEPTH}\n', '')
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_deep_cycle_is_reported(engine):
+    result = run(chain(DEPTH, cyclic=True), '--engine', engine)
+    assert (result.status, result.out, result.err) == (1, '', CYCLE)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_self_reference_is_reported(engine):
+    result = run('x = 1\nx = x + 1\nrintperb 0\nrintperb x\n', '--engine', engine)
+    assert (result.status, result.out, result.err) == (1, '0\n', CYCLE)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('depth', (63, 64, 65, 128, 129))
+def test_chain_around_the_unwind_depth(engine, depth):
+    # MAX_FORCE_DEPTH is 64: a chain is unwound and rerun in pieces of it
+    result = run(chain(depth), '--engine', engine)
+    assert result.out == f'{depth}\n'
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('term', ('1', 'a'))
+def test_long_expression_chain(engine, term):
+    # one expression nested far deeper than MAX_FORCE_DEPTH, and than the
+    # 200 parentheses Python's parser takes if the py engine nested a
+    # call per operator. Each operand is evaluated once, not once more
+    # for every unwind
+    source = f"a = 1\nx = {' + '.join([term] * 300)}\nrintperb x\n"
+    result = run(source, '--engine', engine, '-O', '0')
+    assert (result.status, result.out, result.err) == (0, '300\n', '')
@@ -0,0 +1,29 @@
+import pytest
+
+from testutil import ENGINES, run
+
+UNDEFINED = 'Runtime error: Undefined variable: missingVar\n'
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('source', (
+    'rintperb missingVar\n',
+    'rintperb missingVar[1]\n',
+    'atchmerb 1\nasecerb x henterb rintperb x + missingVar\nndeerb\n',
+))
+def test_reading_a_name_never_assigned(engine, source):
+    result = run(source, '--engine', engine)
+    assert (result.status, result.out, result.err) == (1, '', UNDEFINED)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_thunk_reading_a_name_never_assigned_fails_when_forced(engine):
+    result = run('t = missingVar + 1\nrintperb 2\nrintperb t\n', '--engine', engine)
+    assert (result.status, result.out, result.err) == (1, '2\n', UNDEFINED)
+
+
+def test_py_without_locals_reads_the_same_way():
+    # past LOCALS_LIMIT every variable is read from the env dict
+    source = ''.join(f'v{i} = {i}\n' for i in range(600))
+    result = run(source + 't = missingVar\nrintperb v599\nrintperb t\n', '--engine', 'py')
+    assert (result.status, result.out, result.err) == (1, '599\n', UNDEFINED)
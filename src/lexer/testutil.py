@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+# Helpers for the test_*.py files. They run bgbasic, or a snippet that
+# imports its modules, in a child process started in this directory:
+# token.py here shadows the standard library's token module, which the
+# test runner has already imported by the time a test starts.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENGINES = ('tree', 'vm', 'py')
+
+
+class Result:
+    def __init__(self, process):
+        self.status = process.returncode
+        self.out = process.stdout
+        self.err = process.stderr
+
+    def lines(self):
+        return self.out.splitlines()
+
+
+def run(source, *args):
+    # bgbasic on source, without the cache
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'test.erb')
+        with open(path, 'w') as f:
+            f.write(source)
+        return Result(subprocess.run(
+            [sys.executable, os.path.join(HERE, 'bgbasic'), '--no-cache', *args, path],
+            cwd=HERE, capture_output=True, text=True))
+
+
+def python(code, stdin='', *args):
+    # a snippet run with this directory's modules importable
+    return Result(subprocess.run([sys.executable, '-c', code, *args], input=stdin,
+                                 cwd=HERE, capture_output=True, text=True))
@@ -1,3 +1,5 @@
+from array import array
+
  # Token Types 
 TK_STRING       = 'STRONK'     # string
 TK_INT          = 'INT'        # interger
@@ -23,6 +25,7 @@ TK_MUL          = 'MUL'        # *
 TK_DIV          = 'DIV'        # /
 TK_MOD          = 'MOD'        # %
 TK_DOT          = 'DOT'        # .
+TK_RANGE        = 'RANGE'      # ..
 
 
 #Add keywords "true", "false"
@@ -47,9 +50,35 @@ RESERVED_WORDS = [
    'otnerb',     # not
    'atchmerb',   # match
    'asecerb',    # case
+   'tepserb',    # step
 ]
 
 
+# Integer token kinds, used by the parser and the compact TokenBuffer.
+# Every reserved word gets a kind of its own, so the parser can dispatch
+# on a single int compare instead of checking type and then value.
+KIND_NAMES = [
+    TK_STRING, TK_INT, TK_FLOAT, TK_NAME, TK_RESERVED, TK_ADD, TK_SUB,
+    TK_ASSIGN, TK_LESS, TK_MORE, TK_L_PAREN, TK_R_PAREN, TK_L_BRACKET,
+    TK_R_BRACKET, TK_SEP, TK_LINEBREAK, TK_DONE, TK_BOOL, TK_EQEQ, TK_NEQ,
+    TK_MUL, TK_DIV, TK_MOD, TK_DOT, TK_RANGE, 'INVALID_NUMBER', 'UNKNOWN',
+] + RESERVED_WORDS
+KINDS = {name: kind for kind, name in enumerate(KIND_NAMES)}
+
+(K_STRING, K_INT, K_FLOAT, K_NAME, K_RESERVED, K_ADD, K_SUB,
+ K_ASSIGN, K_LESS, K_MORE, K_L_PAREN, K_R_PAREN, K_L_BRACKET,
+ K_R_BRACKET, K_SEP, K_LINEBREAK, K_DONE, K_BOOL, K_EQEQ, K_NEQ,
+ K_MUL, K_DIV, K_MOD, K_DOT, K_RANGE, K_INVALID_NUMBER, K_UNKNOWN) = range(27)
+
+(KW_PRINT, KW_INPUT, KW_THING, KW_ARG, KW_END, KW_NEW, KW_IF, KW_THEN,
+ KW_ELSE, KW_BUTIF, KW_FOR, KW_IN, KW_LET, KW_TRUE, KW_FALSE, KW_AND,
+ KW_OR, KW_NOT, KW_MATCH, KW_CASE, KW_STEP) = [KINDS[word] for word in RESERVED_WORDS]
+
+def kind_of(type, value=None):
+    if type == TK_RESERVED and value in KINDS:
+        return KINDS[value]
+    return KINDS.get(type, K_UNKNOWN)
+
 
 class Token:
     def __init__(self, type, value=None, begin=None, finish=None):
@@ -57,6 +86,8 @@ class Token:
         self.type = type
         # value of the token (42, "hi")
         self.value = value
+        # integer kind, see KIND_NAMES
+        self.kind = kind_of(type, value)
 
     def equals(self, type, value):
         # check if kind and data match this token
@@ -67,3 +98,30 @@ class Token:
         if self.value is not None:
             return f'{self.type}:{self.value}'
         return f'{self.type}'
+
+
+class TokenBuffer:
+    # Struct-of-arrays token stream built by Lexer.buffer(): one entry per
+    # token in each column. Equal tokens share one Token object in `table`,
+    # so a token costs 13 bytes plus nothing for its value.
+    def __init__(self):
+        self.kinds = array('B')
+        self.ids = array('I')     # index into table
+        self.starts = array('I')  # source offsets, end exclusive
+        self.ends = array('I')
+        self.table = []
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def token(self, i):
+        return self.table[self.ids[i]]
+
+    def span(self, i):
+        return self.starts[i], self.ends[i]
+
+    def __iter__(self):
+        return map(self.table.__getitem__, self.ids)
+
+    def nbytes(self):
+        return sum(col.itemsize * len(col) for col in (self.kinds, self.ids, self.starts, self.ends))
@@ -0,0 +1,502 @@
+import math
+
+from parser import (
+    ProgramNode, AssignmentNode, ArrayNode, NumberNode, StringNode,
+    IdentifierNode, IndexNode, PrintNode, IfNode, BlockNode,
+    ForNode, ThingDefNode, NewNode, AttrAccessNode,
+    BooleanNode, UnaryOpNode, BinaryOpNode, ComparisonNode,
+    PatternWildcard, MatchNode, PatternVar, PatternLiteral,
+    assigned_names, pattern_names, thing_arities
+)
+from interpreter import (
+    Thunk, RuntimeError,
+    binary_op, compare_op, unary_op, index_value, iter_value,
+    check_condition, define_thing, new_object, attr_value, pack, make_range,
+    match_value, record_arities, compile_cases
+)
+from matcher import leaf_cases
+from resolver import UNBOUND
+
+NUMBER = (int, float)
+
+# compiling a nested function copies every local of the function around
+# it, so with locals a program costs variables x thunks to compile: 5000
+# variables took 9s where the env dict takes under 1s. Past this many
+# variables the env dict is used instead
+LOCALS_LIMIT = 500
+
+# Python's parser gives up at 200 nested parentheses, and each operator
+# is a call nested one deeper than its operand. A longer chain of them,
+# like the a + b + c + ... the parser builds leaning left, is run one
+# operator at a time through a temporary instead
+CHAIN_LIMIT = 50
+
+
+class TranspileError(Exception):
+    pass
+
+# Generated code calls these for every operation that can fail, so the
+# fast path is a couple of isinstance checks and the error path is the
+# exact same helper the tree-walker uses.
+
+def _add(left, right):
+    if isinstance(left, NUMBER) and isinstance(right, NUMBER):
+        return left + right
+    return binary_op('+', left, right)
+
+def _sub(left, right):
+    if isinstance(left, NUMBER) and isinstance(right, NUMBER):
+        return left - right
+    return binary_op('-', left, right)
+
+def _mul(left, right):
+    if isinstance(left, NUMBER) and isinstance(right, NUMBER):
+        return left * right
+    return binary_op('*', left, right)
+
+def _div(left, right):
+    return binary_op('/', left, right)
+
+def _mod(left, right):
+    return binary_op('%', left, right)
+
+def _and(left, right):
+    return binary_op('and', left, right)
+
+def _or(left, right):
+    return binary_op('or', left, right)
+
+def _not(val):
+    if val is True or val is False:
+        return not val
+    return unary_op('not', val)
+
+def _cond(cond):
+    if cond is True or cond is False:
+        return cond
+    return check_condition(cond)
+
+def _undef(name):
+    # an unbound variable is a thunk that raises every time it is forced.
+    # It stands for the tree-walker's UNBOUND, not for a delayed
+    # expression, so it skips __init__ and is not counted as made
+    def fail():
+        raise RuntimeError(f"Undefined variable: {name}")
+    thunk = Thunk.__new__(Thunk)
+    thunk.fn = fail
+    thunk._value = None
+    return thunk
+
+def _no_match(val):
+    raise RuntimeError(f"No pattern matched value: {val}")
+
+RUNTIME = {
+    '_T': Thunk,
+    '_add': _add, '_sub': _sub, '_mul': _mul, '_div': _div, '_mod': _mod,
+    '_and': _and, '_or': _or, '_not': _not,
+    '_binary': binary_op, '_compare': compare_op, '_unary': unary_op,
+    '_index': index_value, '_attr': attr_value, '_iter': iter_value,
+    '_pack': pack, '_range': make_range, '_match': match_value,
+    '_cond': _cond, '_undef': _undef, '_no_match': _no_match,
+}
+
+BINARY_HELPERS = {
+    'PLUS': '_add', '+': '_add',
+    'MINUS': '_sub', '-': '_sub',
+    'MUL': '_mul', '*': '_mul',
+    'DIV': '_div', '/': '_div',
+    'MOD': '_mod', '%': '_mod',
+    'and': '_and',
+    'or': '_or',
+}
+
+# operator node -> the operand its chain goes on through, and the method
+# that emits the operator around that operand's code
+CHAINS = {
+    BinaryOpNode: ('left', 'binary'),
+    ComparisonNode: ('left', 'comparison'),
+    UnaryOpNode: ('expr', 'unary'),
+}
+
+COMPARE_SYMBOLS = {
+    'LT': '<', '<': '<',
+    'GT': '>', '>': '>',
+    'EQEQ': '==', '==': '==',
+    'NEQ': '!=', '!=': '!=',
+}
+
+
+class Transpiler:
+    # with use_locals every BigBasic variable becomes a local of the
+    # generated function; without it variables live in the engine's env
+    # dict so they survive across REPL lines
+    def __init__(self, use_locals=True, arities=None):
+        self.use_locals = use_locals
+        # hingterb name -> rgaerbs, as for Compiler
+        self.arities = dict(arities or {})
+        self.lines = []
+        self.depth = 1
+        self.variables = []
+        # the same names as a set, for load
+        self.assigned = set()
+        self.counter = 0
+        # module-level lines run once before _bb_main: the match trees
+        self.tables = []
+
+    def transpile(self, program: ProgramNode):
+        self.assigned = assigned_names(program.statements)
+        self.variables = sorted(self.assigned)
+        self.arities.update(thing_arities(program.statements))
+        if len(self.variables) > LOCALS_LIMIT:
+            self.use_locals = False
+        # the body goes inside a try, so the env peak is reported however
+        # the run ends
+        self.depth = 2
+        self.emit_block(program.statements)
+        body = self.lines
+        self.lines = self.tables + ['def _bb_main():']
+        self.depth = 1
+        if self.use_locals:
+            for name in self.variables:
+                self.emit(f'{var(name)} = {undef(name)} = _undef({name!r})')
+            # variables bound now and at most, kept by store and emit_case
+            self.emit('_n = _p = 0')
+        self.emit('try:')
+        self.lines.extend(body)
+        self.depth = 2
+        if self.use_locals:
+            pairs = ', '.join(f'{name!r}: {var(name)}' for name in self.variables)
+            self.emit(f'return {{{pairs}}}')
+        else:
+            self.emit('return None')
+        self.depth = 1
+        self.emit('finally:')
+        self.depth = 2
+        self.emit('_peak(max(_n, _p))' if self.use_locals else '_peak(len(_env()))')
+        return '\n'.join(self.lines) + '\n'
+
+    def emit(self, line):
+        self.lines.append('    ' * self.depth + line)
+
+    def temp(self, prefix):
+        self.counter += 1
+        return f'_{prefix}{self.counter}'
+
+    # statements
+
+    def emit_block(self, statements):
+        start = len(self.lines)
+        for stmt in statements:
+            self.emit_statement(stmt)
+        if len(self.lines) == start:
+            self.emit('pass')
+
+    def emit_branch(self, branch):
+        if isinstance(branch, BlockNode):
+            self.emit_block(branch.statements)
+        else:
+            self.emit_block([branch])
+
+    def emit_statement(self, node):
+        method = getattr(self, f'stmt_{type(node).__name__}', None)
+        if method is not None:
+            method(node)
+        elif not hasattr(self, f'expr_{type(node).__name__}'):
+            raise TranspileError(f"No eval_{type(node).__name__} method")
+        # a bare expression statement is an unforced thunk: nothing to run
+
+    def stmt_ProgramNode(self, node):
+        self.emit_block(node.statements)
+
+    def stmt_BlockNode(self, node):
+        self.emit_block(node.statements)
+
+    def stmt_AssignmentNode(self, node):
+        if getattr(node.value, 'strict', False):
+            # proved safe by the strictness pass, no thunk needed
+            self.store(node.name, self.expr(node.value))
+        else:
+            self.store(node.name, f'_T(lambda: {self.expr(node.value)})')
+
+    def stmt_PrintNode(self, node):
+        self.emit(f'print({self.expr(node.expression)})')
+
+    def stmt_IfNode(self, node, keyword='if'):
+        self.emit(f'{keyword} _cond({self.expr(node.condition)}):')
+        self.depth += 1
+        self.emit_branch(node.then_branch)
+        self.depth -= 1
+        if isinstance(node.else_branch, IfNode):
+            self.stmt_IfNode(node.else_branch, 'elif')
+        elif node.else_branch is not None:
+            self.emit('else:')
+            self.depth += 1
+            self.emit_branch(node.else_branch)
+            self.depth -= 1
+
+    def stmt_ForNode(self, node):
+        item = self.temp('i')
+        self.emit(f'for {item} in _iter({self.expr(node.iterable)}):')
+        self.depth += 1
+        self.store(node.var_name, item)
+        self.emit_branch(node.body)
+        self.depth -= 1
+
+    def stmt_ThingDefNode(self, node):
+        self.emit(f'_define({node.name!r}, {list(node.args)!r})')
+
+    def stmt_MatchNode(self, node):
+        # the decision tree is built once, at module level, and picks the
+        # case number; see matcher.py
+        decision = compile_cases(node.cases, self.arities)
+        tree = self.temp('tree')
+        self.tables.append(f'{tree} = {decision!r}')
+        value, case, values = self.temp('m'), self.temp('c'), self.temp('v')
+        self.emit(f'{value} = {self.expr(node.expr)}')
+        self.emit(f'{case}, {values} = _match({tree}, {value})')
+        self.emit(f'if {case} is None:')
+        self.depth += 1
+        if node.else_branch is not None:
+            self.emit_branch(node.else_branch)
+        else:
+            self.emit(f'_no_match({value})')
+        self.depth -= 1
+        arms = sorted(leaf_cases(decision))
+        if arms:
+            self.emit('else:')
+            self.depth += 1
+            self.emit_arms(node.cases, arms, case, values)
+            self.depth -= 1
+
+    def emit_arms(self, cases, arms, case, values):
+        # a balanced tree of ifs on the case number, so reaching the body
+        # takes log2(len(arms)) tests like the VM's jump takes one
+        if len(arms) == 1:
+            pattern, body = cases[arms[0]]
+            self.emit_case(pattern, body, values)
+            return
+        middle = len(arms) // 2
+        self.emit(f'if {case} < {arms[middle]}:')
+        self.depth += 1
+        self.emit_arms(cases, arms[:middle], case, values)
+        self.depth -= 1
+        self.emit('else:')
+        self.depth += 1
+        self.emit_arms(cases, arms[middle:], case, values)
+        self.depth -= 1
+
+    def emit_case(self, pattern, body, values):
+        # the case body runs against a snapshot of env that is thrown away
+        # afterwards, so save and restore everything it can rebind
+        body_stmts = body.statements if isinstance(body, BlockNode) else [body]
+        bound = pattern_names(pattern)
+        names = sorted(set(assigned_names(body_stmts)).union(bound))
+        if not self.use_locals:
+            saved = self.temp('s')
+            self.emit(f'{saved} = _enter({tuple(names)!r})')
+            for i, name in enumerate(bound):
+                self.store(name, f'{values}[{i}]')
+            self.emit_block(body_stmts)
+            self.emit(f'_exit({saved})')
+            return
+        if names:
+            saved = self.temp('s')
+            targets = ''.join(f'{var(name)}, ' for name in names)
+            self.emit(f'{saved} = ({targets})')
+        for i, name in enumerate(bound):
+            self.store(name, f'{values}[{i}]')
+        self.emit_block(body_stmts)
+        if names:
+            # the restore unbinds what the case bound that was unbound
+            # before it: the only place the env shrinks, so the peak is
+            # taken here first
+            self.emit('if _n > _p: _p = _n')
+            for i, name in enumerate(names):
+                self.emit(f'if {saved}[{i}] is {undef(name)} and {var(name)} is not {undef(name)}: _n -= 1')
+            self.emit(f'({targets}) = {saved}')
+
+    def store(self, name, value):
+        if self.use_locals:
+            self.emit(f'if {var(name)} is {undef(name)}: _n += 1')
+            self.emit(f'{var(name)} = {value}')
+        else:
+            self.emit(f'_env()[{name!r}] = {value}')
+
+    # expressions, generated strictly: this is what a thunk runs when forced
+
+    def expr(self, node):
+        method = getattr(self, f'expr_{type(node).__name__}', None)
+        if method is None:
+            raise TranspileError(f"No eval_{type(node).__name__} method")
+        if node.__class__ in CHAINS and chain_length(node) > CHAIN_LIMIT:
+            return self.expr_chain(node)
+        return method(node)
+
+    def expr_chain(self, node):
+        # (_t := x, _t := _add(_t, y), _t := _add(_t, z), ...)[-1]: the
+        # operators in the same order as nested calls, with no nesting
+        operators = []
+        while node.__class__ in CHAINS:
+            operators.append(node)
+            node = getattr(node, CHAINS[node.__class__][0])
+        temp = self.temp('t')
+        steps = [f'{temp} := {self.expr(node)}']
+        for node in reversed(operators):
+            steps.append(f'{temp} := {getattr(self, CHAINS[node.__class__][1])(node, temp)}')
+        return '(' + ', '.join(steps) + ')[-1]'
+
+    def expr_NumberNode(self, node):
+        return literal(node.value)
+
+    def expr_StringNode(self, node):
+        return literal(node.value)
+
+    def expr_BooleanNode(self, node):
+        return literal(node.value)
+
+    def load(self, name):
+        # a name the program never assigns has no local: it is read from
+        # env, which raises the tree-walker's undefined variable error
+        if self.use_locals and name in self.assigned:
+            v = var(name)
+            return f'({v}.force() if {v}.__class__ is _T else {v})'
+        return f'_load({name!r})'
+
+    def expr_IdentifierNode(self, node):
+        return self.load(node.name)
+
+    def expr_IndexNode(self, node):
+        return f'_index({self.load(node.name)}, {self.expr(node.index)})'
+
+    def expr_ArrayNode(self, node):
+        # like the tree-walker: a thunk for each element that needs one
+        elements = [self.expr(e) if getattr(e, 'strict', False) else f'_T(lambda: {self.expr(e)})'
+                    for e in node.elements]
+        return '_pack([' + ', '.join(elements) + '])'
+
+    def expr_NewNode(self, node):
+        args = ', '.join(self.expr(a) for a in node.init_args)
+        return f'_new({node.type_name!r}, [{args}])'
+
+    def expr_AttrAccessNode(self, node):
+        return f'_attr({self.expr(node.obj)}, {node.attr!r})'
+
+    def expr_UnaryOpNode(self, node):
+        return self.unary(node, self.expr(node.expr))
+
+    def unary(self, node, operand):
+        if node.op == 'not':
+            return f'_not({operand})'
+        return f'_unary({node.op!r}, {operand})'
+
+    def expr_BinaryOpNode(self, node):
+        return self.binary(node, self.expr(node.left))
+
+    def binary(self, node, left):
+        right = self.expr(node.right)
+        if node.op in BINARY_HELPERS:
+            return f'{BINARY_HELPERS[node.op]}({left}, {right})'
+        return f'_binary({node.op!r}, {left}, {right})'
+
+    def expr_RangeNode(self, node):
+        ends = [node.start, node.stop] + ([] if node.step is None else [node.step])
+        return '_range(' + ', '.join(self.expr(e) for e in ends) + ')'
+
+    def expr_ComparisonNode(self, node):
+        return self.comparison(node, self.expr(node.left))
+
+    def comparison(self, node, left):
+        right = self.expr(node.right)
+        if node.op in COMPARE_SYMBOLS:
+            # always parenthesised, BigBasic comparisons never chain Python-style
+            return f'({left} {COMPARE_SYMBOLS[node.op]} {right})'
+        return f'_compare({node.op!r}, {left}, {right})'
+
+
+def chain_length(node):
+    # how many operators node leads a chain of, counting to CHAIN_LIMIT + 1
+    n = 0
+    while node.__class__ in CHAINS and n <= CHAIN_LIMIT:
+        node = getattr(node, CHAINS[node.__class__][0])
+        n += 1
+    return n
+
+def var(name):
+    # BigBasic names can clash with Python keywords and our helpers
+    return f'v_{name}'
+
+def undef(name):
+    # the _undef thunk a local starts out as: it is that while unbound
+    return f'u_{name}'
+
+def literal(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return f'float({repr(value)!r})'
+    return repr(value)
+
+
+class PyEngine:
+    def __init__(self, use_locals=True):
+        self.use_locals = use_locals
+        # variable environment: name -> value or Thunk, same as Interpreter.env
+        self.env = {}
+        # thing definitions: name -> record type
+        self.thing_defs = {}
+        # the most variables bound at once
+        self.env_peak = 0
+
+    def interpret(self, program):
+        return self.execute(self.compile(program))
+
+    def compile(self, program, file_name='<bgbasic>'):
+        source = Transpiler(self.use_locals, record_arities(self.thing_defs)).transpile(program)
+        return compile(source, file_name, 'exec')
+
+    def execute(self, code):
+        namespace = dict(RUNTIME)
+        namespace.update({
+            '_new': self._new, '_define': self._define,
+            '_load': self._load, '_env': self._env,
+            '_enter': self._enter, '_exit': self._exit, '_peak': self._peak,
+        })
+        exec(code, namespace)
+        env = namespace['_bb_main']()
+        if env is not None:
+            self.env.update(env)
+        return None
+
+    def _define(self, name, args):
+        define_thing(self.thing_defs, name, args)
+
+    def _new(self, type_name, args):
+        return new_object(self.thing_defs, type_name, args)
+
+    def _load(self, name):
+        env = self.env
+        if name not in env:
+            raise RuntimeError(f"Undefined variable: {name}")
+        value = env[name]
+        while value.__class__ is Thunk:
+            value = value.force()
+        return value
+
+    def _env(self):
+        return self.env
+
+    def _enter(self, names):
+        env = self.env
+        return [(name, env.get(name, UNBOUND)) for name in names]
+
+    def _exit(self, saved):
+        # the env dict only shrinks here: take its peak first
+        env = self.env
+        self._peak(len(env))
+        for name, value in saved:
+            if value is UNBOUND:
+                env.pop(name, None)
+            else:
+                env[name] = value
+
+    def _peak(self, size):
+        if size > self.env_peak:
+            self.env_peak = size
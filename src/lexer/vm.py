@@ -0,0 +1,205 @@
+from compiler import Compiler
+from interpreter import (
+    Thunk, RuntimeError,
+    binary_op, compare_op, unary_op, index_value, iter_value,
+    check_condition, define_thing, new_object, attr_value, pack, make_range,
+    match_value, record_arities
+)
+from opcodes import *
+from resolver import UNBOUND
+
+NUMBER = (int, float)
+# end-of-iteration marker for OP_FOR_ITER
+DONE = object()
+
+
+class VM:
+    def __init__(self):
+        # variable environment: name -> value or Thunk, same as Interpreter.env
+        self.env = {}
+        # thing definitions: name -> record type
+        self.thing_defs = {}
+        # env snapshots taken on entry to an asecerb body
+        self.scopes = []
+        # the most variables bound at once
+        self.env_peak = 0
+
+    def interpret(self, program):
+        return self.execute(Compiler(record_arities(self.thing_defs)).compile(program))
+
+    def execute(self, code):
+        self.scopes = []
+        try:
+            return self.run(code, 0)
+        finally:
+            self.note_env_size()
+
+    def note_env_size(self):
+        # env only shrinks at OP_EXIT_SCOPE, which calls this first, so
+        # the peak is caught without a check on every store
+        if len(self.env) > self.env_peak:
+            self.env_peak = len(self.env)
+
+    def make_thunk(self, code, entry):
+        return Thunk(lambda: self.run(code, entry))
+
+    def run(self, code, pc):
+        ops = code.ops
+        consts = code.consts
+        names = code.names
+        env = self.env
+        stack = []
+        push = stack.append
+        pop = stack.pop
+
+        while True:
+            op = ops[pc]
+            arg = ops[pc + 1]
+            pc += 2
+
+            # most frequent opcodes first
+            if op == OP_LOAD_NAME:
+                name = names[arg]
+                if name not in env:
+                    raise RuntimeError(f"Undefined variable: {name}")
+                value = env[name]
+                while value.__class__ is Thunk:
+                    value = value.force()
+                push(value)
+            elif op == OP_LOAD_CONST:
+                push(consts[arg])
+            elif op == OP_STORE_NAME:
+                env[names[arg]] = pop()
+            elif op == OP_ADD:
+                right = pop()
+                left = pop()
+                if isinstance(left, NUMBER) and isinstance(right, NUMBER):
+                    push(left + right)
+                else:
+                    push(binary_op('+', left, right))
+            elif op == OP_SUB:
+                right = pop()
+                left = pop()
+                if isinstance(left, NUMBER) and isinstance(right, NUMBER):
+                    push(left - right)
+                else:
+                    push(binary_op('-', left, right))
+            elif op == OP_MUL:
+                right = pop()
+                left = pop()
+                if isinstance(left, NUMBER) and isinstance(right, NUMBER):
+                    push(left * right)
+                else:
+                    push(binary_op('*', left, right))
+            elif op == OP_LT:
+                right = pop()
+                push(pop() < right)
+            elif op == OP_GT:
+                right = pop()
+                push(pop() > right)
+            elif op == OP_EQ:
+                right = pop()
+                push(pop() == right)
+            elif op == OP_NE:
+                right = pop()
+                push(pop() != right)
+            elif op == OP_JUMP_IF_FALSE:
+                cond = pop()
+                if cond is False:
+                    pc = arg
+                elif cond is not True:
+                    check_condition(cond)
+            elif op == OP_JUMP:
+                pc = arg
+            elif op == OP_FOR_ITER:
+                item = next(stack[-1], DONE)
+                if item is DONE:
+                    pop()
+                    pc = arg
+                else:
+                    push(item)
+            elif op == OP_INDEX:
+                idx = pop()
+                push(index_value(pop(), idx))
+            elif op == OP_GET_ATTR:
+                push(attr_value(pop(), names[arg]))
+            elif op == OP_MAKE_THUNK:
+                push(self.make_thunk(code, arg))
+            elif op == OP_PRINT:
+                print(pop())
+            elif op == OP_DIV:
+                right = pop()
+                push(binary_op('/', pop(), right))
+            elif op == OP_MOD:
+                right = pop()
+                push(binary_op('%', pop(), right))
+            elif op == OP_AND:
+                right = pop()
+                push(binary_op('and', pop(), right))
+            elif op == OP_OR:
+                right = pop()
+                push(binary_op('or', pop(), right))
+            elif op == OP_NOT:
+                push(unary_op('not', pop()))
+            elif op == OP_BUILD_LIST:
+                if arg:
+                    items = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    items = []
+                push(pack(items))
+            elif op == OP_NEW:
+                type_name, argc = consts[arg]
+                if argc:
+                    args = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    args = []
+                push(new_object(self.thing_defs, type_name, args))
+            elif op == OP_RANGE:
+                operands = stack[-arg:]
+                del stack[-arg:]
+                push(make_range(*operands))
+            elif op == OP_GET_ITER:
+                push(iter_value(pop()))
+            elif op == OP_POP:
+                pop()
+            elif op == OP_MATCH:
+                decision, targets = consts[arg]
+                value = pop()
+                case, values = match_value(decision, value)
+                if case is None:
+                    push(value)
+                    pc = targets[-1]
+                else:
+                    stack.extend(values)
+                    pc = targets[case]
+            elif op == OP_ENTER_SCOPE:
+                # only what the body can rebind; UNBOUND ones are removed again
+                self.scopes.append([(name, env.get(name, UNBOUND)) for name in consts[arg]])
+            elif op == OP_EXIT_SCOPE:
+                self.note_env_size()
+                for name, value in self.scopes.pop():
+                    if value is UNBOUND:
+                        env.pop(name, None)
+                    else:
+                        env[name] = value
+            elif op == OP_NO_MATCH:
+                raise RuntimeError(f"No pattern matched value: {pop()}")
+            elif op == OP_DEF_THING:
+                name, args = consts[arg]
+                define_thing(self.thing_defs, name, list(args))
+            elif op == OP_BINARY:
+                right = pop()
+                push(binary_op(consts[arg], pop(), right))
+            elif op == OP_COMPARE:
+                right = pop()
+                push(compare_op(consts[arg], pop(), right))
+            elif op == OP_UNARY:
+                push(unary_op(consts[arg], pop()))
+            elif op == OP_RETURN:
+                return pop()
+            elif op == OP_HALT:
+                return None
+            else:
+                raise RuntimeError(f"Bad opcode {op} at {pc - 2}")
@@ -0,0 +1,68 @@
+import os
+import struct
+# the C module directly: `socket` pulls in enum and friends, which would
+# be most of the client's startup time
+from _socket import socket, AF_UNIX, SOCK_STREAM
+
+# The bgbasic serve protocol, kept free of interpreter imports so the
+# client starts as fast as Python itself.
+#
+# Every message is a frame: a one byte tag, a 4 byte big-endian length and
+# that many bytes of payload.
+#
+#   client -> server   REQUEST  engine, opt level, path and source, joined
+#                               by NUL bytes, UTF-8
+#   server -> client   STDOUT / STDERR  UTF-8 text, as the script produces it
+#                      EXIT     the exit status, in ASCII; always the last frame
+
+REQUEST = b'r'
+STDOUT = b'o'
+STDERR = b'e'
+EXIT = b'x'
+
+HEADER = struct.Struct('>cI')
+
+def default_socket():
+    return os.environ.get('BGBASIC_SOCKET') or f'/tmp/bgbasic-{os.getuid()}.sock'
+
+def send_frame(sock, tag, payload):
+    sock.sendall(HEADER.pack(tag, len(payload)) + payload)
+
+def recv_exact(sock, n):
+    data = bytearray()
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed mid-frame")
+        data += chunk
+    return bytes(data)
+
+def recv_frame(sock):
+    tag, length = HEADER.unpack(recv_exact(sock, HEADER.size))
+    return tag, recv_exact(sock, length)
+
+def encode_request(source, path, engine, opt_level):
+    return '\0'.join((engine, str(opt_level), path, source)).encode('utf-8')
+
+def decode_request(payload):
+    # -> (source, path, engine, opt_level)
+    engine, opt_level, path, source = payload.decode('utf-8').split('\0', 3)
+    return source, path, engine, int(opt_level)
+
+def submit(source, path='<submitted>', engine='tree', opt_level=0,
+           socket_path=None, stdout=None, stderr=None):
+    # run one script on the server; output is written to the given text
+    # streams as it arrives, returns the exit status
+    sock = socket(AF_UNIX, SOCK_STREAM)
+    try:
+        sock.connect(socket_path or default_socket())
+        send_frame(sock, REQUEST, encode_request(source, path, engine, opt_level))
+        while True:
+            tag, payload = recv_frame(sock)
+            if tag == EXIT:
+                return int(payload)
+            stream = stdout if tag == STDOUT else stderr
+            if stream is not None:
+                stream.write(payload.decode('utf-8'))
+    finally:
+        sock.close()